@@ -3,8 +3,11 @@ import mysql.connector
 import os
 from utils.auth import (
     username_exists, create_user,
-    login_required, role_required, get_db_connection
+    login_required, role_required
 )
+from utils.db import get_db, init_app as init_db
+from utils.metrics import init_app as init_metrics
+from utils.fragment_cache import init_app as init_fragment_cache
 from config import Config
 from routes.auth import auth_bp
 from routes.player import player_bp
@@ -14,6 +17,9 @@ from routes.db_manager import db_manager_bp
 
 app = Flask(__name__)
 app.secret_key = Config.SECRET_KEY
+init_db(app)
+init_metrics(app)
+init_fragment_cache(app)
 
 # Register blueprints
 app.register_blueprint(auth_bp)
@@ -51,7 +57,7 @@ def dashboard(role):
         return redirect(url_for('dashboard', role=session['role']))
     
     try:
-        conn = get_db_connection()
+        conn = get_db(readonly=True)
         cursor = conn.cursor(dictionary=True)
         
         if role == 'arbiter':
@@ -122,7 +128,6 @@ def dashboard(role):
         return redirect(url_for('home'))
     finally:
         cursor.close()
-        conn.close()
 
 
 if __name__ == '__main__':
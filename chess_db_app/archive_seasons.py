@@ -0,0 +1,45 @@
+"""
+Move closed seasons from the live match tables into the season archive.
+
+    python archive_seasons.py                archive every closed season still in the live tables
+    python archive_seasons.py --season 2023  archive one season
+
+Each season moves in one transaction; archived matches stay visible on the
+"All Seasons" dashboard views. See utils/seasons.py.
+"""
+
+import argparse
+import sys
+
+import mysql.connector
+
+from utils.db import connect
+from utils.seasons import archive_season, current_season, live_seasons
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Archive closed ChessDB seasons")
+    parser.add_argument('--season', type=int, help="archive only this season (the year it starts in)")
+    args = parser.parse_args(argv)
+
+    conn = connect()
+    try:
+        if args.season is not None:
+            targets = [args.season]
+        else:
+            targets = [season for season in live_seasons(conn) if season < current_season()]
+        if not targets:
+            print("No closed seasons to archive")
+        for season in targets:
+            moved = archive_season(conn, season)
+            print(f"Season {season}: archived {moved} match(es)")
+        return 0
+    except (ValueError, mysql.connector.Error) as err:
+        print(f"Archiving failed: {err}")
+        return 1
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,218 @@
+"""
+Optional ASGI entry point for the ChessDB application.
+
+The read-heavy dashboards are served by async views on Quart, backed by the
+aiomysql pools in utils.aio_db, so one worker can interleave many in-flight
+dashboard requests. They reuse the query builders and template-context
+helpers of the existing blueprints. Every other route (logins, forms, POSTs,
+static files) is passed through unchanged to the sync Flask app in app.py.
+
+Run with:
+    pip install -r requirements-async.txt
+    hypercorn asgi:application
+"""
+
+import time
+from functools import wraps
+
+from asgiref.wsgi import WsgiToAsgi
+from quart import Quart, Blueprint, render_template, redirect, url_for, session, flash, request, make_response
+import pymysql
+
+from config import Config
+from app import app as flask_app
+from routes import player, coach, arbiter, db_manager
+from utils import aio_db, refdata, player_stats, versions, fragment_cache, seasons, pagination, leaderboard
+
+quart_app = Quart(__name__, template_folder='templates', static_folder='static')
+quart_app.secret_key = Config.SECRET_KEY  # same cookie sessions as the Flask app
+fragment_cache.init_app(quart_app)
+
+# Endpoints served natively by the async views below
+ASYNC_ENDPOINTS = {'player.dashboard', 'player.matches', 'arbiter.dashboard', 'coach.dashboard', 'db_manager.dashboard'}
+
+_blueprints = {}
+
+
+def _blueprint(name):
+    """Quart blueprint mirroring a Flask blueprint name, so url_for() endpoints match"""
+    if name not in _blueprints:
+        _blueprints[name] = Blueprint(name, __name__)
+    return _blueprints[name]
+
+
+def _pinned():
+    """Read-your-writes window set by utils.db.pin_after_write on the sync side"""
+    return session.get('db_primary_until', 0) > time.time()
+
+
+async def _reference_data(*names):
+    """Async counterpart of utils.refdata.reference_data(), sharing its cache"""
+    found, missing = refdata.lookup(names)
+    if missing:
+        loaded = await aio_db.fetch_concurrently(
+            {name: (refdata.DATASETS[name], ()) for name in missing}, readonly=False)
+        refdata.store(loaded, missing)
+        found.update(loaded)
+    return found
+
+
+async def _etag(scope, entities):
+    """Async counterpart of utils.versions.current_etag()"""
+    rows = await aio_db.fetch_all(*versions.versions_query(entities), pinned=_pinned())
+    return versions.make_etag(scope, rows)
+
+
+def role_required(role, label):
+    """Async equivalent of the per-blueprint login and role decorators"""
+    def decorator(f):
+        @wraps(f)
+        async def decorated_function(*args, **kwargs):
+            if 'username' not in session:
+                return redirect(url_for('auth.login'))
+            if session.get('role') != role:
+                await flash(f'Access denied. {label} role required.', 'error')
+                return redirect(url_for('auth.login'))
+            return await f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
+
+@_blueprint('player').route('/player/dashboard', endpoint='dashboard')
+@role_required('player', 'Player')
+async def player_dashboard():
+    try:
+        user_id = session['user_id']
+        scope = seasons.scope_from(request.args)
+        stats, version = player_stats.lookup(user_id, scope)
+        if stats is None:
+            results = await aio_db.fetch_concurrently(
+                {**player.dashboard_queries(user_id), **player.stats_queries(user_id, scope)}, readonly=False)
+            stats = player.compute_stats(results)
+            player_stats.store(user_id, stats, version, scope)
+        else:
+            results = await aio_db.fetch_concurrently(player.dashboard_queries(user_id), pinned=_pinned())
+        board, generation = leaderboard.lookup()
+        if board is None:
+            board = leaderboard.store(await aio_db.fetch_all(*leaderboard.board_query()), generation)
+        return await render_template('player_dashboard.html',
+                                     **player.dashboard_context(results, stats, scope, player.rank_context(board, user_id)))
+    except pymysql.MySQLError as err:
+        await flash('Database error occurred', 'error')
+        print(f"Database error: {err}")
+        return redirect(url_for('auth.login'))
+
+
+@_blueprint('player').route('/player/matches', endpoint='matches')
+@role_required('player', 'Player')
+async def player_matches():
+    try:
+        user_id = session['user_id']
+        scope = seasons.scope_from(request.args)
+        cursor = pagination.cursor_from(pagination.MATCHES, request.args)
+        etag = await _etag(f'player.matches:{user_id}:{seasons.cache_tag(scope)}:{pagination.cache_tag(cursor)}',
+                           player.matches_version_entities(user_id))
+        if versions.not_modified(request, session, etag):
+            return versions.with_etag(await make_response('', 304), etag)
+        page = player.matches_page(await aio_db.fetch_all(*player.matches_query(user_id, scope, cursor),
+                                                          pinned=_pinned()), cursor)
+        response = await make_response(await render_template('player_matches.html', matches=page.rows, page=page,
+                                                             data_version=etag, season_scope=scope))
+        return versions.with_etag(response, etag)
+    except pymysql.MySQLError as err:
+        await flash("Database error occurred while loading matches.", "error")
+        print(f"Database error: {err}")
+        return redirect(url_for('player.dashboard'))
+
+
+@_blueprint('arbiter').route('/arbiter/dashboard', endpoint='dashboard')
+@role_required('arbiter', 'Arbiter')
+async def arbiter_dashboard():
+    try:
+        arbiter_id = session['user_id']
+        scope = seasons.scope_from(request.args)
+        cursor = pagination.cursor_from(pagination.MATCHES, request.args)
+        etag = await _etag(f'arbiter.dashboard:{arbiter_id}:{seasons.cache_tag(scope)}:{pagination.cache_tag(cursor)}',
+                           arbiter.version_entities(arbiter_id))
+        if versions.not_modified(request, session, etag):
+            return versions.with_etag(await make_response('', 304), etag)
+        results = await aio_db.fetch_concurrently(arbiter.dashboard_queries(arbiter_id, scope, cursor), pinned=_pinned())
+        response = await make_response(await render_template('arbiter_dashboard.html', data_version=etag,
+                                                            **arbiter.dashboard_context(results, scope, cursor)))
+        return versions.with_etag(response, etag)
+    except pymysql.MySQLError as err:
+        await flash('Database error occurred.', 'error')
+        print(f"Database error: {err}")
+        return redirect(url_for('auth.login'))
+
+
+@_blueprint('coach').route('/coach/dashboard', endpoint='dashboard')
+@role_required('coach', 'Coach')
+async def coach_dashboard():
+    coach_id = session['user_id']
+    scope = seasons.scope_from(request.args)
+    cursors = coach.list_cursors(request.args)
+    pinned = _pinned()
+    contract = await aio_db.fetch_one(*coach.team_query(coach_id), pinned=pinned)
+    team_id = contract['team_id'] if contract else None
+    etag = await _etag(f'coach.dashboard:{coach_id}:{team_id}:{seasons.cache_tag(scope)}:'
+                       f'{pagination.cache_tag(*cursors.values())}', coach.version_entities(team_id))
+    if versions.not_modified(request, session, etag):
+        return versions.with_etag(await make_response('', 304), etag)
+    coach_row = await aio_db.fetch_one(*coach.coach_query(coach_id), pinned=pinned)
+    results = await aio_db.fetch_concurrently(coach.dashboard_queries(coach_id, coach_row['team_id'], scope, cursors),
+                                              pinned=pinned)
+    response = await make_response(await render_template('coach_dashboard.html', coach=coach_row, data_version=etag,
+                                                         season_scope=scope,
+                                                         **coach.dashboard_context(results, cursors)))
+    return versions.with_etag(response, etag)
+
+
+@_blueprint('db_manager').route('/manager/dashboard', endpoint='dashboard')
+@role_required('manager', 'Database manager')
+async def manager_dashboard():
+    try:
+        results = await _reference_data(*db_manager.DASHBOARD_REFERENCE)
+        results.update(await aio_db.fetch_concurrently(db_manager.dashboard_queries(results['halls']), pinned=_pinned()))
+        return await render_template('db_manager_dashboard.html', **db_manager.dashboard_context(results))
+    except pymysql.MySQLError as err:
+        await flash('Database error occurred', 'error')
+        print(f"Database error: {err}")
+        return redirect(url_for('auth.login'))
+
+
+async def _served_by_wsgi(**kwargs):
+    """Placeholder for routes the dispatcher sends to Flask; it exists so url_for() can build them"""
+    raise RuntimeError("This route is served by the WSGI app")
+
+
+# Mirror every remaining Flask rule so templates rendered here can link to it
+for _rule in flask_app.url_map.iter_rules():
+    if _rule.endpoint in ASYNC_ENDPOINTS or _rule.endpoint == 'static':
+        continue
+    _name, _, _endpoint = _rule.endpoint.rpartition('.')
+    _target = _blueprint(_name) if _name else quart_app
+    _target.add_url_rule(_rule.rule, endpoint=_endpoint, view_func=_served_by_wsgi, methods=_rule.methods)
+
+for _bp in _blueprints.values():
+    quart_app.register_blueprint(_bp)
+
+
+@quart_app.after_serving
+async def _close_pools():
+    await aio_db.close_pools()
+
+
+ASYNC_PATHS = {
+    rule.rule for rule in quart_app.url_map.iter_rules() if rule.endpoint in ASYNC_ENDPOINTS
+}
+_wsgi_app = WsgiToAsgi(flask_app)
+
+
+async def application(scope, receive, send):
+    """Send async dashboard GETs to Quart and everything else to the Flask app"""
+    if scope['type'] == 'lifespan':
+        return await quart_app(scope, receive, send)
+    if scope['type'] == 'http' and scope['path'] in ASYNC_PATHS and scope['method'] in ('GET', 'HEAD'):
+        return await quart_app(scope, receive, send)
+    return await _wsgi_app(scope, receive, send)
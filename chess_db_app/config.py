@@ -14,10 +14,71 @@ load_dotenv()
 class Config:
     # Database settings
     DB_HOST = os.getenv('DB_HOST', 'localhost')
+    DB_PORT = int(os.getenv('DB_PORT', 3306))
     DB_USER = os.getenv('DB_USER', 'root')
     DB_PASSWORD = os.getenv('DB_PASSWORD', '3946471')
     DB_NAME = os.getenv('DB_NAME', 'chessdb')
+
+    # Connection pool settings (mysql.connector caps pool_size at 32)
+    DB_POOL_NAME = os.getenv('DB_POOL_NAME', 'chessdb_pool')
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))  # seconds before a connection is reopened
+    DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 5))  # seconds to wait for a free connection
+    PREPARED_STATEMENT_CACHE_SIZE = int(os.getenv('PREPARED_STATEMENT_CACHE_SIZE', 32))  # per connection
+    # Threads for concurrent dashboard reads (utils/batch.py). They use a separate
+    # pool of exactly QUERY_BATCH_WORKERS connections per endpoint, so each process
+    # opens up to DB_POOL_SIZE + QUERY_BATCH_WORKERS connections per endpoint; size
+    # MySQL's max_connections for that times the worker processes. At most 32.
+    QUERY_BATCH_WORKERS = int(os.getenv('QUERY_BATCH_WORKERS', 6))
+    ASYNC_DB_POOL_SIZE = int(os.getenv('ASYNC_DB_POOL_SIZE', 50))  # per endpoint, asgi.py only
+
+    # Read replicas as comma-separated host:port pairs, e.g. "127.0.0.1:3307,127.0.0.1:3308".
+    # Empty means every read goes to the primary.
+    DB_REPLICAS = [r.strip() for r in os.getenv('DB_REPLICAS', '').split(',') if r.strip()]
+    READ_YOUR_WRITES_SECONDS = int(os.getenv('READ_YOUR_WRITES_SECONDS', 5))  # primary pin after a write
+
+    # Query instrumentation settings
+    N_PLUS_ONE_THRESHOLD = int(os.getenv('N_PLUS_ONE_THRESHOLD', 5))  # same statement shape this often in one request
+    SLOW_STATEMENTS_PER_REQUEST = 3
+    SLOW_STATEMENTS_TRACKED = 20  # slowest statement shapes exposed on /manager/metrics
+
+    # Cache settings
+    REFERENCE_DATA_TTL = int(os.getenv('REFERENCE_DATA_TTL', 600))  # seconds; titles, teams, halls, arbiters...
+    PLAYER_STATS_TTL = int(os.getenv('PLAYER_STATS_TTL', 300))  # seconds; invalidated on result entry anyway
+    PLAYER_STATS_CACHE_SIZE = int(os.getenv('PLAYER_STATS_CACHE_SIZE', 10000))  # players kept per process
+    FRAGMENT_CACHE_TTL = int(os.getenv('FRAGMENT_CACHE_TTL', 600))  # seconds; keys carry the data version
+    FRAGMENT_CACHE_SIZE = int(os.getenv('FRAGMENT_CACHE_SIZE', 500))  # rendered template blocks per process
     
+    # Password hashing (utils/passwords.py)
+    PASSWORD_KDF = os.getenv('PASSWORD_KDF', 'scrypt')
+    SCRYPT_N = int(os.getenv('SCRYPT_N', 2 ** 14))  # ~16 MB per hash with r=8
+    SCRYPT_R = int(os.getenv('SCRYPT_R', 8))
+    SCRYPT_P = int(os.getenv('SCRYPT_P', 1))
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', os.cpu_count() or 2))  # processes
+    PASSWORD_HASH_QUEUE_DEPTH = int(os.getenv('PASSWORD_HASH_QUEUE_DEPTH', 64))  # pending hashes before rejecting
+    PASSWORD_HASH_TIMEOUT = float(os.getenv('PASSWORD_HASH_TIMEOUT', 5))  # seconds
+
+    # Seasons (utils/seasons.py); a season is named after the year it starts in
+    SEASON_START_MONTH = int(os.getenv('SEASON_START_MONTH', 1))
+
+    # Rows per page of the keyset-paginated lists (utils/pagination.py)
+    PAGE_SIZE = int(os.getenv('PAGE_SIZE', 25))
+
+    # Points of the rating chart after LTTB downsampling (utils/rating_history.py)
+    RATING_HISTORY_POINTS = int(os.getenv('RATING_HISTORY_POINTS', 200))
+
+    # Leaderboard (utils/leaderboard.py)
+    LEADERBOARD_TTL = int(os.getenv('LEADERBOARD_TTL', 300))  # seconds; this process's own changes apply at once
+    LEADERBOARD_SIZE = int(os.getenv('LEADERBOARD_SIZE', 50))  # players in the top list
+    LEADERBOARD_RADIUS = int(os.getenv('LEADERBOARD_RADIUS', 5))  # players shown on either side of "you"
+
+    # Fixtures accepted by one bulk scheduling request (utils/scheduler.py)
+    SCHEDULE_MAX_FIXTURES = int(os.getenv('SCHEDULE_MAX_FIXTURES', 10000))
+
+    # Free tables and arbiters per date and slot (utils/availability.py)
+    AVAILABILITY_TTL = int(os.getenv('AVAILABILITY_TTL', 60))  # seconds; this process's bookings apply at once
+    AVAILABILITY_CACHE_SIZE = int(os.getenv('AVAILABILITY_CACHE_SIZE', 1000))  # (date, slot) entries per process
+
     # Flask settings
     SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
     DEBUG = True  # Set to False in production
@@ -0,0 +1,128 @@
+"""
+Check that the application's hot queries are served by indexes.
+
+    python explain_check.py            EXPLAIN every registered query, exit 1 on a full table scan
+    python explain_check.py --verbose  also print the access path of every table
+
+Runs against the configured database, which must be migrated and seeded
+(python migrate.py && python import_data.py); sample ids are taken from it.
+Register new hot queries in hot_queries() so they are checked too.
+"""
+
+import argparse
+import sys
+from datetime import date, timedelta
+
+from routes import arbiter, coach, db_manager, player
+from utils.auth import USER_BY_USERNAME
+from utils.db import connect
+from utils.pagination import AFTER, Cursor
+from utils import availability, leaderboard, rating_history, scheduler
+from utils.query_plans import check, explain, table_accesses
+from utils.versions import HALLS, entity, versions_query
+
+# halls and tables are bounded reference data joined on their primary key;
+# the optimizer may legitimately read them in full to drive a join
+JOINED_REFERENCE = ('h', 't')
+
+# Queries whose whole purpose is to read a small reference table
+ALLOWED_SCANS = {
+    # Every arbiter, anti-joined against their claims
+    'coach.availability:arbiters': JOINED_REFERENCE + ('a',),
+}
+
+
+def sample_ids(conn):
+    """Ids of existing rows to bind the registered queries to"""
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute("""
+            SELECT white_player AS player_id FROM match_players
+            WHERE white_player IS NOT NULL LIMIT 1
+        """)
+        player_row = cursor.fetchone()
+        cursor.execute("SELECT arbiter_id FROM matches WHERE arbiter_id IS NOT NULL LIMIT 1")
+        match_row = cursor.fetchone()
+        cursor.execute("SELECT coach_id, team_id FROM contracts LIMIT 1")
+        contract_row = cursor.fetchone()
+        cursor.execute("SELECT username FROM users LIMIT 1")
+        user_row = cursor.fetchone()
+    finally:
+        cursor.close()
+    if not (player_row and match_row and contract_row and user_row):
+        raise SystemExit("The database has no players, matches or contracts; seed it with import_data.py first")
+    return dict(player_row, **match_row, **contract_row, **user_row)
+
+
+def hot_queries(ids):
+    """The registry: {name: (sql, params)} of every query on a hot path"""
+    queries = {}
+
+    def add(prefix, named):
+        queries.update({f"{prefix}:{name}": query for name, query in named.items()})
+
+    # Later pages of the paginated lists, to check their seek predicates too
+    match_cursor = Cursor(AFTER, (date.today().isoformat(), 1, 0))
+
+    add('player.dashboard', player.dashboard_queries(ids['player_id']))
+    add('player.dashboard', player.stats_queries(ids['player_id']))
+    queries['player.matches'] = player.matches_query(ids['player_id'])
+    queries['player.matches:seek'] = player.matches_query(ids['player_id'], cursor=match_cursor)
+    queries['player.rating_history'] = rating_history.series_query(ids['player_id'])
+    queries['leaderboard:refresh'] = leaderboard.players_query([ids['player_id']])
+
+    add('arbiter.dashboard', arbiter.dashboard_queries(ids['arbiter_id']))
+    queries['arbiter.dashboard:matches:seek'] = arbiter.dashboard_queries(ids['arbiter_id'], cursor=match_cursor)['matches']
+
+    queries['coach.dashboard:team'] = coach.team_query(ids['coach_id'])
+    queries['coach.dashboard:coach'] = coach.coach_query(ids['coach_id'])
+    add('coach.dashboard', coach.dashboard_queries(ids['coach_id'], ids['team_id']))
+    add('coach.dashboard:seek', {name: coach.team_matches_query(ids['coach_id'], ids['team_id'], name, cursor=match_cursor)
+                                 for name in coach.MATCH_LISTS})
+
+    fixture = scheduler.Fixture(ids['team_id'], ids['team_id'] + 1, date.today(), date.today() + timedelta(days=30))
+    add('coach.schedule', scheduler.occupancy_queries([fixture]))
+    add('coach.availability', availability.queries(date.today(), 1))
+
+    add('db_manager.dashboard', db_manager.dashboard_queries([{'hall_id': 1}]))
+    queries['db_manager.users'] = db_manager.users_query()
+    queries['db_manager.users:seek'] = db_manager.users_query('player', Cursor(AFTER, (ids['username'],)))
+
+    queries['auth.login'] = (USER_BY_USERNAME, (ids['username'],))
+    queries['etag:data_versions'] = versions_query([entity('player', ids['player_id']), HALLS])
+    return queries
+
+
+def allowed_scans(queries):
+    allowed = {name: JOINED_REFERENCE for name in queries}
+    allowed.update(ALLOWED_SCANS)
+    return allowed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fail if a hot query does a full table scan")
+    parser.add_argument('--verbose', action='store_true', help="print the access path of every table")
+    args = parser.parse_args(argv)
+
+    conn = connect()
+    try:
+        queries = hot_queries(sample_ids(conn))
+        if args.verbose:
+            for name, (sql, params) in queries.items():
+                plan = explain(conn, sql, params)
+                print(name)
+                for table in table_accesses(plan):
+                    print(f"    {table.get('table_name', '?'):<12} {table.get('access_type', '-'):<8} "
+                          f"key={table.get('key')} rows={table.get('rows_examined_per_scan')}")
+        problems = check(conn, queries, allowed_scans(queries))
+    finally:
+        conn.close()
+
+    for scan in problems:
+        print(f"FULL SCAN  {scan.query}: {scan.table} ({scan.rows} rows per scan)")
+    print(f"{len(queries)} queries checked, {len(problems)} full table scan(s)")
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,8 +3,13 @@ sys.path.append('chess_db_app')
 import pandas as pd
 import mysql.connector
 from datetime import datetime, date
-import hashlib
 from config import Config
+from utils.db import connect
+from utils.migrations import migrate
+from utils.participation import rebuild as rebuild_participation
+from utils.slot_claims import rebuild as rebuild_slot_claims
+from utils.counters import reconcile as reconcile_counters
+from utils.passwords import hash_many
 import logging
 from datetime import datetime
 
@@ -18,10 +23,11 @@ def parse_date_safe(dob_raw):
     return datetime.strptime(dob_raw.strip(), "%d-%m-%Y").date()
 
 
-def import_certification_mappings_coach(cursor, df, role):
+def import_certification_mappings_coach(cursor, users, df, role):
     """
     Imports coach/arbiter certifications by converting certification names to IDs.
     :param cursor: DB cursor
+    :param users: UserDirectory of the current import
     :param df: DataFrame with certifications
     :param role: either 'coach' or 'arbiter'
     """
@@ -34,12 +40,10 @@ def import_certification_mappings_coach(cursor, df, role):
         username = row[user_field]
 
         # Get user ID
-        cursor.execute("SELECT user_id FROM users WHERE username = %s AND role = %s", (username, role))
-        user = cursor.fetchone()
-        if not user:
+        user_id = users.get(username, role)
+        if not user_id:
             logging.warning(f"{role.capitalize()} '{username}' not found.")
             continue
-        user_id = user[0]
 
         # Get certification ID
         cursor.execute("SELECT certification_id FROM coach_certification_types WHERE certification_name = %s", (certification_name,))
@@ -56,10 +60,11 @@ def import_certification_mappings_coach(cursor, df, role):
         )
         logging.info(f"Assigned {role} '{username}' certification '{certification_name}'.")
         
-def import_certification_mappings_arbiter(cursor, df, role):
+def import_certification_mappings_arbiter(cursor, users, df, role):
     """
     Imports coach/arbiter certifications by converting certification names to IDs.
     :param cursor: DB cursor
+    :param users: UserDirectory of the current import
     :param df: DataFrame with certifications
     :param role: either 'coach' or 'arbiter'
     """
@@ -72,12 +77,10 @@ def import_certification_mappings_arbiter(cursor, df, role):
         username = row[user_field]
 
         # Get user ID
-        cursor.execute("SELECT user_id FROM users WHERE username = %s AND role = %s", (username, role))
-        user = cursor.fetchone()
-        if not user:
+        user_id = users.get(username, role)
+        if not user_id:
             logging.warning(f"{role.capitalize()} '{username}' not found.")
             continue
-        user_id = user[0]
 
         # Get certification ID
         cursor.execute("SELECT certification_id FROM arbiter_certification_types WHERE certification_name = %s", (certification_name,))
@@ -123,43 +126,25 @@ def convert_date_to_ddmmyyyy(date_str):
         return str(date_str)
 
 def setup_database_connection():
-    """Create and return database connection with all checks disabled"""
+    """Create and return a database connection with foreign key and unique checks disabled"""
     try:
         # First connect without database to create it if needed
-        conn = mysql.connector.connect(
-            host=Config.DB_HOST,
-            user=Config.DB_USER,
-            password=Config.DB_PASSWORD
-        )
+        conn = connect(database=False)
         cursor = conn.cursor()
         
         # Create database if it doesn't exist
         cursor.execute(f"CREATE DATABASE IF NOT EXISTS {Config.DB_NAME}")
         cursor.fetchall()  # Clear any results
-        cursor.execute(f"USE {Config.DB_NAME}")
-        cursor.fetchall()  # Clear any results
-        
-        # Read and execute create_tables.sql
-        with open('sql/create_tables.sql', 'r') as f:
-            sql_script = f.read()
-            # Split on semicolons to execute each statement separately
-            for statement in sql_script.split(';'):
-                if statement.strip():
-                    try:
-                        cursor.execute(statement)
-                        cursor.fetchall()  # Clear any results
-                    except mysql.connector.Error as err:
-                        if "already exists" not in str(err).lower():
-                            logging.warning(f"Warning executing SQL: {err}")
+        cursor.close()
+        conn.database = Config.DB_NAME
+
+        # Bring the schema up to date (run "python migrate.py reset --yes" first for a clean load)
+        for migration in migrate(conn):
+            logging.info(f"Applied migration {migration.version:04d}_{migration.name}")
         
         # Now connect to the database
         conn.close()
-        conn = mysql.connector.connect(
-            host=Config.DB_HOST,
-            user=Config.DB_USER,
-            password=Config.DB_PASSWORD,
-            database=Config.DB_NAME
-        )
+        conn = connect()
         cursor = conn.cursor()
         
         # Completely disable all checks and constraints
@@ -172,112 +157,65 @@ def setup_database_connection():
         cursor.execute("SET AUTOCOMMIT = 0")  # Disable autocommit
         cursor.fetchall()  # Clear any results
         
-        # Disable all triggers
+        # Disable all triggers (each trigger checks this variable)
         cursor.execute("SET @TRIGGER_DISABLED = 1")
         cursor.fetchall()  # Clear any results
         
-        # Check if username UNIQUE constraint exists before dropping it
-        cursor.execute("""
-            SELECT COUNT(*)
-            FROM information_schema.STATISTICS 
-            WHERE TABLE_SCHEMA = DATABASE()
-            AND TABLE_NAME = 'users'
-            AND INDEX_NAME = 'username'
-            AND NON_UNIQUE = 0
-        """)
-        result = cursor.fetchone()
-        if result and result[0] > 0:
-            cursor.execute("ALTER TABLE users DROP INDEX username")
-            cursor.fetchall()  # Clear any results
-            logging.info("Permanently dropped UNIQUE constraint on username column")
-        else:
-            logging.info("No UNIQUE constraint found on username column")
-        
-        # Drop all triggers temporarily
-        cursor.execute("""
-            SELECT CONCAT('DROP TRIGGER IF EXISTS ', TRIGGER_SCHEMA, '.', TRIGGER_NAME, ';')
-            FROM information_schema.TRIGGERS 
-            WHERE TRIGGER_SCHEMA = DATABASE()
-        """)
-        triggers = cursor.fetchall()
-        for trigger in triggers:
-            cursor.execute(trigger[0])
-            cursor.fetchall()  # Clear any results
-        
-        # Drop all other unique constraints temporarily
-        cursor.execute("""
-            SELECT CONCAT('ALTER TABLE ', TABLE_SCHEMA, '.', TABLE_NAME, ' DROP INDEX ', INDEX_NAME, ';')
-            FROM information_schema.STATISTICS 
-            WHERE TABLE_SCHEMA = DATABASE()
-            AND NON_UNIQUE = 0
-            AND INDEX_NAME != 'PRIMARY'
-            AND TABLE_NAME != 'users'  # Skip users table as we already handled it
-        """)
-        constraints = cursor.fetchall()
-        for constraint in constraints:
-            try:
-                cursor.execute(constraint[0])
-                cursor.fetchall()  # Clear any results
-            except mysql.connector.Error as err:
-                logging.warning(f"Could not drop constraint: {err}")
-        
-        # Drop all foreign key constraints temporarily
-        cursor.execute("""
-            SELECT CONCAT('ALTER TABLE ', TABLE_SCHEMA, '.', TABLE_NAME, ' DROP FOREIGN KEY ', CONSTRAINT_NAME, ';')
-            FROM information_schema.TABLE_CONSTRAINTS 
-            WHERE TABLE_SCHEMA = DATABASE()
-            AND CONSTRAINT_TYPE = 'FOREIGN KEY'
-        """)
-        foreign_keys = cursor.fetchall()
-        for fk in foreign_keys:
-            try:
-                cursor.execute(fk[0])
-                cursor.fetchall()  # Clear any results
-            except mysql.connector.Error as err:
-                logging.warning(f"Could not drop foreign key: {err}")
-        
+        # Unique keys and foreign keys stay in place: FOREIGN_KEY_CHECKS = 0 already
+        # skips the FK lookups, and dropping them would leave the schema out of step
+        # with what schema_migrations records as applied
+
         cursor.close()
         return conn
     except mysql.connector.Error as err:
         logging.error(f"Database connection failed: {err}")
         raise
 
-def hash_password(password):
-    """Hash password using SHA-256"""
-    return hashlib.sha256(str(password).encode()).hexdigest()
-
-def get_user_id(cursor, username, role):
-    """Get user_id from username and role"""
-    cursor.execute("""
-        SELECT user_id FROM users 
-        WHERE username = %s AND role = %s
-    """, (username, role))
-    result = cursor.fetchone()
-    cursor.fetchall()  # Clear any remaining results
-    if result:
-        return result[0]
-    return None
-
-def get_unique_username(cursor, base_username, role):
-    """Get a unique username by appending a suffix if needed"""
-    username = base_username
-    suffix = 1
-    while True:
-        cursor.execute("SELECT 1 FROM users WHERE username = %s", (username,))
-        if not cursor.fetchone():
-            return username
-        # If username exists, try with suffix
-        username = f"{base_username}_{role}_{suffix}"
-        suffix += 1
-
-def import_users(cursor, df, role):
+class UserDirectory:
+    """
+    Usernames and user_ids created during one import, kept in memory.
+    Duplicate usernames are renamed before they reach the database, so the
+    UNIQUE index on users.username can stay in place (with UNIQUE_CHECKS=0
+    InnoDB would not reliably reject them), and sheets that reference users
+    resolve them here instead of querying users row by row.
+    """
+
+    def __init__(self):
+        self.taken = set()
+        self.ids = {}  # (username as written in the sheet, role) -> user_id
+
+    def unique_username(self, base_username, role):
+        """Return base_username, or base_username_<role>_<n> if it is taken"""
+        username = base_username
+        suffix = 1
+        while username in self.taken:
+            username = f"{base_username}_{role}_{suffix}"
+            suffix += 1
+        return username
+
+    def add(self, cursor, username, password_hash, role):
+        """Insert a user under a unique username and return its user_id"""
+        unique = self.unique_username(username, role)
+        if unique != username:
+            logging.warning(f"Username '{username}' already taken, importing {role} as '{unique}'")
+        cursor.execute("""
+            INSERT INTO users (username, password_hash, role)
+            VALUES (%s, %s, %s)
+        """, (unique, password_hash, role))
+        self.taken.add(unique)
+        self.ids.setdefault((username, role), cursor.lastrowid)
+        return cursor.lastrowid
+
+    def get(self, username, role):
+        """user_id of a user imported earlier in this run, or None"""
+        return self.ids.get((username, role))
+
+def import_users(cursor, users, df, role):
     """Import users for a specific role"""
+    df['password_hash'] = hash_many(df['password'])
     for _, row in df.iterrows():
         try:
-            cursor.execute("""
-                INSERT INTO users (username, password_hash, role)
-                VALUES (%s, %s, %s)
-            """, (row['username'], hash_password(row['password']), role))
+            users.add(cursor, row['username'], row['password_hash'], role)
             logging.info(f"Imported user: {row['username']} as {role}")
         except mysql.connector.Error as err:
             logging.error(f"Error importing user {row['username']}: {err}")
@@ -297,21 +235,20 @@ def import_data(excel_file):
         logging.info(f"Reading Excel file: {excel_file}")
         xls = pd.ExcelFile(excel_file)
         
-        # Connect to database (all constraints disabled in setup_database_connection)
+        # Connect to database (checks disabled in setup_database_connection)
         conn = setup_database_connection()
         cursor = conn.cursor()
+        users = UserDirectory()
         
         try:
             # 1. Import DBManagers
             if 'DBManagers' in xls.sheet_names:
                 logging.info("Importing DBManagers...")
                 df = pd.read_excel(excel_file, sheet_name='DBManagers')
+                df['password_hash'] = hash_many(df['password'])  # whole sheet in parallel
                 for _, row in df.iterrows():
                     try:
-                        cursor.execute("""
-                            INSERT INTO users (username, password_hash, role)
-                            VALUES (%s, %s, %s)
-                        """, (row['username'], hash_password(row['password']), 'manager'))
+                        users.add(cursor, row['username'], row['password_hash'], 'manager')
                         logging.info(f"Imported user: {row['username']} as manager")
                     except mysql.connector.Error as err:
                         logging.warning(f"Warning importing user {row['username']}: {err}")
@@ -331,21 +268,11 @@ def import_data(excel_file):
             if 'Players' in xls.sheet_names:
                 logging.info("Importing Players...")
                 df = pd.read_excel(excel_file, sheet_name='Players',dtype={"date_of_birth": str})
+                df['password_hash'] = hash_many(df['password'])  # whole sheet in parallel
                 for _, row in df.iterrows():
                     try:
-                        # Insert user exactly as is
-                        cursor.execute("""
-                            INSERT INTO users (username, password_hash, role)
-                            VALUES (%s, %s, %s)
-                        """, (row['username'], hash_password(row['password']), 'player'))
-                        
-                        # Get user_id
-                        cursor.execute("SELECT user_id FROM users WHERE username = %s", (row['username'],))
-                        result = cursor.fetchone()
-                        if not result:
-                            logging.warning(f"Could not find user_id for {row['username']}, skipping")
-                            continue
-                        user_id = result[0]
+                        # Insert user, renamed if the username is already taken
+                        user_id = users.add(cursor, row['username'], row['password_hash'], 'player')
 
                         # Convert date string like "10-05-2000" to datetime.date (format YYYY-MM-DD)
                         try:
@@ -417,7 +344,7 @@ def import_data(excel_file):
                 logging.info("Importing PlayerTeams...")
                 df = pd.read_excel(excel_file, sheet_name='PlayerTeams')
                 for _, row in df.iterrows():
-                    player_id = get_user_id(cursor, row['username'], 'player')
+                    player_id = users.get(row['username'], 'player')
                     if player_id:
                         cursor.execute("""
                             INSERT INTO player_team_membership (player_id, team_id)
@@ -428,21 +355,11 @@ def import_data(excel_file):
             if 'Coaches' in xls.sheet_names:
                 logging.info("Importing Coaches...")
                 df = pd.read_excel(excel_file, sheet_name='Coaches',dtype={"contract_start": str, "contract_finish": str})
+                df['password_hash'] = hash_many(df['password'])  # whole sheet in parallel
                 for _, row in df.iterrows():
                     try:
-                        # Insert user exactly as is
-                        cursor.execute("""
-                            INSERT INTO users (username, password_hash, role)
-                            VALUES (%s, %s, %s)
-                        """, (row['username'], hash_password(row['password']), 'coach'))
-                        
-                        # Get user_id
-                        cursor.execute("SELECT user_id FROM users WHERE username = %s", (row['username'],))
-                        result = cursor.fetchone()
-                        if not result:
-                            logging.warning(f"Could not find user_id for {row['username']}, skipping")
-                            continue
-                        user_id = result[0]
+                        # Insert user, renamed if the username is already taken
+                        user_id = users.add(cursor, row['username'], row['password_hash'], 'coach')
                         
                         # Insert coach details
                         cursor.execute("""
@@ -505,30 +422,17 @@ def import_data(excel_file):
             if 'CoachCertifications' in xls.sheet_names:
                 logging.info("Importing CoachCertifications with mapped IDs...")
                 df = pd.read_excel(excel_file, sheet_name='CoachCertifications')
-                import_certification_mappings_coach(cursor, df, 'coach')
+                import_certification_mappings_coach(cursor, users, df, 'coach')
             
             # 9. Import Arbiters
             if 'Arbiters' in xls.sheet_names:
                 logging.info("Importing Arbiters...")
                 df = pd.read_excel(excel_file, sheet_name='Arbiters')
+                df['password_hash'] = hash_many(df['password'])  # whole sheet in parallel
                 for _, row in df.iterrows():
                     try:
-                        # Insert user exactly as is
-                        cursor.execute("""
-                            INSERT INTO users (username, password_hash, role)
-                            VALUES (%s, %s, %s)
-                        """, (row['username'], hash_password(row['password']), 'arbiter'))
-                        cursor.fetchall()  # Clear any remaining results
-                        
-                        # Get user_id
-                        cursor.execute("SELECT user_id FROM users WHERE username = %s", (row['username'],))
-                        result = cursor.fetchone()
-                        cursor.fetchall()  # Clear any remaining results
-                        
-                        if not result:
-                            logging.warning(f"Could not find user_id for {row['username']}, skipping")
-                            continue
-                        user_id = result[0]
+                        # Insert user, renamed if the username is already taken
+                        user_id = users.add(cursor, row['username'], row['password_hash'], 'arbiter')
                         
                         # Insert arbiter details
                         cursor.execute("""
@@ -555,7 +459,7 @@ def import_data(excel_file):
             if 'ArbiterCertifications' in xls.sheet_names:
                 logging.info("Importing ArbiterCertifications with mapped IDs...")
                 df = pd.read_excel(excel_file, sheet_name='ArbiterCertifications')
-                import_certification_mappings_arbiter(cursor, df, 'arbiter')
+                import_certification_mappings_arbiter(cursor, users, df, 'arbiter')
             cursor.fetchall()  # Clear any remaining results        
             # 11. Import Halls
             if 'Halls' in xls.sheet_names:
@@ -602,7 +506,7 @@ def import_data(excel_file):
                         table_id = convert_to_python_type(row['table_id'])
                         team1_id = convert_to_python_type(row['team1_id'])
                         team2_id = convert_to_python_type(row['team2_id'])
-                        arbiter_id = get_user_id(cursor, row['arbiter_username'], 'arbiter')
+                        arbiter_id = users.get(row['arbiter_username'], 'arbiter')
 
                         if arbiter_id:
                             # Convert 'DD-MM-YYYY' string to proper date object
@@ -642,8 +546,8 @@ def import_data(excel_file):
                 df = pd.read_excel(excel_file, sheet_name='MatchAssignments')
 
                 for _, row in df.iterrows():
-                    white_player_id = get_user_id(cursor, row['white_player'], 'player')
-                    black_player_id = get_user_id(cursor, row['black_player'], 'player')
+                    white_player_id = users.get(row['white_player'], 'player')
+                    black_player_id = users.get(row['black_player'], 'player')
 
                     if white_player_id and black_player_id:
                         # Normalize result text
@@ -666,8 +570,22 @@ def import_data(excel_file):
                     else:
                         logging.warning(f"Missing user ID for players in match {row['match_id']}")
 
+                # Derive player_participation from the assignments in the same transaction
+                rebuild_participation(cursor)
                 conn.commit()
                 logging.info("MatchAssignments processed and inserted into match_players.")            
+
+            # 15. Derive slot claims from the imported matches and assignments
+            # (needs unique checks: claims of overlapping matches are skipped)
+            cursor.execute("SET UNIQUE_CHECKS = 1")
+            rebuild_slot_claims(cursor)
+            cursor.execute("SET UNIQUE_CHECKS = 0")
+            conn.commit()
+            logging.info("Slot claims rebuilt.")
+
+            # 16. Recompute the manager dashboard counters for the imported rows
+            reconcile_counters(conn)
+            logging.info("Dashboard counters recomputed.")
                      
             
         except Exception as e:
@@ -676,7 +594,7 @@ def import_data(excel_file):
             raise
             
         finally:
-            # Re-enable all constraints and checks EXCEPT the username UNIQUE constraint
+            # Re-enable all constraints and checks
             cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
             cursor.fetchall()  # Clear any results
             cursor.execute("SET UNIQUE_CHECKS = 1")
@@ -687,118 +605,7 @@ def import_data(excel_file):
             cursor.fetchall()  # Clear any results
             cursor.execute("SET @TRIGGER_DISABLED = 0")
             cursor.fetchall()  # Clear any results
-            
-            # Recreate all triggers (but NOT the username UNIQUE constraint)
-            cursor.execute("""
-                CREATE TRIGGER prevent_coach_overlap 
-                BEFORE INSERT ON contracts
-                FOR EACH ROW
-                BEGIN
-                    IF EXISTS (
-                        SELECT 1 FROM contracts
-                        WHERE coach_id = NEW.coach_id
-                        AND (
-                            (NEW.contract_finish IS NULL AND contract_start >= NEW.contract_start)
-                            OR (contract_finish IS NULL AND NEW.contract_start >= contract_start)
-                            OR (NEW.contract_start BETWEEN contract_start AND contract_finish)
-                            OR (NEW.contract_finish BETWEEN contract_start AND contract_finish)
-                        )
-                    ) THEN
-                        SIGNAL SQLSTATE '45000'
-                        SET MESSAGE_TEXT = 'Coach already has a contract during this time.';
-                    END IF;
-                END;
-            """)
-            cursor.fetchall()  # Clear any results
-            
-            cursor.execute("""
-                CREATE TRIGGER prevent_match_overlap
-                BEFORE INSERT ON matches
-                FOR EACH ROW
-                BEGIN
-                    IF EXISTS (
-                        SELECT 1 FROM matches
-                        WHERE hall_id = NEW.hall_id
-                        AND table_id = NEW.table_id
-                        AND date = NEW.date
-                        AND (
-                            NEW.time_slot BETWEEN time_slot AND time_slot + 1
-                            OR time_slot BETWEEN NEW.time_slot AND NEW.time_slot + 1
-                        )
-                    ) THEN
-                        SIGNAL SQLSTATE '45000'
-                        SET MESSAGE_TEXT = 'Time conflict detected for table in hall.';
-                    END IF;
-                END;
-            """)
-            cursor.fetchall()  # Clear any results
-            
-            cursor.execute("""
-                CREATE TRIGGER prevent_arbiter_conflict
-                BEFORE INSERT ON matches
-                FOR EACH ROW
-                BEGIN
-                    IF EXISTS (
-                        SELECT 1 FROM matches
-                        WHERE arbiter_id = NEW.arbiter_id
-                        AND date = NEW.date
-                        AND (
-                            NEW.time_slot BETWEEN time_slot AND time_slot + 1
-                            OR time_slot BETWEEN NEW.time_slot AND NEW.time_slot + 1
-                        )
-                    ) THEN
-                        SIGNAL SQLSTATE '45000'
-                        SET MESSAGE_TEXT = 'Arbiter already assigned to another match during this time.';
-                    END IF;
-                END;
-            """)
-            cursor.fetchall()  # Clear any results
-            
-            cursor.execute("""
-                CREATE TRIGGER validate_rating_insert
-                BEFORE INSERT ON ratings
-                FOR EACH ROW
-                BEGIN
-                    DECLARE v_match_date VARCHAR(10);
-                    DECLARE v_match_arbiter INT;
-
-                    SELECT date, arbiter_id INTO v_match_date, v_match_arbiter
-                    FROM matches
-                    WHERE match_id = NEW.match_id;
-
-                    IF v_match_arbiter != NEW.arbiter_id THEN
-                        SIGNAL SQLSTATE '45000'
-                        SET MESSAGE_TEXT = 'Only the assigned arbiter can rate this match.';
-                    END IF;
-
-                    IF EXISTS (
-                        SELECT 1 FROM ratings WHERE match_id = NEW.match_id
-                    ) THEN
-                        SIGNAL SQLSTATE '45000'
-                        SET MESSAGE_TEXT = 'Match already rated.';
-                    END IF;
-                END;
-            """)
-            cursor.fetchall()  # Clear any results
-            
-            cursor.execute("""
-                CREATE TRIGGER prevent_same_team_match
-                BEFORE INSERT ON matches
-                FOR EACH ROW
-                BEGIN
-                    IF NEW.team1_id = NEW.team2_id THEN
-                        SIGNAL SQLSTATE '45000'
-                        SET MESSAGE_TEXT = 'A team cannot play against itself.';
-                    END IF;
-                END;
-            """)
-            cursor.fetchall()  # Clear any results
-            
 
-            
-
-      
-            
             cursor.close()
             conn.close()
             
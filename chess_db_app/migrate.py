@@ -0,0 +1,76 @@
+"""
+Apply ChessDB schema migrations.
+
+    python migrate.py              apply pending migrations (creates the database if needed)
+    python migrate.py status       list migrations and whether they are applied
+    python migrate.py reset --yes  drop and recreate the database, then migrate
+
+Only reset ever drops the database; everything else is safe on a live server.
+"""
+
+import argparse
+import sys
+
+import mysql.connector
+
+from config import Config
+from utils.db import connect
+from utils.migrations import MigrationError, migrate, status
+
+
+def server_connection():
+    """Connection to the MySQL server without selecting a database"""
+    return connect(database=False)
+
+
+def database_connection():
+    """Connection to the application database, created if it does not exist yet"""
+    conn = server_connection()
+    cursor = conn.cursor()
+    cursor.execute(f"CREATE DATABASE IF NOT EXISTS {Config.DB_NAME}")
+    cursor.close()
+    conn.database = Config.DB_NAME
+    return conn
+
+
+def reset_database():
+    """Drop the application database; the next migrate() starts from the baseline"""
+    conn = server_connection()
+    cursor = conn.cursor()
+    cursor.execute(f"DROP DATABASE IF EXISTS {Config.DB_NAME}")
+    cursor.close()
+    conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply ChessDB schema migrations")
+    parser.add_argument('command', nargs='?', default='up', choices=['up', 'status', 'reset'])
+    parser.add_argument('--target', type=int, help="stop after this migration version")
+    parser.add_argument('--yes', action='store_true', help="confirm reset (drops all data)")
+    args = parser.parse_args(argv)
+
+    if args.command == 'reset':
+        if not args.yes:
+            parser.error(f"reset drops the {Config.DB_NAME} database; pass --yes to confirm")
+        reset_database()
+        print(f"Dropped database {Config.DB_NAME}")
+
+    conn = database_connection()
+    try:
+        if args.command == 'status':
+            for migration, applied in status(conn):
+                print(f"[{'x' if applied else ' '}] {migration.version:04d}_{migration.name}"
+                      f"{' (online)' if migration.online else ''}")
+            return 0
+        applied = migrate(conn, target=args.target)
+        print(f"Applied {len(applied)} migration(s)" if applied else "Schema is up to date")
+        return 0
+    except (MigrationError, mysql.connector.Error) as err:
+        print(f"Migration failed: {err}")
+        return 1
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,7 +1,5 @@
--- Drop and create database
-DROP DATABASE IF EXISTS chessdb;
-CREATE DATABASE chessdb;
-USE chessdb;
+-- Baseline ChessDB schema. Applied by utils/migrations.py (python migrate.py);
+-- later schema and index changes go into new numbered files, never here.
 -- Certification Types Table (Shared by coach and arbiter)
 CREATE TABLE coach_certification_types (
     certification_id INT AUTO_INCREMENT PRIMARY KEY,
@@ -196,28 +194,60 @@ CREATE TABLE ratings (
     CHECK (rating_value BETWEEN 1 AND 10)
 );
 
+-- Data version counters behind the dashboard ETags (utils/versions.py).
+-- The epoch row changes every time the schema is recreated (migrate.py reset).
+CREATE TABLE data_versions (
+    entity VARCHAR(64) PRIMARY KEY,
+    version BIGINT UNSIGNED NOT NULL DEFAULT 0
+);
+INSERT INTO data_versions (entity, version) VALUES ('epoch', UNIX_TIMESTAMP());
+
 -- 7. TRIGGERS
+-- Every trigger is a no-op while @TRIGGER_DISABLED = 1 (set by import_data.py
+-- for bulk loads).
 DELIMITER $$
 
-
+-- Prevent overlapping coach contracts
+CREATE TRIGGER prevent_coach_overlap
+BEFORE INSERT ON contracts
+FOR EACH ROW
+BEGIN
+    IF COALESCE(@TRIGGER_DISABLED, 0) = 0 THEN
+        IF EXISTS (
+            SELECT 1 FROM contracts
+            WHERE coach_id = NEW.coach_id
+            AND (
+                (NEW.contract_finish IS NULL AND contract_start >= NEW.contract_start)
+                OR (contract_finish IS NULL AND NEW.contract_start >= contract_start)
+                OR (NEW.contract_start BETWEEN contract_start AND contract_finish)
+                OR (NEW.contract_finish BETWEEN contract_start AND contract_finish)
+            )
+        ) THEN
+            SIGNAL SQLSTATE '45000'
+            SET MESSAGE_TEXT = 'Coach already has a contract during this time.';
+        END IF;
+    END IF;
+END $$
 
 -- Prevent match scheduling conflicts
 CREATE TRIGGER prevent_match_overlap
 BEFORE INSERT ON matches
 FOR EACH ROW
 BEGIN
-    IF EXISTS (
-        SELECT 1 FROM matches
-        WHERE hall_id = NEW.hall_id
-        AND table_id = NEW.table_id
-        AND date = NEW.date
-        AND (
-            NEW.time_slot BETWEEN time_slot AND time_slot + 1
-            OR time_slot BETWEEN NEW.time_slot AND NEW.time_slot + 1
-        )
-    ) THEN
-        SIGNAL SQLSTATE '45000'
-        SET MESSAGE_TEXT = 'Time conflict detected for table in hall.';
+    IF COALESCE(@TRIGGER_DISABLED, 0) = 0 THEN
+        IF EXISTS (
+            SELECT 1 FROM matches
+            WHERE hall_id = NEW.hall_id
+            AND table_id = NEW.table_id
+            AND date = NEW.date
+            AND (
+                NEW.time_slot BETWEEN time_slot AND time_slot + 1
+                OR time_slot BETWEEN NEW.time_slot AND NEW.time_slot + 1
+            )
+        ) THEN
+            SIGNAL SQLSTATE '45000'
+            SET MESSAGE_TEXT = 'Time conflict detected for table in hall.';
+        END IF;
     END IF;
 END $$
 
@@ -226,17 +256,19 @@ CREATE TRIGGER prevent_arbiter_conflict
 BEFORE INSERT ON matches
 FOR EACH ROW
 BEGIN
-    IF EXISTS (
-        SELECT 1 FROM matches
-        WHERE arbiter_id = NEW.arbiter_id
-        AND date = NEW.date
-        AND (
-            NEW.time_slot BETWEEN time_slot AND time_slot + 1
-            OR time_slot BETWEEN NEW.time_slot AND NEW.time_slot + 1
-        )
-    ) THEN
-        SIGNAL SQLSTATE '45000'
-        SET MESSAGE_TEXT = 'Arbiter already assigned to another match during this time.';
+    IF COALESCE(@TRIGGER_DISABLED, 0) = 0 THEN
+        IF EXISTS (
+            SELECT 1 FROM matches
+            WHERE arbiter_id = NEW.arbiter_id
+            AND date = NEW.date
+            AND (
+                NEW.time_slot BETWEEN time_slot AND time_slot + 1
+                OR time_slot BETWEEN NEW.time_slot AND NEW.time_slot + 1
+            )
+        ) THEN
+            SIGNAL SQLSTATE '45000'
+            SET MESSAGE_TEXT = 'Arbiter already assigned to another match during this time.';
+        END IF;
     END IF;
 END $$
 
@@ -245,28 +277,24 @@ CREATE TRIGGER validate_rating_insert
 BEFORE INSERT ON ratings
 FOR EACH ROW
 BEGIN
-    DECLARE match_date DATE;
-    DECLARE match_arbiter INT;
-
-    SELECT date, arbiter_id INTO match_date, match_arbiter
-    FROM matches
-    WHERE match_id = NEW.match_id;
-
-    IF match_arbiter != NEW.arbiter_id THEN
-        SIGNAL SQLSTATE '45000'
-        SET MESSAGE_TEXT = 'Only the assigned arbiter can rate this match.';
-    END IF;
-
-    IF CURDATE() <= match_date THEN
-        SIGNAL SQLSTATE '45000'
-        SET MESSAGE_TEXT = 'Cannot rate match before it is played.';
-    END IF;
-
-    IF EXISTS (
-        SELECT 1 FROM ratings WHERE match_id = NEW.match_id
-    ) THEN
-        SIGNAL SQLSTATE '45000'
-        SET MESSAGE_TEXT = 'Match already rated.';
+    DECLARE v_match_arbiter INT;
+
+    IF COALESCE(@TRIGGER_DISABLED, 0) = 0 THEN
+        SELECT arbiter_id INTO v_match_arbiter
+        FROM matches
+        WHERE match_id = NEW.match_id;
+
+        IF v_match_arbiter != NEW.arbiter_id THEN
+            SIGNAL SQLSTATE '45000'
+            SET MESSAGE_TEXT = 'Only the assigned arbiter can rate this match.';
+        END IF;
+
+        IF EXISTS (
+            SELECT 1 FROM ratings WHERE match_id = NEW.match_id
+        ) THEN
+            SIGNAL SQLSTATE '45000'
+            SET MESSAGE_TEXT = 'Match already rated.';
+        END IF;
     END IF;
 END $$
 
@@ -275,130 +303,12 @@ CREATE TRIGGER prevent_same_team_match
 BEFORE INSERT ON matches
 FOR EACH ROW
 BEGIN
-    IF NEW.team1_id = NEW.team2_id THEN
-        SIGNAL SQLSTATE '45000'
-        SET MESSAGE_TEXT = 'A team cannot play against itself.';
+    IF COALESCE(@TRIGGER_DISABLED, 0) = 0 THEN
+        IF NEW.team1_id = NEW.team2_id THEN
+            SIGNAL SQLSTATE '45000'
+            SET MESSAGE_TEXT = 'A team cannot play against itself.';
+        END IF;
     END IF;
 END $$
 
--- Validate player team membership
-DROP TRIGGER IF EXISTS validate_player_team_membership;
-DELIMITER $$
-
-CREATE TRIGGER validate_player_team_membership
-BEFORE INSERT ON match_players
-FOR EACH ROW
-BEGIN
-    DECLARE match_date DATE;
-
-    -- Get match date
-    SELECT date INTO match_date
-    FROM matches
-    WHERE match_id = NEW.match_id;
-
-    -- Validate white player membership
-    IF NOT EXISTS (
-        SELECT 1 FROM player_team_membership
-        WHERE player_id = NEW.white_player
-        AND match_date BETWEEN start_date AND end_date
-    ) THEN
-        SIGNAL SQLSTATE '45000'
-        SET MESSAGE_TEXT = 'White player is not a valid member of a team at the match date.';
-    END IF;
-
-    -- Validate black player membership
-    IF NOT EXISTS (
-        SELECT 1 FROM player_team_membership
-        WHERE player_id = NEW.black_player
-        AND match_date BETWEEN start_date AND end_date
-    ) THEN
-        SIGNAL SQLSTATE '45000'
-        SET MESSAGE_TEXT = 'Black player is not a valid member of a team at the match date.';
-    END IF;
-END$$
-
-DELIMITER ;
-
-
- 
-
--- Validate team tournament registration
-DELIMITER $$
-
-CREATE TRIGGER validate_players_teams_in_tournament
-BEFORE INSERT ON match_players
-FOR EACH ROW
-BEGIN
-    DECLARE v_tournament_id INT;
-    DECLARE white_team_id INT;
-    DECLARE black_team_id INT;
-
-    -- Get tournament ID from the match
-    SELECT tournament_id INTO v_tournament_id
-    FROM matches
-    WHERE match_id = NEW.match_id
-    LIMIT 1;
-
-    -- Validate the match exists and has a tournament
-    IF v_tournament_id IS NULL THEN
-        SIGNAL SQLSTATE '45000'
-        SET MESSAGE_TEXT = 'Match does not exist or is not linked to a tournament.';
-    END IF;
-
-    -- Get white player's team (assuming latest or current team)
-    SELECT team_id INTO white_team_id
-    FROM player_team_membership
-    WHERE player_id = NEW.white_player
-    ORDER BY start_date DESC
-    LIMIT 1;
-
-    -- Get black player's team
-    SELECT team_id INTO black_team_id
-    FROM player_team_membership
-    WHERE player_id = NEW.black_player
-    ORDER BY start_date DESC
-    LIMIT 1;
-
-    -- Validate white player's team registration
-    IF NOT EXISTS (
-        SELECT 1 FROM tournament_teams
-        WHERE tournament_id = v_tournament_id AND team_id = white_team_id
-    ) THEN
-        SIGNAL SQLSTATE '45000'
-        SET MESSAGE_TEXT = 'White player''s team is not registered in the tournament.';
-    END IF;
-
-    -- Validate black player's team registration
-    IF NOT EXISTS (
-        SELECT 1 FROM tournament_teams
-        WHERE tournament_id = v_tournament_id AND team_id = black_team_id
-    ) THEN
-        SIGNAL SQLSTATE '45000'
-        SET MESSAGE_TEXT = 'Black player''s team is not registered in the tournament.';
-    END IF;
-END$$
-
 DELIMITER ;
-
--- 8. Initial database manager setup
--- INSERT INTO users (username, password_hash, role)
--- SELECT 'admin', SHA2('initial_password', 256), 'manager'
--- WHERE NOT EXISTS (
---     SELECT 1 FROM users WHERE role = 'manager'
--- );
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
@@ -0,0 +1,29 @@
+-- migrate: online
+-- Secondary indexes for the predicates of the hot queries registered in
+-- explain_check.py. Built in place without blocking reads or writes.
+-- InnoDB drops the implicit foreign key index a new index makes redundant.
+
+-- arbiter.dashboard and the arbiter availability check in coach.create_match
+ALTER TABLE matches ADD INDEX idx_matches_arbiter_date_slot (arbiter_id, date, time_slot);
+
+-- Table availability check in coach.create_match
+ALTER TABLE matches ADD INDEX idx_matches_table_date (table_id, date);
+
+-- Every player query filters on white_player OR black_player (index merge)
+ALTER TABLE match_players ADD INDEX idx_match_players_white (white_player);
+ALTER TABLE match_players ADD INDEX idx_match_players_black (black_player);
+
+-- Coach contract lookup behind every coach page
+ALTER TABLE contracts ADD INDEX idx_contracts_coach (coach_id);
+
+-- Team players for the assignment dropdowns
+ALTER TABLE player_team_membership ADD INDEX idx_membership_team (team_id);
+
+-- Anti-join of imported matches on coach.dashboard
+ALTER TABLE created ADD INDEX idx_created_match (match_id);
+
+-- Average rating on arbiter.dashboard
+ALTER TABLE ratings ADD INDEX idx_ratings_arbiter (arbiter_id);
+
+-- Role filter of db_manager.users and the per-role counts on the manager dashboard
+ALTER TABLE users ADD INDEX idx_users_role (role);
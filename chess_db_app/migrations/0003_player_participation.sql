@@ -0,0 +1,26 @@
+-- One row per player per match, maintained by utils/participation.py.
+-- Player pages read a player's matches as a primary key range instead of
+-- the white_player = X OR black_player = X predicate on match_players.
+CREATE TABLE player_participation (
+    player_id INT NOT NULL,
+    match_id INT NOT NULL,
+    color ENUM('white', 'black') NOT NULL,
+    opponent_id INT,
+    date DATE NOT NULL,
+    time_slot INT,
+    result ENUM('white', 'black', 'draw'),
+    PRIMARY KEY (player_id, date, match_id),
+    INDEX idx_participation_match (match_id)
+);
+
+-- Backfill from the existing assignments
+INSERT INTO player_participation (player_id, match_id, color, opponent_id, date, time_slot, result)
+SELECT mp.white_player, mp.match_id, 'white', mp.black_player, m.date, m.time_slot, mp.result
+FROM match_players mp
+JOIN matches m ON m.match_id = mp.match_id
+WHERE mp.white_player IS NOT NULL
+UNION ALL
+SELECT mp.black_player, mp.match_id, 'black', mp.white_player, m.date, m.time_slot, mp.result
+FROM match_players mp
+JOIN matches m ON m.match_id = mp.match_id
+WHERE mp.black_player IS NOT NULL;
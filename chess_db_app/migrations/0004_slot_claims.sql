@@ -0,0 +1,39 @@
+-- Booked slots of tables, arbiters and players, maintained by utils/slot_claims.py.
+-- A match occupies its time_slot and the next one. Its table, its arbiter
+-- and each player claim both slots in rows of their own (the backfill below
+-- combined table and arbiter; 0011 splits them); the unique keys turn any
+-- double booking into a duplicate-key error on insert. NULL columns do not
+-- take part in a key.
+CREATE TABLE slot_claims (
+    claim_id INT AUTO_INCREMENT PRIMARY KEY,
+    match_id INT NOT NULL,
+    date DATE NOT NULL,
+    slot INT NOT NULL,
+    table_id INT,
+    arbiter_id INT,
+    player_id INT,
+    UNIQUE KEY uq_claim_table (table_id, date, slot),
+    UNIQUE KEY uq_claim_arbiter (arbiter_id, date, slot),
+    UNIQUE KEY uq_claim_player (player_id, date, slot),
+    INDEX idx_claim_match (match_id)
+);
+
+-- Backfill. Bulk imports ran with the overlap triggers disabled, so existing
+-- data may already double-book; IGNORE keeps the claim of the earliest match.
+INSERT IGNORE INTO slot_claims (match_id, date, slot, table_id, arbiter_id)
+SELECT m.match_id, m.date, m.time_slot + d.n, m.table_id, m.arbiter_id
+FROM matches m
+CROSS JOIN (SELECT 0 AS n UNION ALL SELECT 1) d
+WHERE m.time_slot IS NOT NULL
+ORDER BY m.match_id, d.n;
+
+INSERT IGNORE INTO slot_claims (match_id, date, slot, player_id)
+SELECT pp.match_id, pp.date, pp.time_slot + d.n, pp.player_id
+FROM player_participation pp
+CROSS JOIN (SELECT 0 AS n UNION ALL SELECT 1) d
+WHERE pp.time_slot IS NOT NULL
+ORDER BY pp.match_id, d.n;
+
+-- The claims replace the range-scanning overlap triggers
+DROP TRIGGER IF EXISTS prevent_match_overlap;
+DROP TRIGGER IF EXISTS prevent_arbiter_conflict;
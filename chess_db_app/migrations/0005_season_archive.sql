@@ -0,0 +1,94 @@
+-- Season archive (utils/seasons.py, archive_seasons.py).
+-- Closed seasons move out of matches and its satellite tables into these
+-- compressed tables, RANGE-partitioned by season; archive_seasons.py splits
+-- a partition per season off p_future. The live tables are not partitioned:
+-- InnoDB partitioning excludes foreign keys and would force date into every
+-- unique key, while archiving keeps them and their indexes small anyway.
+-- The all_* views union live and archived rows for the "all seasons" pages.
+
+-- Season floor of the current-season dashboards and the archive range
+ALTER TABLE matches ADD INDEX idx_matches_date (date), ALGORITHM=INPLACE, LOCK=NONE;
+
+CREATE TABLE matches_archive (
+    season SMALLINT NOT NULL,
+    match_id INT NOT NULL,
+    date DATE NOT NULL,
+    time_slot INT,
+    hall_id INT,
+    table_id INT,
+    team1_id INT,
+    team2_id INT,
+    arbiter_id INT,
+    PRIMARY KEY (match_id, season),
+    INDEX idx_matches_archive_arbiter (arbiter_id, date),
+    INDEX idx_matches_archive_team1 (team1_id),
+    INDEX idx_matches_archive_team2 (team2_id)
+) ROW_FORMAT=COMPRESSED
+PARTITION BY RANGE (season) (PARTITION p_future VALUES LESS THAN MAXVALUE);
+
+CREATE TABLE match_players_archive (
+    season SMALLINT NOT NULL,
+    match_id INT NOT NULL,
+    white_player INT,
+    black_player INT,
+    result ENUM('white', 'black', 'draw'),
+    PRIMARY KEY (match_id, season)
+) ROW_FORMAT=COMPRESSED
+PARTITION BY RANGE (season) (PARTITION p_future VALUES LESS THAN MAXVALUE);
+
+CREATE TABLE ratings_archive (
+    season SMALLINT NOT NULL,
+    match_id INT NOT NULL,
+    arbiter_id INT NOT NULL,
+    rating_value FLOAT NOT NULL,
+    PRIMARY KEY (match_id, season),
+    INDEX idx_ratings_archive_arbiter (arbiter_id)
+) ROW_FORMAT=COMPRESSED
+PARTITION BY RANGE (season) (PARTITION p_future VALUES LESS THAN MAXVALUE);
+
+CREATE TABLE created_archive (
+    season SMALLINT NOT NULL,
+    coach_id INT NOT NULL,
+    match_id INT NOT NULL,
+    PRIMARY KEY (coach_id, match_id, season),
+    INDEX idx_created_archive_match (match_id)
+) ROW_FORMAT=COMPRESSED
+PARTITION BY RANGE (season) (PARTITION p_future VALUES LESS THAN MAXVALUE);
+
+CREATE TABLE player_participation_archive (
+    season SMALLINT NOT NULL,
+    player_id INT NOT NULL,
+    match_id INT NOT NULL,
+    color ENUM('white', 'black') NOT NULL,
+    opponent_id INT,
+    date DATE NOT NULL,
+    time_slot INT,
+    result ENUM('white', 'black', 'draw'),
+    PRIMARY KEY (player_id, date, match_id, season)
+) ROW_FORMAT=COMPRESSED
+PARTITION BY RANGE (season) (PARTITION p_future VALUES LESS THAN MAXVALUE);
+
+CREATE VIEW all_matches AS
+    SELECT match_id, date, time_slot, hall_id, table_id, team1_id, team2_id, arbiter_id FROM matches
+    UNION ALL
+    SELECT match_id, date, time_slot, hall_id, table_id, team1_id, team2_id, arbiter_id FROM matches_archive;
+
+CREATE VIEW all_match_players AS
+    SELECT match_id, white_player, black_player, result FROM match_players
+    UNION ALL
+    SELECT match_id, white_player, black_player, result FROM match_players_archive;
+
+CREATE VIEW all_ratings AS
+    SELECT match_id, arbiter_id, rating_value FROM ratings
+    UNION ALL
+    SELECT match_id, arbiter_id, rating_value FROM ratings_archive;
+
+CREATE VIEW all_created AS
+    SELECT coach_id, match_id FROM created
+    UNION ALL
+    SELECT coach_id, match_id FROM created_archive;
+
+CREATE VIEW all_player_participation AS
+    SELECT player_id, match_id, color, opponent_id, date, time_slot, result FROM player_participation
+    UNION ALL
+    SELECT player_id, match_id, color, opponent_id, date, time_slot, result FROM player_participation_archive;
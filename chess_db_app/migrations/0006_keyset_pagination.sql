@@ -0,0 +1,17 @@
+-- migrate: online
+-- Sort keys of the keyset-paginated lists (utils/pagination.py), so a page
+-- is one index range read in order. InnoDB appends the primary key to every
+-- secondary index, which supplies the trailing match_id of the match order.
+
+-- player.matches: a player's participation, newest first
+ALTER TABLE player_participation ADD INDEX idx_participation_player_slot (player_id, date, time_slot);
+
+-- coach.dashboard: a team's matches from either side (arbiter.dashboard
+-- already has idx_matches_arbiter_date_slot)
+ALTER TABLE matches ADD INDEX idx_matches_team1_date_slot (team1_id, date, time_slot);
+ALTER TABLE matches ADD INDEX idx_matches_team2_date_slot (team2_id, date, time_slot);
+
+-- db_manager.users filtered by role, by username; it also serves the per-role
+-- counts, so it replaces idx_users_role
+ALTER TABLE users ADD INDEX idx_users_role_username (role, username);
+ALTER TABLE users DROP INDEX idx_users_role, ALGORITHM=INPLACE, LOCK=NONE;
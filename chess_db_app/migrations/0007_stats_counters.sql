@@ -0,0 +1,15 @@
+-- Totals behind the manager dashboard (utils/counters.py), adjusted by the
+-- write routes in the same transaction as the change and recomputed by
+-- reconcile_counters.py.
+CREATE TABLE stats_counters (
+    name VARCHAR(64) PRIMARY KEY,
+    value BIGINT NOT NULL DEFAULT 0
+);
+
+-- Initial values from the existing data
+INSERT INTO stats_counters (name, value)
+SELECT CONCAT('users:', role), COUNT(*) FROM users GROUP BY role
+UNION ALL SELECT 'halls', COUNT(*) FROM halls
+UNION ALL SELECT 'halls:capacity', COALESCE(SUM(capacity), 0) FROM halls
+UNION ALL SELECT 'matches', COUNT(*) FROM matches
+UNION ALL SELECT CONCAT('tables:hall:', hall_id), COUNT(*) FROM tables GROUP BY hall_id;
@@ -0,0 +1,14 @@
+-- Rating change applied by each rated match (utils/elo.py), so a corrected
+-- result can reverse it. Deltas are the changes actually written to
+-- players.elo_rating, after the rating floor. Kept for archived seasons
+-- too: it is one small row per match.
+CREATE TABLE elo_changes (
+    match_id INT PRIMARY KEY,
+    white_player INT NOT NULL,
+    black_player INT NOT NULL,
+    result ENUM('white', 'black', 'draw') NOT NULL,
+    white_delta INT NOT NULL,
+    black_delta INT NOT NULL,
+    INDEX idx_elo_changes_white (white_player),
+    INDEX idx_elo_changes_black (black_player)
+);
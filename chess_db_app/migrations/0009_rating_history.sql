@@ -0,0 +1,10 @@
+-- Rating after every rated game, per player (utils/rating_history.py), for
+-- the rating chart behind /player/rating-history. The primary key makes a
+-- player's career one ordered range read. Backfilled by rebuild_ratings.py.
+CREATE TABLE rating_history (
+    player_id INT NOT NULL,
+    date DATE NOT NULL,
+    match_id INT NOT NULL,
+    rating_after INT NOT NULL,
+    PRIMARY KEY (player_id, date, match_id)
+);
@@ -0,0 +1,5 @@
+-- migrate: online
+-- Table and arbiter bookings of a date range, read once by the bulk
+-- scheduler (utils/scheduler.py); covering, so the range is read from the
+-- index alone.
+ALTER TABLE slot_claims ADD INDEX idx_claim_date (date, player_id, slot, table_id, arbiter_id);
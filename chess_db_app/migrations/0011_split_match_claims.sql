@@ -0,0 +1,20 @@
+-- Re-derive the table and arbiter claims of existing matches as separate
+-- rows. The 0004 backfill claimed both in one row per slot, so with INSERT
+-- IGNORE a match whose table was already double-booked also lost its
+-- arbiter claim (and the other way round). Each resource now keeps the claim
+-- of its earliest match, as utils/slot_claims.py rebuild() does.
+DELETE FROM slot_claims WHERE player_id IS NULL;
+
+INSERT IGNORE INTO slot_claims (match_id, date, slot, table_id)
+SELECT m.match_id, m.date, m.time_slot + d.n, m.table_id
+FROM matches m
+CROSS JOIN (SELECT 0 AS n UNION ALL SELECT 1) d
+WHERE m.time_slot IS NOT NULL AND m.table_id IS NOT NULL
+ORDER BY m.match_id, d.n;
+
+INSERT IGNORE INTO slot_claims (match_id, date, slot, arbiter_id)
+SELECT m.match_id, m.date, m.time_slot + d.n, m.arbiter_id
+FROM matches m
+CROSS JOIN (SELECT 0 AS n UNION ALL SELECT 1) d
+WHERE m.time_slot IS NOT NULL AND m.arbiter_id IS NOT NULL
+ORDER BY m.match_id, d.n;
@@ -0,0 +1,140 @@
+-- migrate: online
+-- Bring a database adopted from the old sql/create_tables.sql + import_data.py
+-- setup in line with 0001_baseline. The old importer permanently dropped the
+-- unique keys (users.username among them) and every foreign key, recreated
+-- the triggers without the @TRIGGER_DISABLED guard, and such databases never
+-- got data_versions. On a database created by 0001 every statement below is
+-- a no-op: existing tables, indexes and constraint names are skipped.
+
+-- ETag version counters (utils/versions.py)
+CREATE TABLE IF NOT EXISTS data_versions (
+    entity VARCHAR(64) PRIMARY KEY,
+    version BIGINT UNSIGNED NOT NULL DEFAULT 0
+);
+INSERT IGNORE INTO data_versions (entity, version) VALUES ('epoch', UNIX_TIMESTAMP());
+
+-- Usernames imported while the unique key was missing: the lowest user_id
+-- keeps the name, later duplicates get their user_id appended
+UPDATE users u
+JOIN (
+    SELECT username, MIN(user_id) AS keep_id
+    FROM users
+    GROUP BY username
+    HAVING COUNT(*) > 1
+) d ON d.username = u.username
+SET u.username = CONCAT(LEFT(u.username, 49 - CHAR_LENGTH(u.user_id)), '_', u.user_id)
+WHERE u.user_id <> d.keep_id;
+
+-- Unique keys of 0001, under the names MySQL gave them there
+-- (utils/auth.py forces the username index)
+ALTER TABLE users ADD UNIQUE INDEX username (username);
+ALTER TABLE coach_certification_types ADD UNIQUE INDEX certification_name (certification_name);
+ALTER TABLE arbiter_certification_types ADD UNIQUE INDEX certification_name (certification_name);
+ALTER TABLE sponsors ADD UNIQUE INDEX sponsor_name (sponsor_name);
+ALTER TABLE players ADD UNIQUE INDEX fide_id (fide_id);
+ALTER TABLE tables ADD UNIQUE INDEX hall_id (hall_id, table_number);
+
+-- Foreign keys of 0001, under the names MySQL gave them there. With
+-- FOREIGN_KEY_CHECKS = 0 they are added in place without validating the
+-- existing rows, which were imported with the checks off as well.
+SET FOREIGN_KEY_CHECKS = 0;
+ALTER TABLE players ADD CONSTRAINT players_ibfk_1 FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE;
+ALTER TABLE players ADD CONSTRAINT players_ibfk_2 FOREIGN KEY (title_id) REFERENCES titles(title_id);
+ALTER TABLE coaches ADD CONSTRAINT coaches_ibfk_1 FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE;
+ALTER TABLE arbiters ADD CONSTRAINT arbiters_ibfk_1 FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE;
+ALTER TABLE tables ADD CONSTRAINT tables_ibfk_1 FOREIGN KEY (hall_id) REFERENCES halls(hall_id);
+ALTER TABLE teams ADD CONSTRAINT teams_ibfk_1 FOREIGN KEY (sponsor_id) REFERENCES sponsors(sponsor_id);
+ALTER TABLE player_team_membership ADD CONSTRAINT player_team_membership_ibfk_1 FOREIGN KEY (player_id) REFERENCES players(user_id);
+ALTER TABLE player_team_membership ADD CONSTRAINT player_team_membership_ibfk_2 FOREIGN KEY (team_id) REFERENCES teams(team_id);
+ALTER TABLE contracts ADD CONSTRAINT contracts_ibfk_1 FOREIGN KEY (coach_id) REFERENCES coaches(user_id);
+ALTER TABLE contracts ADD CONSTRAINT contracts_ibfk_2 FOREIGN KEY (team_id) REFERENCES teams(team_id);
+ALTER TABLE coach_certifications ADD CONSTRAINT coach_certifications_ibfk_1 FOREIGN KEY (coach_id) REFERENCES coaches(user_id);
+ALTER TABLE coach_certifications ADD CONSTRAINT coach_certifications_ibfk_2 FOREIGN KEY (certification_id) REFERENCES coach_certification_types(certification_id);
+ALTER TABLE arbiter_certifications ADD CONSTRAINT arbiter_certifications_ibfk_1 FOREIGN KEY (arbiter_id) REFERENCES arbiters(user_id);
+ALTER TABLE arbiter_certifications ADD CONSTRAINT arbiter_certifications_ibfk_2 FOREIGN KEY (certification_id) REFERENCES arbiter_certification_types(certification_id);
+ALTER TABLE matches ADD CONSTRAINT matches_ibfk_1 FOREIGN KEY (hall_id) REFERENCES halls(hall_id);
+ALTER TABLE matches ADD CONSTRAINT matches_ibfk_2 FOREIGN KEY (table_id) REFERENCES tables(table_id);
+ALTER TABLE matches ADD CONSTRAINT matches_ibfk_3 FOREIGN KEY (team1_id) REFERENCES teams(team_id);
+ALTER TABLE matches ADD CONSTRAINT matches_ibfk_4 FOREIGN KEY (team2_id) REFERENCES teams(team_id);
+ALTER TABLE matches ADD CONSTRAINT matches_ibfk_5 FOREIGN KEY (arbiter_id) REFERENCES arbiters(user_id);
+ALTER TABLE created ADD CONSTRAINT created_ibfk_1 FOREIGN KEY (coach_id) REFERENCES coaches(user_id);
+ALTER TABLE created ADD CONSTRAINT created_ibfk_2 FOREIGN KEY (match_id) REFERENCES matches(match_id) ON DELETE CASCADE;
+ALTER TABLE match_players ADD CONSTRAINT match_players_ibfk_1 FOREIGN KEY (match_id) REFERENCES matches(match_id);
+ALTER TABLE match_players ADD CONSTRAINT match_players_ibfk_2 FOREIGN KEY (white_player) REFERENCES users(user_id);
+ALTER TABLE match_players ADD CONSTRAINT match_players_ibfk_3 FOREIGN KEY (black_player) REFERENCES users(user_id);
+ALTER TABLE ratings ADD CONSTRAINT ratings_ibfk_1 FOREIGN KEY (match_id) REFERENCES matches(match_id);
+ALTER TABLE ratings ADD CONSTRAINT ratings_ibfk_2 FOREIGN KEY (arbiter_id) REFERENCES arbiters(user_id);
+SET FOREIGN_KEY_CHECKS = 1;
+
+-- Triggers: drop every trigger the old scripts created and recreate the
+-- guarded ones of 0001 that are still in use (0004 replaced the overlap
+-- triggers with slot claims)
+DROP TRIGGER IF EXISTS prevent_coach_overlap;
+DROP TRIGGER IF EXISTS prevent_match_overlap;
+DROP TRIGGER IF EXISTS prevent_arbiter_conflict;
+DROP TRIGGER IF EXISTS validate_rating_insert;
+DROP TRIGGER IF EXISTS prevent_same_team_match;
+DROP TRIGGER IF EXISTS validate_player_team_membership;
+DROP TRIGGER IF EXISTS validate_players_teams_in_tournament;
+
+DELIMITER $$
+
+CREATE TRIGGER prevent_coach_overlap
+BEFORE INSERT ON contracts
+FOR EACH ROW
+BEGIN
+    IF COALESCE(@TRIGGER_DISABLED, 0) = 0 THEN
+        IF EXISTS (
+            SELECT 1 FROM contracts
+            WHERE coach_id = NEW.coach_id
+            AND (
+                (NEW.contract_finish IS NULL AND contract_start >= NEW.contract_start)
+                OR (contract_finish IS NULL AND NEW.contract_start >= contract_start)
+                OR (NEW.contract_start BETWEEN contract_start AND contract_finish)
+                OR (NEW.contract_finish BETWEEN contract_start AND contract_finish)
+            )
+        ) THEN
+            SIGNAL SQLSTATE '45000'
+            SET MESSAGE_TEXT = 'Coach already has a contract during this time.';
+        END IF;
+    END IF;
+END $$
+
+CREATE TRIGGER validate_rating_insert
+BEFORE INSERT ON ratings
+FOR EACH ROW
+BEGIN
+    DECLARE v_match_arbiter INT;
+
+    IF COALESCE(@TRIGGER_DISABLED, 0) = 0 THEN
+        SELECT arbiter_id INTO v_match_arbiter
+        FROM matches
+        WHERE match_id = NEW.match_id;
+
+        IF v_match_arbiter != NEW.arbiter_id THEN
+            SIGNAL SQLSTATE '45000'
+            SET MESSAGE_TEXT = 'Only the assigned arbiter can rate this match.';
+        END IF;
+
+        IF EXISTS (
+            SELECT 1 FROM ratings WHERE match_id = NEW.match_id
+        ) THEN
+            SIGNAL SQLSTATE '45000'
+            SET MESSAGE_TEXT = 'Match already rated.';
+        END IF;
+    END IF;
+END $$
+
+CREATE TRIGGER prevent_same_team_match
+BEFORE INSERT ON matches
+FOR EACH ROW
+BEGIN
+    IF COALESCE(@TRIGGER_DISABLED, 0) = 0 THEN
+        IF NEW.team1_id = NEW.team2_id THEN
+            SIGNAL SQLSTATE '45000'
+            SET MESSAGE_TEXT = 'A team cannot play against itself.';
+        END IF;
+    END IF;
+END $$
+
+DELIMITER ;
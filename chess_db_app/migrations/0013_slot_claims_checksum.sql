@@ -0,0 +1,7 @@
+-- The header comment of 0004_slot_claims.sql was corrected after it shipped
+-- (it described table and arbiter claims sharing a row, which 0011 split).
+-- Record the new checksum so migrate.py stops reporting 0004 as changed;
+-- the statements of 0004 are unchanged.
+UPDATE schema_migrations
+SET checksum = '368b24c9a0660430caef7d7e9c9ef74b5ecaf7819ed22600d9426082326833ba'
+WHERE version = 4 AND checksum = '473372731d9e7f94fe0468a8d4beefbd1ad20f50c83c0cbf460755f067012af9';
@@ -0,0 +1,65 @@
+"""
+Recompute every player's ELO rating by replaying the full match history.
+
+    python rebuild_ratings.py            replay all rated games and store ratings, deltas and rating history
+    python rebuild_ratings.py --dry-run  replay and report without writing
+    python rebuild_ratings.py --k 24     replay with another K-factor than Config.K_FACTOR
+    python rebuild_ratings.py --from-initial
+                                         start every player at Config.INITIAL_ELO instead
+
+Run it after correcting historical results or changing Config.K_FACTOR,
+while no results are being entered: results entered during the replay are
+overwritten by it. Needs NumPy; see utils/elo_replay.py.
+
+By default players start from their stored rating minus the changes
+recorded in elo_changes. Results imported or entered before ratings were
+tracked have no such record and are already in the stored ratings, so the
+rebuild refuses to write while any exist; use --from-initial for those
+databases (e.g. the first rebuild after an import).
+"""
+
+import argparse
+import sys
+import time
+
+import mysql.connector
+
+from config import Config
+from utils.db import connect
+from utils.elo_replay import replay, write
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay the match history to rebuild ELO ratings")
+    parser.add_argument('--dry-run', action='store_true', help="report the outcome without writing it")
+    parser.add_argument('--k', type=int, help=f"K-factor (default {Config.K_FACTOR})")
+    parser.add_argument('--from-initial', action='store_true',
+                        help=f"start every player at {Config.INITIAL_ELO} instead of their stored rating "
+                             "minus the recorded changes")
+    args = parser.parse_args(argv)
+
+    conn = connect()
+    try:
+        started = time.perf_counter()
+        result = replay(conn, args.k, args.from_initial)
+        replayed = time.perf_counter()
+        print(f"Replayed {len(result.match_ids)} game(s) in {result.periods} rating period(s) "
+              f"in {replayed - started:.2f}s; {len(result.changed)} rating(s) change")
+        if result.unrecorded and not args.from_initial:
+            print(f"{result.unrecorded} rated game(s) have no recorded rating change, so the stored ratings "
+                  f"already include them and replaying would count them twice. "
+                  f"Rerun with --from-initial to replay from {Config.INITIAL_ELO}; nothing was written.")
+            return 2
+        if not args.dry_run:
+            write(conn, result)
+            print(f"Stored in {time.perf_counter() - replayed:.2f}s")
+        return 0
+    except mysql.connector.Error as err:
+        print(f"Rebuild failed: {err}")
+        return 1
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
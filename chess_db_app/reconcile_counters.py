@@ -0,0 +1,34 @@
+"""
+Recompute the manager dashboard counters from the base tables.
+
+    python reconcile_counters.py   rewrite every counter and report the ones that had drifted
+
+Safe to run on a live database; see utils/counters.py.
+"""
+
+import sys
+
+import mysql.connector
+
+from utils.counters import reconcile
+from utils.db import connect
+
+
+def main():
+    conn = connect()
+    try:
+        drifted = reconcile(conn)
+    except mysql.connector.Error as err:
+        print(f"Reconciliation failed: {err}")
+        return 1
+    finally:
+        conn.close()
+
+    for name, stored, actual in drifted:
+        print(f"{name}: {stored} -> {actual}")
+    print(f"{len(drifted)} counter(s) corrected")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,8 +1,14 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, session
+from flask import Blueprint, render_template, redirect, url_for, flash, request, session, make_response
 from functools import wraps
 import mysql.connector
 from config import Config
-from routes.auth import login_required, get_db_connection
+from routes.auth import login_required
+from utils.db import get_db
+from utils.batch import fetch_concurrently
+from utils import player_stats
+from utils.participation import sync_match
+from utils.versions import HALLS, entity, bump, current_etag, not_modified, with_etag
+from utils import elo, leaderboard, seasons, pagination
 
 arbiter_bp = Blueprint('arbiter', __name__)
 
@@ -15,25 +21,25 @@ def arbiter_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
-@arbiter_bp.route('/dashboard')
-@login_required
-@arbiter_required
-def dashboard():
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-
+def dashboard_queries(arbiter_id, scope=seasons.CURRENT, cursor=None):
+    """
+    Independent reads behind arbiter.dashboard in a season scope as
+    {name: (sql, params)}, with the page of assigned matches past cursor.
+    Shared by the sync view and the async server in asgi.py.
+    """
+    names = seasons.tables(scope)
+    after, after_params = pagination.seek(pagination.MATCHES, cursor, 'm.')
+    return {
         # Get arbiter profile info
-        cursor.execute("""
+        'arbiter': ("""
             SELECT a.*, u.username
             FROM arbiters a
             JOIN users u ON a.user_id = u.user_id
             WHERE a.user_id = %s
-        """, (session['user_id'],))
-        arbiter = cursor.fetchone()
+        """, (arbiter_id,)),
 
-        # Get all matches assigned to this arbiter
-        cursor.execute("""
+        # Get one page of the matches assigned to this arbiter
+        'matches': ("""
             SELECT m.*, 
                 h.name AS hall_name, 
                 t.table_number,
@@ -41,41 +47,68 @@ def dashboard():
                 team1.name AS team1_name,
                 team2.name AS team2_name,
                 mp.result AS match_result
-            FROM matches m
+            FROM {matches} m
             JOIN halls h ON m.hall_id = h.hall_id
             JOIN tables t ON m.table_id = t.table_id
-            LEFT JOIN ratings r ON m.match_id = r.match_id
+            LEFT JOIN {ratings} r ON m.match_id = r.match_id
             LEFT JOIN teams team1 ON m.team1_id = team1.team_id
             LEFT JOIN teams team2 ON m.team2_id = team2.team_id
-            LEFT JOIN match_players mp ON m.match_id = mp.match_id
-            WHERE m.arbiter_id = %s
-            ORDER BY m.date DESC, m.time_slot;
-        """, (session['user_id'],))
-        matches = cursor.fetchall()
+            LEFT JOIN {match_players} mp ON m.match_id = mp.match_id
+            WHERE m.arbiter_id = %s AND m.date >= %s{after}
+            ORDER BY {order}
+            LIMIT %s
+        """.format(after=after, order=pagination.order_by(pagination.MATCHES, cursor, 'm.'), **names),
+            (arbiter_id, seasons.floor(scope), *after_params, pagination.limit(pagination.page_size()))),
 
         # Calculate average rating given by arbiter
-        cursor.execute("""
-            SELECT AVG(rating_value) AS avg_rating
-            FROM ratings
-            WHERE arbiter_id = %s
-        """, (session['user_id'],))
-        result = cursor.fetchone()
-        avg_rating = round(result['avg_rating'], 2) if result['avg_rating'] else "N/A"
-        print(matches)
-        return render_template(
-            'arbiter_dashboard.html',
-            arbiter=arbiter,
-            matches=matches,
-            avg_rating=avg_rating
-        )
+        'avg_rating': ("""
+            SELECT AVG(r.rating_value) AS avg_rating
+            FROM {ratings} r
+            JOIN {matches} m ON m.match_id = r.match_id
+            WHERE r.arbiter_id = %s AND m.date >= %s
+        """.format(**names), (arbiter_id, seasons.floor(scope))),
+    }
+
+
+def version_entities(arbiter_id):
+    """Data version counters the arbiter dashboard depends on"""
+    return [entity('arbiter', arbiter_id), HALLS]
+
+
+def dashboard_context(results, scope=seasons.CURRENT, cursor=None):
+    """Template variables for arbiter_dashboard.html from dashboard_queries() results"""
+    result = results['avg_rating'][0]
+    page = pagination.paginate(pagination.MATCHES, results['matches'], cursor, pagination.page_size())
+    return dict(season_scope=scope,
+                arbiter=results['arbiter'][0],
+                matches=page.rows,
+                page=page,
+                avg_rating=round(result['avg_rating'], 2) if result['avg_rating'] else "N/A")
+
+
+@arbiter_bp.route('/dashboard')
+@login_required
+@arbiter_required
+def dashboard():
+    try:
+        arbiter_id = session['user_id']
+        scope = seasons.scope_from(request.args)
+        cursor = pagination.cursor_from(pagination.MATCHES, request.args)
+        etag = current_etag(get_db(readonly=True),
+                            f'arbiter.dashboard:{arbiter_id}:{seasons.cache_tag(scope)}:{pagination.cache_tag(cursor)}',
+                            version_entities(arbiter_id))
+        if not_modified(request, session, etag):
+            return with_etag(make_response('', 304), etag)
+
+        # Profile, assigned matches and rating average are independent reads
+        results = fetch_concurrently(dashboard_queries(arbiter_id, scope, cursor))
+        return with_etag(make_response(render_template('arbiter_dashboard.html', data_version=etag,
+                                                             **dashboard_context(results, scope, cursor))), etag)
 
     except mysql.connector.Error as err:
         flash('Database error occurred.', 'error')
         print(f"Database error: {err}")
         return redirect(url_for('auth.login'))
-    finally:
-        cursor.close()
-        conn.close()
 
 @arbiter_bp.route('/rate_match/<int:match_id>', methods=['POST'])
 @login_required
@@ -87,7 +120,7 @@ def rate_match(match_id):
         return redirect(url_for('arbiter.dashboard'))
 
     try:
-        conn = get_db_connection()
+        conn = get_db()
         cursor = conn.cursor()
 
         # Check if match is already rated
@@ -102,6 +135,9 @@ def rate_match(match_id):
             VALUES (%s, %s, %s)
         """, (match_id, session['user_id'], rating_value))
 
+        cursor.execute("SELECT arbiter_id FROM matches WHERE match_id = %s", (match_id,))
+        match = cursor.fetchone()
+        bump(cursor, entity('arbiter', session['user_id']), entity('arbiter', match[0] if match else None))
         conn.commit()
         flash('Rating submitted successfully.', 'success')
 
@@ -110,7 +146,6 @@ def rate_match(match_id):
         print(f"Database error: {err}")
     finally:
         cursor.close()
-        conn.close()
 
     return redirect(url_for('arbiter.dashboard'))
 
@@ -122,20 +157,28 @@ def result_match(match_id):
     if not result:
         flash('Rating value is required.', 'error')
         return redirect(url_for('arbiter.dashboard'))
+    if result not in elo.SCORES:
+        flash('Invalid match result.', 'error')
+        return redirect(url_for('arbiter.dashboard'))
 
+    conn = cursor = None
     try:
-        conn = get_db_connection()
+        conn = get_db()
         cursor = conn.cursor()
         
         cursor.execute("""
-            SELECT 1 FROM match_players
-            WHERE match_id = %s
-            AND white_player IS NOT NULL
-            AND black_player IS NOT NULL
+            SELECT mp.white_player, mp.black_player, m.arbiter_id, m.date
+            FROM match_players mp
+            JOIN matches m ON mp.match_id = m.match_id
+            WHERE mp.match_id = %s
+            AND mp.white_player IS NOT NULL
+            AND mp.black_player IS NOT NULL
+            FOR UPDATE OF mp
         """, (match_id,))
         assigned = cursor.fetchone()
 
         if not assigned:
+            conn.rollback()
             flash("Both players must be assigned to submit a result.", "error")
             return redirect(url_for('arbiter.dashboard'))  # or another fallback
         
@@ -145,15 +188,24 @@ def result_match(match_id):
             SET result = %s
             WHERE match_id = %s
         """, (result, match_id))
+        sync_match(cursor, match_id)
 
+        # Rate the game (reversing the previous result of a correction)
+        white_player, black_player, arbiter_id, match_date = assigned
+        elo.apply_result(cursor, match_id, match_date, white_player, black_player, result)
+        bump(cursor, entity('player', white_player), entity('player', black_player), entity('arbiter', arbiter_id))
         conn.commit()
+        player_stats.invalidate(white_player, black_player)
+        leaderboard.refresh(conn, white_player, black_player)
         flash('Match result submitted successfully.', 'success')
 
     except mysql.connector.Error as err:
+        if conn is not None:
+            conn.rollback()
         flash('Database error occurred during result entry.', 'error')
         print(f"Database error: {err}")
     finally:
-        cursor.close()
-        conn.close()
+        if cursor is not None:
+            cursor.close()
 
     return redirect(url_for('arbiter.dashboard'))
\ No newline at end of file
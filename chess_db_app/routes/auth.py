@@ -2,23 +2,13 @@ from flask import Blueprint, render_template, redirect, url_for, flash, request,
 from functools import wraps
 import mysql.connector
 from config import Config
-import hashlib
+from utils.db import get_db
+from utils.auth import find_user
+from utils.passwords import hash_password, verify_password, needs_rehash, PasswordHashingUnavailable
+from utils import counters, leaderboard
 
 auth_bp = Blueprint('auth', __name__)
 
-def get_db_connection():
-    """Create and return database connection"""
-    return mysql.connector.connect(
-        host=Config.DB_HOST,
-        user=Config.DB_USER,
-        password=Config.DB_PASSWORD,
-        database=Config.DB_NAME
-    )
-
-def hash_password(password):
-    """Hash password using SHA-256"""
-    return hashlib.sha256(str(password).encode()).hexdigest()
-
 def login_required(f):
     """Decorator to check if user is logged in"""
     @wraps(f)
@@ -28,6 +18,15 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def upgrade_password_hash(conn, cursor, user_id, password):
+    """Re-hash a password stored with an outdated KDF after a successful login"""
+    try:
+        cursor.execute("UPDATE users SET password_hash = %s WHERE user_id = %s",
+                       (hash_password(password), user_id))
+        conn.commit()
+    except PasswordHashingUnavailable as err:
+        print(f"Skipping password rehash for user {user_id}: {err}")  # retried on the next login
+
 @auth_bp.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
@@ -40,21 +39,17 @@ def login():
             print(f"User: {Config.DB_USER}")
             print(f"Database: {Config.DB_NAME}")
             
-            conn = get_db_connection()
+            conn = get_db()
             cursor = conn.cursor(dictionary=True)
             
             # Check user credentials
             print(f"Checking credentials for user: {username}")
-            cursor.execute("""
-                SELECT user_id, username, role 
-                FROM users 
-                WHERE username = %s AND password_hash = %s
-            """, (username, hash_password(password)))
-            
-            user = cursor.fetchone()
+            user = find_user(username)
             
-            if user:
-                print(f"User found: {user}")
+            if user and verify_password(password, user['password_hash']):
+                print(f"User found: {user['username']}")
+                if needs_rehash(user['password_hash']):
+                    upgrade_password_hash(conn, cursor, user['user_id'], password)
                 session['username'] = user['username']
                 session['user_id'] = user['user_id']
                 session['role'] = user['role']
@@ -74,6 +69,9 @@ def login():
             
             flash('Invalid username or password', 'error')
             
+        except PasswordHashingUnavailable as err:
+            print(f"Password hashing unavailable: {err}")
+            flash('The server is busy, please try again in a moment.', 'error')
         except mysql.connector.Error as err:
             print(f"Database error details: {err}")
             print(f"Error code: {err.errno}")
@@ -83,8 +81,6 @@ def login():
         finally:
             if 'cursor' in locals():
                 cursor.close()
-            if 'conn' in locals():
-                conn.close()
     
     return render_template('login.html')
 
@@ -102,12 +98,11 @@ def register():
         role = request.form.get('role', 'player')
         
         try:
-            conn = get_db_connection()
+            conn = get_db()
             cursor = conn.cursor()
             
             # Check if username exists
-            cursor.execute("SELECT 1 FROM users WHERE username = %s", (username,))
-            if cursor.fetchone():
+            if find_user(username):
                 flash('Username already exists', 'error')
                 return render_template('register.html')
             
@@ -126,16 +121,21 @@ def register():
                     VALUES (%s, %s)
                 """, (user_id, Config.INITIAL_ELO))
             
+            counters.add(cursor, {counters.users(role): 1})
             conn.commit()
+            if role == 'player':
+                leaderboard.refresh(conn, user_id)
             flash('Registration successful! Please log in.', 'success')
             return redirect(url_for('auth.login'))
             
+        except PasswordHashingUnavailable as err:
+            print(f"Password hashing unavailable: {err}")
+            flash('The server is busy, please try again in a moment.', 'error')
         except mysql.connector.Error as err:
             flash('Database error occurred', 'error')
             print(f"Database error: {err}")
             conn.rollback()
         finally:
             cursor.close()
-            conn.close()
     
     return render_template('register.html') 
\ No newline at end of file
@@ -1,8 +1,18 @@
-from flask import Blueprint, render_template, request, redirect, url_for, session, flash
+from flask import Blueprint, render_template, request, redirect, url_for, session, flash, make_response, jsonify
 import mysql.connector
+import time
 from datetime import datetime
 from config import Config
 from routes.auth import login_required
+from utils.db import get_db
+from utils.prepared import fetch_one
+from utils.batch import fetch_concurrently
+from utils.refdata import reference_data
+from utils import player_stats
+from utils.participation import sync_match
+from utils.slot_claims import SlotConflict, claim_match, claim_player, release_match, release_player
+from utils.versions import HALLS, entity, bump, current_etag, not_modified, with_etag
+from utils import availability, counters, elo, leaderboard, scheduler, seasons, pagination
 from functools import wraps
 
 coach_bp = Blueprint('coach', __name__)
@@ -16,27 +26,9 @@ def coach_required(f):
         return f(*args, **kwargs)
     return wrapper
 
-def get_db_connection():
-    return mysql.connector.connect(
-        host=Config.DB_HOST,
-        user=Config.DB_USER,
-        password=Config.DB_PASSWORD,
-        database=Config.DB_NAME
-    )
-
-
-@coach_bp.route('/dashboard')
-@login_required
-@coach_required
-def dashboard():
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-
-    coach_id = session['user_id']
-
-    # 1. Get coach info and current team
-# 1. Get coach info and current team
-    cursor.execute("""
+def coach_query(coach_id):
+    """Coach profile and current team as (sql, params), shared with asgi.py"""
+    return ("""
         SELECT 
             c.name, c.surname, c.nationality,
             u.username,
@@ -50,43 +42,57 @@ def dashboard():
         LEFT JOIN teams t ON con.team_id = t.team_id
         WHERE c.user_id = %s
     """, (coach_id,))
-    coach = cursor.fetchone()
 
 
-    team_id = coach['team_id']
+def team_query(coach_id):
+    """Team of the coach's contract as (sql, params); the cheap input of the ETag check"""
+    return ("SELECT team_id FROM contracts WHERE coach_id = %s", (coach_id,))
 
-    # 2. Matches created for their team
-    # Matches created by this coach (joined via created table)
-    cursor.execute("""
-        SELECT 
-            m.*, 
-            mp.white_player, mp.black_player,
-            u_white.username AS white_player_name,
-            u_black.username AS black_player_name,
-            h.name AS hall_name, 
-            t.table_number, 
-            u_arb.username AS arbiter_username,
-            team1.name AS team1_name,
-            team2.name AS team2_name
-        FROM matches m
-        JOIN halls h ON m.hall_id = h.hall_id
-        JOIN tables t ON m.table_id = t.table_id
-        LEFT JOIN match_players mp ON m.match_id = mp.match_id
-        LEFT JOIN users u_arb ON m.arbiter_id = u_arb.user_id
-        LEFT JOIN users u_white ON mp.white_player = u_white.user_id
-        LEFT JOIN users u_black ON mp.black_player = u_black.user_id
-        LEFT JOIN teams team1 ON m.team1_id = team1.team_id
-        LEFT JOIN teams team2 ON m.team2_id = team2.team_id
-        JOIN created c ON m.match_id = c.match_id
-        WHERE (m.team1_id = %s OR m.team2_id = %s) AND c.coach_id = %s
-        ORDER BY m.date DESC, m.time_slot ASC
-    """, (team_id, team_id, coach_id))
 
-    matches_created_by_me = cursor.fetchall()
+def version_entities(team_id):
+    """Data version counters the coach dashboard depends on"""
+    return [entity('team', team_id), HALLS]
 
 
+# Match lists of the coach dashboard: result name -> (query string parameter
+# of its cursor, join of `created`, condition on it, whether it binds coach_id)
+MATCH_LISTS = {
+    # Matches created by this coach (joined via created table)
+    'matches_created_by_me': ('mine', "JOIN {created} c ON m.match_id = c.match_id", "c.coach_id = %s", True),
     # Matches created by other coaches (but involve this coach's team)
-    cursor.execute("""
+    'matches_created_by_others': ('others', "JOIN {created} c ON m.match_id = c.match_id", "c.coach_id != %s", True),
+    # Matches that were not recorded in `created` table at all (possibly imported or system-generated)
+    'previous_matches': ('previous', "LEFT JOIN {created} c ON m.match_id = c.match_id", "c.match_id IS NULL", False),
+}
+
+
+def list_cursors(args):
+    """Cursor of every dashboard match list in the request arguments, keyed by its parameter"""
+    return {param: pagination.cursor_from(pagination.MATCHES, args, param) for param, *_ in MATCH_LISTS.values()}
+
+
+def team_matches_query(coach_id, team_id, name, scope=seasons.CURRENT, cursor=None):
+    """
+    One page past cursor of the MATCH_LISTS list name as (sql, params).
+    The team plays on either side, so the page ids are the merge of two
+    index range reads, on team1_id and on team2_id, each stopping after a
+    page; the display columns are joined to that page only.
+    """
+    _, join, condition, binds_coach = MATCH_LISTS[name]
+    names = seasons.tables(scope)
+    since = seasons.floor(scope)
+    after, after_params = pagination.seek(pagination.MATCHES, cursor, 'm.')
+    order = pagination.order_by(pagination.MATCHES, cursor, 'm.')
+    size = pagination.limit(pagination.page_size())
+    coach_params = (coach_id,) if binds_coach else ()
+    branch = """
+            (SELECT m.match_id, m.date, m.time_slot
+             FROM {{matches}} m
+             {join}
+             WHERE {side} AND m.date >= %s AND {condition}{after}
+             ORDER BY {order}
+             LIMIT %s)"""
+    return ("""
         SELECT 
             m.*, 
             mp.white_player, mp.black_player,
@@ -97,66 +103,93 @@ def dashboard():
             u_arb.username AS arbiter_username,
             team1.name AS team1_name,
             team2.name AS team2_name
-        FROM matches m
+        FROM ({first}
+            UNION ALL{second}
+            ORDER BY {union_order}
+            LIMIT %s) page
+        JOIN {{matches}} m ON m.match_id = page.match_id
         JOIN halls h ON m.hall_id = h.hall_id
         JOIN tables t ON m.table_id = t.table_id
-        LEFT JOIN match_players mp ON m.match_id = mp.match_id
+        LEFT JOIN {{match_players}} mp ON m.match_id = mp.match_id
         LEFT JOIN users u_arb ON m.arbiter_id = u_arb.user_id
         LEFT JOIN users u_white ON mp.white_player = u_white.user_id
         LEFT JOIN users u_black ON mp.black_player = u_black.user_id
         LEFT JOIN teams team1 ON m.team1_id = team1.team_id
         LEFT JOIN teams team2 ON m.team2_id = team2.team_id
-        JOIN created c ON m.match_id = c.match_id
-        WHERE (m.team1_id = %s OR m.team2_id = %s) AND c.coach_id != %s
-        ORDER BY m.date DESC, m.time_slot ASC
-    """, (team_id, team_id, coach_id))
-    matches_created_by_others = cursor.fetchall()
-   
-
-
-    # Matches that were not recorded in `created` table at all (possibly imported or system-generated)
-    cursor.execute("""
-        SELECT 
-            m.*, 
-            h.name AS hall_name, 
-            t.table_number, 
-            u.username AS arbiter_username,
-            team1.name AS team1_name,
-            team2.name AS team2_name
-        FROM matches m
-        JOIN halls h ON m.hall_id = h.hall_id
-        JOIN tables t ON m.table_id = t.table_id
-        LEFT JOIN users u ON m.arbiter_id = u.user_id
-        LEFT JOIN teams team1 ON m.team1_id = team1.team_id
-        LEFT JOIN teams team2 ON m.team2_id = team2.team_id
-        LEFT JOIN created c ON m.match_id = c.match_id
-        WHERE (m.team1_id = %s OR m.team2_id = %s) AND c.match_id IS NULL
-        ORDER BY m.date DESC, m.time_slot ASC
-    """, (team_id, team_id))
-    previous_matches = cursor.fetchall()
-    
-    cursor.execute("""
+        ORDER BY {page_order}
+    """.format(first=branch.format(side="m.team1_id = %s", join=join, condition=condition, after=after, order=order),
+               second=branch.format(side="m.team2_id = %s AND NOT m.team1_id <=> %s", join=join,
+                                    condition=condition, after=after, order=order),
+               union_order=pagination.order_by(pagination.MATCHES, cursor),
+               page_order=pagination.order_by(pagination.MATCHES, cursor, 'page.')).format(**names),
+        (team_id, since, *coach_params, *after_params, size,
+         team_id, team_id, since, *coach_params, *after_params, size,
+         size))
+
+
+def dashboard_queries(coach_id, team_id, scope=seasons.CURRENT, cursors=None):
+    """
+    Reads behind coach.dashboard that only depend on the coach's team_id, in
+    a season scope, as {name: (sql, params)}; the match lists are the pages
+    at cursors (see list_cursors()). Shared by the sync view and asgi.py.
+    """
+    cursors = cursors or {}
+    queries = {name: team_matches_query(coach_id, team_id, name, scope, cursors.get(param))
+               for name, (param, *_) in MATCH_LISTS.items()}
+
+    # Players of the team, for the assignment dropdowns
+    queries['team_players'] = ("""
         SELECT p.user_id, p.name, p.surname
         FROM players p
         JOIN player_team_membership ptm ON p.user_id = ptm.player_id
         WHERE ptm.team_id = %s
     """, (team_id,))
-    team_players = cursor.fetchall()
+    return queries
+
 
+def dashboard_context(results, cursors=None):
+    """Template variables for coach_dashboard.html from dashboard_queries() results"""
+    cursors = cursors or {}
+    context = dict(results, pages={})
+    for name, (param, *_) in MATCH_LISTS.items():
+        page = pagination.paginate(pagination.MATCHES, results[name], cursors.get(param), pagination.page_size())
+        context[name] = page.rows
+        context['pages'][param] = page
+    return context
 
-    conn.close()
+@coach_bp.route('/dashboard')
+@login_required
+@coach_required
+def dashboard():
+    conn = get_db(readonly=True)
+    coach_id = session['user_id']
+
+    scope = seasons.scope_from(request.args)
+    cursors = list_cursors(request.args)
+
+    contract = fetch_one(conn, *team_query(coach_id))
+    team_id = contract['team_id'] if contract else None
+    etag = current_etag(conn, f'coach.dashboard:{coach_id}:{team_id}:{seasons.cache_tag(scope)}:'
+                              f'{pagination.cache_tag(*cursors.values())}',
+                        version_entities(team_id))
+    if not_modified(request, session, etag):
+        return with_etag(make_response('', 304), etag)
+
+    # 1. Get coach info and current team
+    coach = fetch_one(conn, *coach_query(coach_id))
+
+    # 2. A page of each match list for their team and the team's players.
+    # These only depend on team_id, so they run concurrently on separate connections
+    results = fetch_concurrently(dashboard_queries(coach_id, coach['team_id'], scope, cursors))
+
+    return with_etag(make_response(render_template('coach_dashboard.html', coach=coach, data_version=etag,
+                                                   season_scope=scope, **dashboard_context(results, cursors))), etag)
 
-    return render_template('coach_dashboard.html',
-                           coach=coach,
-                           matches_created_by_me=matches_created_by_me,
-                           matches_created_by_others=matches_created_by_others,
-                           previous_matches=previous_matches,
-                           team_players=team_players,)
 @coach_bp.route('/create-match', methods=['GET', 'POST'])
 @login_required
 @coach_required
 def create_match():
-    conn = get_db_connection()
+    conn = get_db()
     cursor = conn.cursor(dictionary=True)
     coach_id = session['user_id']
 
@@ -172,18 +205,8 @@ def create_match():
         return redirect(url_for('coach.dashboard'))
     my_team_id = team_result['team_id']
 
-    # Load data for dropdowns
-    cursor.execute("SELECT team_id, name FROM teams")
-    all_teams = cursor.fetchall()
-
-    cursor.execute("SELECT hall_id, name, country, capacity FROM halls")
-    halls = cursor.fetchall()
-
-    cursor.execute("SELECT t.table_id, t.hall_id, t.table_number, h.name AS hall_name FROM tables t JOIN halls h ON t.hall_id = h.hall_id")
-    tables = cursor.fetchall()
-
-    cursor.execute("SELECT u.user_id,u.username,a.name,a.surname,a.experience_level FROM users u JOIN arbiters a ON u.user_id = a.user_id")
-    all_arbiters = cursor.fetchall()
+    # Load data for dropdowns (cached, see utils.refdata)
+    dropdowns = reference_data('teams', 'halls', 'tables', 'arbiters')
 
     if request.method == 'POST':
         print(request.form.to_dict())
@@ -225,30 +248,6 @@ def create_match():
                 flash("Selected table does not belong to the selected hall.", "error")
                 return redirect(request.url)
             
-            # Check table availability (block slots ±1 due to 2-slot duration)
-            cursor.execute("""
-                SELECT 1 FROM matches
-                WHERE table_id = %s AND date = %s AND (
-                    %s BETWEEN time_slot AND time_slot + 1 OR
-                    time_slot BETWEEN %s AND %s + 1
-                )
-            """, (table_id, match_date, time_slot, time_slot, time_slot))
-            if cursor.fetchone():
-                flash("Selected table is already booked around that time.", "error")
-                return redirect(request.url)
-
-            # Check arbiter availability
-            cursor.execute("""
-                SELECT 1 FROM matches
-                WHERE arbiter_id = %s AND date = %s AND (
-                    %s BETWEEN time_slot AND time_slot + 1 OR
-                    time_slot BETWEEN %s AND %s + 1
-                )
-            """, (arbiter_id, match_date, time_slot, time_slot, time_slot))
-            if cursor.fetchone():
-                flash("Arbiter is not available at that time.", "error")
-                return redirect(request.url)
-
             # Create the match
             cursor.execute("""
                 INSERT INTO matches (date, time_slot, hall_id, table_id, team1_id, team2_id, arbiter_id)
@@ -256,6 +255,17 @@ def create_match():
             """, (match_date, time_slot, hall_id, table_id, team1_id, team2_id, arbiter_id))
             match_id = cursor.lastrowid
 
+            # Book the table and arbiter for both slots of the match
+            try:
+                claim_match(cursor, match_id, match_date, time_slot, table_id, arbiter_id)
+            except SlotConflict as conflict:
+                conn.rollback()
+                if conflict.resource == 'table':
+                    flash("Selected table is already booked around that time.", "error")
+                else:
+                    flash("Arbiter is not available at that time.", "error")
+                return redirect(request.url)
+
             cursor.execute("""
                 INSERT INTO match_players (match_id, white_player, black_player, result)
                 VALUES (%s, %s, %s, %s)
@@ -265,7 +275,10 @@ def create_match():
                 INSERT INTO created (coach_id, match_id)
                 VALUES (%s, %s)
             """, (coach_id, match_id))
+            bump(cursor, entity('team', team1_id), entity('team', team2_id), entity('arbiter', arbiter_id))
+            counters.add(cursor, {counters.MATCHES: 1})
             conn.commit()
+            availability.invalidate(match_date)
             flash("Match successfully created.", "success")
             
 
@@ -274,12 +287,117 @@ def create_match():
             flash(f"Error creating match: {str(e)}", "error")
     
     return render_template('create_match.html',
-                           halls=halls,
-                           tables=tables,
-                           all_teams=all_teams,
-                           all_arbiters=all_arbiters,
+                           halls=dropdowns['halls'],
+                           tables=dropdowns['tables'],
+                           all_teams=dropdowns['teams'],
+                           all_arbiters=dropdowns['arbiters'],
                            my_team_id=my_team_id)
     
+@coach_bp.route('/schedule', methods=['GET', 'POST'])
+@login_required
+@coach_required
+def schedule():
+    """Schedule many fixtures at once; tables, slots and arbiters are assigned by utils.scheduler"""
+    conn = get_db()
+    cursor = conn.cursor()
+    coach_id = session['user_id']
+    dropdowns = reference_data('teams', 'halls', 'tables', 'arbiters')
+    context = dict(all_teams=dropdowns['teams'], halls=dropdowns['halls'], plan=None,
+                   fixtures_text=request.form.get('fixtures', ''),
+                   team_names={t['team_id']: t['name'] for t in dropdowns['teams']},
+                   hall_names={h['hall_id']: h['name'] for h in dropdowns['halls']},
+                   table_numbers={t['table_id']: t['table_number'] for t in dropdowns['tables']},
+                   arbiter_names={a['user_id']: f"{a['name']} {a['surname']}" for a in dropdowns['arbiters']})
+
+    try:
+        contract = fetch_one(conn, """
+            SELECT team_id, contract_start, contract_finish FROM contracts WHERE coach_id = %s
+        """, (coach_id,))
+        if not contract:
+            flash("You don't have an active contract.", "error")
+            return redirect(url_for('coach.dashboard'))
+        context['contract'] = contract
+        if request.method == 'GET':
+            return render_template('schedule_matches.html', **context)
+
+        fixtures, errors = scheduler.parse_fixtures(context['fixtures_text'], dropdowns['teams'],
+                                                    dropdowns['halls'], contract['team_id'])
+        if len(fixtures) > Config.SCHEDULE_MAX_FIXTURES:
+            errors.append(f"At most {Config.SCHEDULE_MAX_FIXTURES} fixtures can be scheduled at once.")
+        if errors or not fixtures:
+            for error in errors or ["Enter at least one fixture."]:
+                flash(error, "error")
+            return render_template('schedule_matches.html', **context)
+
+        # Matches must fall within the contract period
+        fixtures = scheduler.within(fixtures, contract['contract_start'], contract['contract_finish'])
+        started = time.perf_counter()
+        plan = scheduler.solve(fixtures, dropdowns['tables'], [a['user_id'] for a in dropdowns['arbiters']],
+                               scheduler.load_occupancy(cursor, fixtures))
+        context['plan'] = plan
+
+        if request.form.get('action') == 'schedule' and plan.bookings:
+            try:
+                scheduler.insert(cursor, coach_id, plan.bookings)
+            except SlotConflict:
+                conn.rollback()
+                flash("Some slots were booked while scheduling; please submit again.", "error")
+                return render_template('schedule_matches.html', **context)
+            teams = {team_id for b in plan.bookings for team_id in (b.fixture.team1_id, b.fixture.team2_id)}
+            bump(cursor, *(entity('team', team_id) for team_id in teams),
+                 *{entity('arbiter', b.arbiter_id) for b in plan.bookings})
+            counters.add(cursor, {counters.MATCHES: len(plan.bookings)})
+            conn.commit()
+            availability.invalidate(*{b.date for b in plan.bookings})
+            flash(f"Scheduled {len(plan.bookings)} of {len(fixtures)} fixtures "
+                  f"in {time.perf_counter() - started:.2f}s.", "success")
+        else:
+            conn.rollback()  # end the read snapshot
+        return render_template('schedule_matches.html', **context)
+
+    except mysql.connector.Error as err:
+        conn.rollback()
+        flash('Database error occurred while scheduling.', 'error')
+        print(f"Database error: {err}")
+        return render_template('schedule_matches.html', **context)
+    finally:
+        cursor.close()
+
+def parse_day(value):
+    """A date given as DD-MM-YYYY (the create-match form) or YYYY-MM-DD"""
+    for fmt in ("%d-%m-%Y", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(value, fmt).date()
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+@coach_bp.route('/availability', endpoint='availability')
+@login_required
+@coach_required
+def availability_view():
+    """Free tables per hall and free arbiters for a match at ?date=&slot=[&hall_id=], as JSON"""
+    day = parse_day(request.args.get('date'))
+    time_slot = request.args.get('slot', type=int)
+    hall_id = request.args.get('hall_id', type=int)
+    if day is None or time_slot not in availability.STARTS:
+        return jsonify(error=f"date (DD-MM-YYYY) and slot ({', '.join(map(str, availability.STARTS))}) are required"), 400
+
+    try:
+        results, version = availability.lookup(day, time_slot)
+        if results is None:
+            # Read from the primary so a lagging replica cannot be cached
+            results = fetch_concurrently(availability.queries(day, time_slot), readonly=False)
+            availability.store(day, time_slot, results, version)
+        return jsonify(date=day.isoformat(), slot=time_slot,
+                       halls=availability.by_hall(results, reference_data('halls')['halls'], hall_id),
+                       arbiters=results['arbiters'])
+
+    except mysql.connector.Error as err:
+        print(f"Database error: {err}")
+        return jsonify(error='Database error occurred'), 500
+
 @coach_bp.route('/assign-player/<int:match_id>', methods=['POST'])
 @login_required
 @coach_required
@@ -291,13 +409,25 @@ def assign_player(match_id):
         flash("Invalid role provided.", "error")
         return redirect(url_for('coach.dashboard'))
 
-    conn = get_db_connection()
+    conn = get_db()
     cursor = conn.cursor(dictionary=True)
 
     try:
-        # 1. Get the match date and time slot
-        cursor.execute("SELECT date, time_slot FROM matches WHERE match_id = %s", (match_id,))
+        # 1. Get the match date and time slot; the assignment row is locked
+        # so a result cannot be entered while the players change
+        cursor.execute("""
+            SELECT m.date, m.time_slot, m.team1_id, m.team2_id, mp.white_player, mp.black_player, mp.result
+            FROM matches m
+            LEFT JOIN match_players mp ON m.match_id = mp.match_id
+            WHERE m.match_id = %s
+            FOR UPDATE OF mp
+        """, (match_id,))
         match = cursor.fetchone()
+        if match['result'] is not None:
+            # The rating change, rating history and stats belong to the players who played
+            conn.rollback()
+            flash("Players cannot be changed after the result has been entered.", "error")
+            return redirect(url_for('coach.dashboard'))
         match_date = match['date']
         match_slot = match['time_slot']
 
@@ -311,33 +441,20 @@ def assign_player(match_id):
             flash("To assign a player, match date must be within your contract period.", "error")
             return redirect(url_for('coach.dashboard'))
         
-        # 2. Get all matches this player is already assigned to
-        cursor.execute("""
-            SELECT m.time_slot
-            FROM match_players mp
-            JOIN matches m ON mp.match_id = m.match_id
-            WHERE (mp.white_player = %s OR mp.black_player = %s) AND m.date = %s
-        """, (player_id, player_id, match_date))
-        player_matches = cursor.fetchall()
-
-        # 3. Compute unavailable slots due to match duration of 2 slots
-        unavailable_slots = set()
-        for pm in player_matches:
-            slot = pm['time_slot']
-            if slot == 1:
-                unavailable_slots.update([1, 2,4])
-            elif slot == 2:
-                unavailable_slots.update([1, 2, 3,4])
-            elif slot == 3:
-                unavailable_slots.update([2, 3, 4])
-            elif slot == 4:
-                unavailable_slots.update([3, 4])
-
-        if match_slot in unavailable_slots:
+        # 2. Move the slot claims from whoever held that colour before to the
+        # new player; a clash with another match (or the other colour
+        # of this one) is a duplicate key
+        replaced_player = match[f'{role}_player']
+        if replaced_player is not None:
+            release_player(cursor, match_id, replaced_player)
+        try:
+            claim_player(cursor, match_id, match_date, match_slot, player_id)
+        except SlotConflict:
+            conn.rollback()
             flash("Player is not available at this time slot due to another match.", "error")
             return redirect(url_for('coach.dashboard'))
 
-        # 4. Perform the assignment
+        # 3. Perform the assignment
         if role == 'white':
             cursor.execute("""
                 UPDATE match_players
@@ -350,8 +467,12 @@ def assign_player(match_id):
                 SET black_player = %s
                 WHERE match_id = %s
             """, (player_id, match_id))
+        sync_match(cursor, match_id)
 
+        bump(cursor, entity('player', player_id), entity('player', replaced_player),
+             entity('team', match['team1_id']), entity('team', match['team2_id']))
         conn.commit()
+        player_stats.invalidate(player_id, replaced_player)
         flash("Player assigned successfully.", "success")
 
     except Exception as e:
@@ -360,7 +481,6 @@ def assign_player(match_id):
 
     finally:
         cursor.close()
-        conn.close()
 
     return redirect(url_for('coach.dashboard'))
 
@@ -370,25 +490,43 @@ def assign_player(match_id):
 @coach_required
 def delete_match(match_id):
     print("Form data received:", request.form.to_dict())
-    conn = get_db_connection()
+    conn = get_db()
     cursor = conn.cursor()
     try:
+        cursor.execute("""
+            SELECT m.team1_id, m.team2_id, m.arbiter_id, m.date, mp.white_player, mp.black_player
+            FROM matches m
+            LEFT JOIN match_players mp ON m.match_id = mp.match_id
+            WHERE m.match_id = %s
+        """, (match_id,))
+        team1_id, team2_id, arbiter_id, match_date, white_player, black_player = cursor.fetchone() or (None,) * 6
+
+        # Give back the rating change of a rated match
+        elo.revert_match(cursor, match_id)
         # Delete from match_players first (foreign key)
         cursor.execute("DELETE FROM match_players WHERE match_id = %s", (match_id,))
         # Delete from created table
         cursor.execute("DELETE FROM created WHERE match_id = %s", (match_id,))
         # Delete from matches table
         cursor.execute("DELETE FROM matches WHERE match_id = %s", (match_id,))
+        deleted = cursor.rowcount
         # Delete from ratings table
         cursor.execute("DELETE FROM ratings WHERE match_id = %s", (match_id,))
-        
+        sync_match(cursor, match_id)
+        release_match(cursor, match_id)
+
+        bump(cursor, entity('team', team1_id), entity('team', team2_id), entity('arbiter', arbiter_id),
+             entity('player', white_player), entity('player', black_player))
+        counters.add(cursor, {counters.MATCHES: -deleted})
         conn.commit()
+        availability.invalidate(match_date)
+        player_stats.invalidate(white_player, black_player)
+        leaderboard.refresh(conn, white_player, black_player)
         flash("Match deleted successfully.", "success")
     except Exception as e:
         conn.rollback()
         flash(f"Error deleting match: {str(e)}", "error")
     finally:
         cursor.close()
-        conn.close()
 
     return redirect(url_for('coach.dashboard'))
\ No newline at end of file
@@ -1,9 +1,17 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, session
+from flask import Blueprint, render_template, redirect, url_for, flash, request, session, Response
 from functools import wraps
 import mysql.connector
 from config import Config
 from datetime import datetime
-from routes.auth import login_required, get_db_connection, hash_password
+from routes.auth import login_required
+from utils.auth import find_user
+from utils.db import get_db
+from utils.metrics import render_prometheus
+from utils.batch import fetch_concurrently
+from utils.refdata import reference_data, invalidate as invalidate_reference
+from utils.versions import HALLS, bump
+from utils.passwords import hash_password, PasswordHashingUnavailable
+from utils import counters, leaderboard, pagination
 
 db_manager_bp = Blueprint('db_manager', __name__)
 
@@ -19,131 +27,101 @@ def manager_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+# Dropdown lists of the dashboard forms and the hall list, served from utils.refdata
+DASHBOARD_REFERENCE = ('coach_certification_types', 'arbiter_certification_types', 'titles', 'teams', 'halls')
+
+def dashboard_queries(halls):
+    """
+    Reads behind db_manager.dashboard as {name: (sql, params)}, given the
+    cached hall rows. Every total comes from utils.counters in one
+    primary-key lookup. Shared by the sync view and the async server in asgi.py.
+    """
+    names = [counters.users(role) for role in counters.ROLES]
+    names += [counters.HALLS, counters.HALL_CAPACITY, counters.MATCHES]
+    names += [counters.hall_tables(hall['hall_id']) for hall in halls]
+    return {'counters': counters.counters_query(names)}
+
+
+def dashboard_context(results):
+    """Template variables for db_manager_dashboard.html from dashboard_queries() and DASHBOARD_REFERENCE rows"""
+    totals = counters.values(results['counters'])
+    return dict(user_counts={role: totals.get(counters.users(role), 0) for role in counters.ROLES},
+                halls=[dict(hall, table_count=totals.get(counters.hall_tables(hall['hall_id']), 0))
+                       for hall in sorted(results['halls'], key=lambda hall: hall['name'])],
+                hall_stats=dict(hall_count=totals.get(counters.HALLS, 0),
+                                total_capacity=totals.get(counters.HALL_CAPACITY, 0)),
+                match_stats=dict(match_count=totals.get(counters.MATCHES, 0)),
+                titles=[row['title_name'] for row in results['titles']],
+                teams=[row['name'] for row in results['teams']],
+                coach_certification_types=[row['certification_name'] for row in results['coach_certification_types']],
+                arbiter_certification_types=[row['certification_name'] for row in results['arbiter_certification_types']])
+
+
+def dashboard_results():
+    """Reference data plus the dashboard_queries() results, for dashboard_context()"""
+    results = reference_data(*DASHBOARD_REFERENCE)
+    results.update(fetch_concurrently(dashboard_queries(results['halls'])))
+    return results
+
+
 @db_manager_bp.route('/dashboard')
 @login_required
 @manager_required
 def dashboard():
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        # Get user counts by role
-        cursor.execute("""
-            SELECT role, COUNT(*) as count
-            FROM users
-            GROUP BY role
-        """)
-        user_counts = {row['role']: row['count'] for row in cursor.fetchall()}
-        
-        # Get all halls
-        cursor.execute("""
-            SELECT h.*, COUNT(t.table_id) as table_count
-            FROM halls h
-            LEFT JOIN tables t ON h.hall_id = t.hall_id
-            GROUP BY h.hall_id
-            ORDER BY h.name
-        """)
-        halls = cursor.fetchall()
-        print(f"Debug - Number of halls found: {len(halls)}")
-        if len(halls) > 0:
-            print(f"Debug - First hall data: {halls[0]}")
-        else:
-            # Let's check if the halls table exists and has any data
-            cursor.execute("SELECT COUNT(*) as count FROM halls")
-            count = cursor.fetchone()['count']
-            print(f"Debug - Total count from halls table: {count}")
-            
-            # Check table structure
-            cursor.execute("DESCRIBE halls")
-            columns = cursor.fetchall()
-            print(f"Debug - Halls table structure: {columns}")
-        
-        # Get hall statistics
-        cursor.execute("""
-            SELECT COUNT(*) as hall_count,
-                   SUM(capacity) as total_capacity
-            FROM halls
-        """)
-        hall_stats = cursor.fetchone()
-        
-        # Get match counts - simplified to just count total matches
-        cursor.execute("""
-            SELECT COUNT(*) as match_count
-            FROM matches
-        """)
-        match_stats = cursor.fetchone()
-        
-        cursor.execute("""
-            SELECT certification_name FROM coach_certification_types
-        """)
-        coach_certification_types = [row['certification_name'] for row in cursor.fetchall()]
-        
-        cursor.execute("""
-            SELECT certification_name FROM arbiter_certification_types
-        """)
-        arbiter_certification_types = [row['certification_name'] for row in cursor.fetchall()]
-        
-        cursor.execute("SELECT title_name FROM titles")
-        titles = [row['title_name'] for row in cursor.fetchall()]
-        
-        cursor.execute("SELECT name FROM teams")
-        teams = [row['name'] for row in cursor.fetchall()]
-        
-        return render_template('db_manager_dashboard.html',
-                             user_counts=user_counts,
-                             halls=halls,
-                             hall_stats=hall_stats,
-                             match_stats=match_stats,
-                             titles=titles,
-                             teams=teams,
-                             coach_certification_types=coach_certification_types,
-                             arbiter_certification_types=arbiter_certification_types)
+        # Forms and halls come from the reference cache, every total from the counters
+        return render_template('db_manager_dashboard.html', **dashboard_context(dashboard_results()))
                              
     except mysql.connector.Error as err:
         flash('Database error occurred', 'error')
         print(f"Database error: {err}")
         return redirect(url_for('auth.login'))
-    finally:
-        cursor.close()
-        conn.close()
+
+def users_query(role='all', cursor=None):
+    """One page of users past cursor, by username and optionally of one role, as (sql, params)"""
+    query = """
+        SELECT u.user_id, u.username, u.role,
+               CASE 
+                   WHEN u.role = 'player' THEN p.elo_rating
+                   WHEN u.role = 'coach' THEN c.nationality
+                   WHEN u.role = 'arbiter' THEN a.experience_level
+                   ELSE NULL
+               END as role_specific_info
+        FROM users u
+        LEFT JOIN players p ON u.user_id = p.user_id
+        LEFT JOIN coaches c ON u.user_id = c.user_id
+        LEFT JOIN arbiters a ON u.user_id = a.user_id
+        WHERE 1 = 1
+    """
+    params = []
+
+    if role != 'all':
+        query += " AND u.role = %s"
+        params.append(role)
+
+    after, after_params = pagination.seek(pagination.USERNAMES, cursor, 'u.')
+    query += after + f" ORDER BY {pagination.order_by(pagination.USERNAMES, cursor, 'u.')} LIMIT %s"
+    params += after_params + [pagination.limit(pagination.page_size())]
+    return query, tuple(params)
+
 
 @db_manager_bp.route('/users')
 @login_required
 @manager_required
 def users():
     try:
-        conn = get_db_connection()
+        conn = get_db(readonly=True)
         cursor = conn.cursor(dictionary=True)
         
         role = request.args.get('role', 'all')
+        page_cursor = pagination.cursor_from(pagination.USERNAMES, request.args)
         
-        # Build query based on role filter
-        query = """
-            SELECT u.*, 
-                   CASE 
-                       WHEN u.role = 'player' THEN p.elo_rating
-                       WHEN u.role = 'coach' THEN c.years_of_experience
-                       WHEN u.role = 'arbiter' THEN a.years_of_experience
-                       ELSE NULL
-                   END as role_specific_info
-            FROM users u
-            LEFT JOIN players p ON u.user_id = p.user_id
-            LEFT JOIN coaches c ON u.user_id = c.user_id
-            LEFT JOIN arbiters a ON u.user_id = a.user_id
-        """
-        params = []
-        
-        if role != 'all':
-            query += " WHERE u.role = %s"
-            params.append(role)
-        
-        query += " ORDER BY u.username"
-        
-        cursor.execute(query, params)
-        users = cursor.fetchall()
+        cursor.execute(*users_query(role, page_cursor))
+        page = pagination.paginate(pagination.USERNAMES, cursor.fetchall(), page_cursor, pagination.page_size())
         
-        return render_template('db_manager/users.html',
-                             users=users,
+        return render_template('db_manager_users.html',
+                             users=page.rows,
+                             page=page,
                              current_role=role)
                              
     except mysql.connector.Error as err:
@@ -152,7 +130,6 @@ def users():
         return redirect(url_for('db_manager.dashboard'))
     finally:
         cursor.close()
-        conn.close()
 
 @db_manager_bp.route('/users/create', methods=['GET', 'POST'])
 @login_required
@@ -160,7 +137,7 @@ def users():
 def create_user():
     if request.method == 'POST':
         try:
-            conn = get_db_connection()
+            conn = get_db()
             cursor = conn.cursor()
             
             username = request.form.get('username')
@@ -186,8 +163,7 @@ def create_user():
                 return redirect(url_for('db_manager.dashboard'))
             
             # Check if username exists
-            cursor.execute("SELECT 1 FROM users WHERE username = %s", (username,))
-            if cursor.fetchone():
+            if find_user(username):
                 flash('Username already exists', 'error')
                 return redirect(url_for('db_manager.dashboard'))
             
@@ -259,7 +235,6 @@ def create_user():
                     while cursor.nextset():
                         cursor.fetchall()
                     cursor.close()
-                    conn.close()
                     return redirect(url_for('db_manager.dashboard'))  # Or wherever you want to go
 
                 team_id = team_result[0]
@@ -280,7 +255,6 @@ def create_user():
                     while cursor.nextset():
                         cursor.fetchall()
                     cursor.close()
-                    conn.close()
                     return redirect(url_for('db_manager.dashboard'))  # Or your form page
 
                 # 1. Insert coach profile
@@ -341,10 +315,20 @@ def create_user():
 
 
             
+            counters.add(cursor, {counters.users(user_type): 1})
             conn.commit()
+            if user_type == 'arbiter':
+                invalidate_reference('arbiters')
+            elif user_type == 'player':
+                leaderboard.refresh(conn, user_id)
             flash('User created successfully', 'success')
             return redirect(url_for('db_manager.dashboard'))
             
+        except PasswordHashingUnavailable as err:
+            flash('The server is busy, please try again in a moment.', 'error')
+            print(f"Password hashing unavailable in create_user: {err}")
+            conn.rollback()
+            return redirect(url_for('db_manager.dashboard'))
         except mysql.connector.Error as err:
             flash('Database error occurred', 'error')
             print(f"Database error in create_user: {err}")  # Enhanced error logging
@@ -352,48 +336,16 @@ def create_user():
             return redirect(url_for('db_manager.dashboard'))
         finally:
             cursor.close()
-            conn.close()
             
         # For GET requests, render the dashboard with coach certification options
     if request.method == 'GET':
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor(dictionary=True)
-
-            # Fetch certification types
-            cursor.execute("SELECT certification_name FROM coach_certification_types")
-            coach_certification_types = [row['certification_name'] for row in cursor.fetchall()]
-            cursor.execute("SELECT certification_name FROM arbiter_certification_types")
-            arbiter_certification_types = [row['certification_name'] for row in cursor.fetchall()]
-
-            # Fetch other dashboard data (as in the dashboard route)
-            cursor.execute("SELECT h.*, COUNT(t.table_id) as table_count FROM halls h LEFT JOIN tables t ON h.hall_id = t.hall_id GROUP BY h.hall_id ORDER BY h.name")
-            halls = cursor.fetchall()
-
-            cursor.execute("SELECT COUNT(*) as hall_count, SUM(capacity) as total_capacity FROM halls")
-            hall_stats = cursor.fetchone()
-
-            cursor.execute("SELECT COUNT(*) as match_count FROM matches")
-            match_stats = cursor.fetchone()
-
-            cursor.execute("SELECT role, COUNT(*) as count FROM users GROUP BY role")
-            user_counts = {row['role']: row['count'] for row in cursor.fetchall()}
-
-            return render_template("db_manager_dashboard.html",
-                                coach_certification_types=coach_certification_types,
-                                arbiter_certification_types=arbiter_certification_types,
-                                halls=halls,
-                                hall_stats=hall_stats,
-                                match_stats=match_stats,
-                                user_counts=user_counts)
+            return render_template("db_manager_dashboard.html", **dashboard_context(dashboard_results()))
 
         except mysql.connector.Error as err:
             flash('Database error occurred', 'error')
             print(f"Database error in GET create_user: {err}")
             return redirect(url_for('db_manager.dashboard'))
-        finally:
-            cursor.close()
-            conn.close()
     
     # For GET requests, redirect to dashboard where the form exists
     return redirect(url_for('db_manager.dashboard'))
@@ -403,7 +355,7 @@ def create_user():
 @manager_required
 def halls():
     try:
-        conn = get_db_connection()
+        conn = get_db(readonly=True)
         cursor = conn.cursor(dictionary=True)
         
         # Get all halls with table counts
@@ -424,19 +376,20 @@ def halls():
         return redirect(url_for('db_manager.dashboard'))
     finally:
         cursor.close()
-        conn.close()
 
 @db_manager_bp.route('/rename_hall/<int:hall_id>', methods=['POST'])
 @login_required
 @manager_required
 def rename_hall(hall_id):
     try:
-        conn = get_db_connection()
+        conn = get_db()
         cursor = conn.cursor()
 
         new_name = request.form.get('new_name')
         cursor.execute("UPDATE halls SET name = %s WHERE hall_id = %s", (new_name, hall_id))
+        bump(cursor, HALLS)
         conn.commit()
+        invalidate_reference('halls', 'tables')  # tables carry the hall name
 
         flash('Hall renamed successfully', 'success')
     except mysql.connector.Error as err:
@@ -445,6 +398,12 @@ def rename_hall(hall_id):
         conn.rollback()
     finally:
         cursor.close()
-        conn.close()
     
-    return redirect(url_for('db_manager.dashboard'))
\ No newline at end of file
+    return redirect(url_for('db_manager.dashboard'))
+
+@db_manager_bp.route('/metrics')
+@login_required
+@manager_required
+def metrics():
+    """Per-endpoint query histograms in Prometheus text format"""
+    return Response(render_prometheus(), mimetype='text/plain; version=0.0.4')
@@ -1,8 +1,16 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, session
+from flask import Blueprint, render_template, redirect, url_for, flash, request, session, make_response, jsonify
+from datetime import date
 from functools import wraps
 import mysql.connector
 from config import Config
-from routes.auth import login_required, get_db_connection
+from routes.auth import login_required
+from utils.db import get_db
+from utils.prepared import fetch_all, fetch_one
+from utils.batch import fetch_concurrently
+from utils import player_stats
+from utils.versions import HALLS, entity, current_etag, not_modified, with_etag
+from utils import seasons, pagination, rating_history, leaderboard
+from utils.refdata import reference_data
 
 player_bp = Blueprint('player', __name__)
 
@@ -16,28 +24,59 @@ def player_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
-@player_bp.route('/dashboard')
-@login_required
-@player_required
-def dashboard():
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
+def dashboard_queries(user_id):
+    """
+    Profile and team reads behind player.dashboard as {name: (sql, params)}.
+    Shared by the sync view and the async server in asgi.py.
+    """
+    return {
         # Get player profile
-        cursor.execute("""
+        'player': ("""
             SELECT p.*, u.username
             FROM players p
             JOIN users u ON p.user_id = u.user_id
             WHERE p.user_id = %s
-        """, (session['user_id'],))
-        player = cursor.fetchone()
-        
-        
-        # Get player's matches with results
-        # Get player's matches with results
+        """, (user_id,)),
+
+        # Get player's team
+        'team': ("""
+            SELECT t.*
+            FROM teams t
+            JOIN player_team_membership p ON t.team_id = p.team_id
+            WHERE p.player_id = %s
+        """, (user_id,)),
+    }
+
+
+def frequent_opponents_query(user_id, min_games=1, scope=seasons.CURRENT):
+    """Top 5 opponents by games played in scope as (sql, params), from the player's participation range"""
+    return ("""
+        SELECT 
+            u.username AS opponent_name,
+            p.elo_rating AS current_elo,
+            pp.opponent_id,
+            COUNT(*) AS games_played,
+            MAX(pp.date) AS last_played
+        FROM {player_participation} pp
+        JOIN players p ON pp.opponent_id = p.user_id
+        JOIN users u ON u.user_id = pp.opponent_id
+        WHERE pp.player_id = %s AND pp.date >= %s
+        GROUP BY pp.opponent_id, u.username, p.elo_rating
+        HAVING games_played >= %s
+        ORDER BY games_played DESC, last_played DESC
+        LIMIT 5
+    """.format(**seasons.tables(scope)), (user_id, seasons.floor(scope), min_games))
+
+
+def stats_queries(user_id, scope=seasons.CURRENT):
+    """
+    Match history reads in scope behind the cached player statistics, see
+    compute_stats(). Only run on a utils.player_stats miss.
+    """
+    names = seasons.tables(scope)
+    return {
         # Fetch all matches where the current player participated
-        cursor.execute("""
+        'matches': ("""
             SELECT 
                 m.match_id,
                 m.date,
@@ -45,116 +84,156 @@ def dashboard():
                 m.table_id,
                 h.name AS hall_name,
                 t.table_number,
-                mp.result,
+                pp.result,
                 u_arb.username AS arbiter_username,
-                r.rating_value AS elo_change,
-                -- Determine opponent's username
-                CASE
-                    WHEN mp.white_player = %(user_id)s THEN u_black.username
-                    ELSE u_white.username
-                END AS opponent_name,
+                CASE WHEN pp.color = 'white' THEN ec.white_delta ELSE ec.black_delta END AS elo_change,
+                u_opp.username AS opponent_name,
                 -- Determine match result
                 CASE
-                    WHEN mp.result = 'draw' THEN 'Draw'
-                    WHEN (mp.white_player = %(user_id)s AND mp.result = 'white') OR
-                        (mp.black_player = %(user_id)s AND mp.result = 'black') THEN 'Won'
-                    WHEN (mp.white_player = %(user_id)s AND mp.result = 'black') OR
-                        (mp.black_player = %(user_id)s AND mp.result = 'white') THEN 'Lost'
+                    WHEN pp.result = 'draw' THEN 'Draw'
+                    WHEN (pp.color = 'white' AND pp.result = 'white') OR
+                        (pp.color = 'black' AND pp.result = 'black') THEN 'Won'
+                    WHEN pp.result IS NOT NULL THEN 'Lost'
                     ELSE 'Pending'
                 END AS match_result
-            FROM match_players mp
-            JOIN matches m ON mp.match_id = m.match_id
+            FROM {player_participation} pp
+            JOIN {matches} m ON pp.match_id = m.match_id
             JOIN halls h ON m.hall_id = h.hall_id
             JOIN tables t ON m.table_id = t.table_id
-            JOIN users u_white ON mp.white_player = u_white.user_id
-            JOIN users u_black ON mp.black_player = u_black.user_id
+            JOIN users u_opp ON pp.opponent_id = u_opp.user_id
             LEFT JOIN users u_arb ON m.arbiter_id = u_arb.user_id
-            LEFT JOIN ratings r ON m.match_id = r.match_id
-            WHERE mp.white_player = %(user_id)s OR mp.black_player = %(user_id)s
-            ORDER BY m.date DESC
-        """, {"user_id": session['user_id']})
-
-        matches = cursor.fetchall()
-        print(matches)
-        
-        # Calculate statistics
-        total_matches = len(matches)
-        if total_matches > 0:
-            wins = sum(1 for m in matches if m['match_result'] == 'Won')
-            win_rate = (wins / total_matches) * 100
-        else:
-            win_rate = 0
-            
-        # Get recent opponents (last 5 matches)
-        recent_opponents = matches[:5] if matches else []
-        
-        # Inside dashboard()
-        cursor.execute("""
-            WITH opponent_data AS (
-                SELECT 
-                    CASE 
-                        WHEN mp.white_player = %(user_id)s THEN mp.black_player
-                        ELSE mp.white_player
-                    END AS opponent_id,
-                    m.date
-                FROM match_players mp
-                JOIN matches m ON m.match_id = mp.match_id
-                WHERE mp.white_player = %(user_id)s OR mp.black_player = %(user_id)s
-            )
-            SELECT 
-                u.username AS opponent_name,
-                p.elo_rating AS current_elo,
-                od.opponent_id,
-                COUNT(*) AS games_played,
-                MAX(od.date) AS last_played
-            FROM opponent_data od
-            JOIN players p ON od.opponent_id = p.user_id
-            JOIN users u ON u.user_id = od.opponent_id
-            GROUP BY od.opponent_id, u.username, p.elo_rating
-            HAVING games_played >= 1
-            ORDER BY games_played DESC, last_played DESC
-            LIMIT 5
-        """, {"user_id": session['user_id']})
+            LEFT JOIN elo_changes ec ON m.match_id = ec.match_id
+            WHERE pp.player_id = %s AND pp.date >= %s
+            ORDER BY pp.date DESC
+        """.format(**names), (user_id, seasons.floor(scope))),
 
-        frequent_opponents = cursor.fetchall()
-        
-        # Step 2: Compute average ELO of the most frequent opponents (if any)
-        if frequent_opponents:
-            max_games = max(op['games_played'] for op in frequent_opponents)
-            max_opponents = [op for op in frequent_opponents if op['games_played'] == max_games]
-            avg_elo = sum(op['current_elo'] for op in max_opponents) / len(max_opponents)
-            print(max_games)
-        else:
-            avg_elo = None
-        average_elo=round(avg_elo, 1) if avg_elo else "N/A"
+        'frequent_opponents': frequent_opponents_query(user_id, scope=scope),
+    }
 
 
-        # Get player's team
-        cursor.execute("""
-            SELECT t.*
-            FROM teams t
-            JOIN player_team_membership p ON t.team_id = p.team_id
-            WHERE p.player_id = %s
-        """, (session['user_id'],))
-        team = cursor.fetchone()
-        
-        return render_template('player_dashboard.html', 
-                             username=player['username'],
-                             current_elo=player['elo_rating'],
-                             games_played=total_matches,
-                             win_rate=round(win_rate, 1),
-                             recent_opponents=recent_opponents,
-                             frequent_opponents=frequent_opponents,
-                             average_elo=average_elo,
-                             team=team)
+def compute_stats(results):
+    """Player statistics cached by utils.player_stats, from stats_queries() results"""
+    matches = results['matches']
+    frequent_opponents = results['frequent_opponents']
+
+    # Calculate statistics
+    total_matches = len(matches)
+    if total_matches > 0:
+        wins = sum(1 for m in matches if m['match_result'] == 'Won')
+        win_rate = (wins / total_matches) * 100
+    else:
+        win_rate = 0
+
+    # Get recent opponents (last 5 matches)
+    recent_opponents = matches[:5] if matches else []
+
+    # Compute average ELO of the most frequent opponents (if any)
+    if frequent_opponents:
+        max_games = max(op['games_played'] for op in frequent_opponents)
+        max_opponents = [op for op in frequent_opponents if op['games_played'] == max_games]
+        avg_elo = sum(op['current_elo'] for op in max_opponents) / len(max_opponents)
+    else:
+        avg_elo = None
+
+    return dict(games_played=total_matches,
+                win_rate=round(win_rate, 1),
+                recent_opponents=recent_opponents,
+                frequent_opponents=frequent_opponents,
+                average_elo=round(avg_elo, 1) if avg_elo else "N/A")
+
+
+def rank_context(board, user_id):
+    """World and national rank of a player on a utils.leaderboard board, as (rank, players) or None"""
+    player = board.player(user_id)
+    nationality = player['nationality'] if player else None
+    return dict(world_rank=board.rank(user_id),
+                national_rank=board.rank(user_id, nationality=nationality) if nationality else None,
+                nationality=nationality)
+
+
+def dashboard_context(results, stats, scope=seasons.CURRENT, ranks=None):
+    """Template variables for player_dashboard.html from dashboard_queries() results, compute_stats() and rank_context()"""
+    player = results['player'][0]
+    return dict(stats,
+                **(ranks or {}),
+                season_scope=scope,
+                username=player['username'],
+                current_elo=player['elo_rating'],
+                team=results['team'][0] if results['team'] else None)
+
+
+@player_bp.route('/dashboard')
+@login_required
+@player_required
+def dashboard():
+    try:
+        user_id = session['user_id']
+        scope = seasons.scope_from(request.args)
+        stats, version = player_stats.lookup(user_id, scope)
+        if stats is None:
+            # Cache miss: read the history together with the profile, from the
+            # primary so a lagging replica cannot be cached
+            results = fetch_concurrently({**dashboard_queries(user_id), **stats_queries(user_id, scope)}, readonly=False)
+            stats = compute_stats(results)
+            player_stats.store(user_id, stats, version, scope)
+        else:
+            results = fetch_concurrently(dashboard_queries(user_id))
+        ranks = rank_context(leaderboard.board(get_db(readonly=True)), user_id)
+        return render_template('player_dashboard.html', **dashboard_context(results, stats, scope, ranks))
                              
     except mysql.connector.Error as err:
         flash('Database error occurred', 'error')
         print(f"Database error: {err}")
         return redirect(url_for('auth.login'))
-    finally:
-        cursor.close()
-        conn.close()
+
+
+def matches_query(user_id, scope=seasons.CURRENT, cursor=None):
+    """
+    One page of the match history in scope behind player.matches as
+    (sql, params), read past cursor along the participation index; shared
+    with asgi.py. Rows come back in query order, see pagination.paginate().
+    """
+    after, after_params = pagination.seek(pagination.MATCHES, cursor, 'pp.')
+    return ("""
+        SELECT 
+            m.match_id,
+            m.date,
+            m.time_slot,
+            m.hall_id,
+            m.table_id,
+            h.name AS hall_name,
+            t.table_number,
+            mp.white_player,
+            mp.black_player,
+            mp.result,
+            u_white.username AS player1_username,
+            u_black.username AS player2_username,
+            u_arb.username AS arbiter_username,
+            CASE WHEN pp.color = 'white' THEN ec.white_delta ELSE ec.black_delta END AS elo_change
+        FROM {player_participation} pp
+        JOIN {match_players} mp ON mp.match_id = pp.match_id
+        JOIN {matches} m ON pp.match_id = m.match_id
+        JOIN halls h ON m.hall_id = h.hall_id
+        JOIN tables t ON m.table_id = t.table_id
+        JOIN users u_white ON mp.white_player = u_white.user_id
+        JOIN users u_black ON mp.black_player = u_black.user_id
+        LEFT JOIN users u_arb ON m.arbiter_id = u_arb.user_id
+        LEFT JOIN elo_changes ec ON m.match_id = ec.match_id
+        WHERE pp.player_id = %s AND pp.date >= %s{after}
+        ORDER BY {order}
+        LIMIT %s
+    """.format(after=after, order=pagination.order_by(pagination.MATCHES, cursor, 'pp.'), **seasons.tables(scope)),
+        (user_id, seasons.floor(scope), *after_params, pagination.limit(pagination.page_size())))
+
+
+def matches_page(rows, cursor):
+    """The page of player_matches.html from matches_query() rows"""
+    return pagination.paginate(pagination.MATCHES, rows, cursor, pagination.page_size())
+
+
+def matches_version_entities(user_id):
+    """Data version counters the match list depends on"""
+    return [entity('player', user_id), HALLS]
 
 
 @player_bp.route('/matches')
@@ -162,87 +241,106 @@ def dashboard():
 @player_required
 def matches():
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-
-        # Fetch all matches where the current player participated
-        cursor.execute("""
-            SELECT 
-                m.match_id,
-                m.date,
-                m.hall_id,
-                m.table_id,
-                h.name AS hall_name,
-                t.table_number,
-                mp.white_player,
-                mp.black_player,
-                mp.result,
-                u_white.username AS player1_username,
-                u_black.username AS player2_username,
-                u_arb.username AS arbiter_username,
-                r.rating_value AS elo_change
-            FROM match_players mp
-            JOIN matches m ON mp.match_id = m.match_id
-            JOIN halls h ON m.hall_id = h.hall_id
-            JOIN tables t ON m.table_id = t.table_id
-            JOIN users u_white ON mp.white_player = u_white.user_id
-            JOIN users u_black ON mp.black_player = u_black.user_id
-            LEFT JOIN users u_arb ON m.arbiter_id = u_arb.user_id
-            LEFT JOIN ratings r ON m.match_id = r.match_id
-            WHERE mp.white_player = %s OR mp.black_player = %s
-            ORDER BY m.date DESC
-        """, (session['user_id'], session['user_id']))
+        conn = get_db(readonly=True)
+        user_id = session['user_id']
+        scope = seasons.scope_from(request.args)
+        cursor = pagination.cursor_from(pagination.MATCHES, request.args)
+        etag = current_etag(conn, f'player.matches:{user_id}:{seasons.cache_tag(scope)}:{pagination.cache_tag(cursor)}',
+                            matches_version_entities(user_id))
+        if not_modified(request, session, etag):
+            return with_etag(make_response('', 304), etag)
 
-        matches = cursor.fetchall()
+        # Fetch one page of the season's (or every) match the current player participated in
+        page = matches_page(fetch_all(conn, *matches_query(user_id, scope, cursor)), cursor)
 
-        return render_template('player_matches.html', matches=matches)
+        return with_etag(make_response(render_template('player_matches.html', matches=page.rows, page=page,
+                                                       data_version=etag, season_scope=scope)), etag)
     
     except mysql.connector.Error as err:
         flash("Database error occurred while loading matches.", "error")
         print(f"Database error: {err}")
         return redirect(url_for('player.dashboard'))
-    
-    finally:
-        cursor.close()
-        conn.close()
+
+def history_points(args):
+    """Points requested for the rating chart, at most Config.RATING_HISTORY_POINTS"""
+    try:
+        points = int(args.get('points', Config.RATING_HISTORY_POINTS))
+    except ValueError:
+        points = Config.RATING_HISTORY_POINTS
+    return max(2, min(points, Config.RATING_HISTORY_POINTS))
+
+
+@player_bp.route('/rating-history')
+@login_required
+@player_required
+def rating_history_series():
+    """The player's rating over time as JSON, downsampled with LTTB for the chart"""
+    try:
+        conn = get_db(readonly=True)
+        user_id = session['user_id']
+        points = history_points(request.args)
+        etag = current_etag(conn, f'player.rating_history:{user_id}:{points}', [entity('player', user_id)])
+        if not_modified(request, session, etag):
+            return with_etag(make_response('', 304), etag)
+
+        rows = fetch_all(conn, *rating_history.series_query(user_id))
+        player = fetch_one(conn, "SELECT elo_rating FROM players WHERE user_id = %s", (user_id,))
+        current = player['elo_rating'] if player and player['elo_rating'] is not None else Config.INITIAL_ELO
+        series = rating_history.lttb([(row['date'].toordinal(), row['rating_after']) for row in rows], points)
+
+        return with_etag(make_response(jsonify(
+            current_elo=current,
+            games=len(rows),
+            points=[{'date': date.fromordinal(day).isoformat(), 'rating': rating} for day, rating in series],
+        )), etag)
+
+    except mysql.connector.Error as err:
+        print(f"Database error: {err}")
+        return jsonify(error='Database error occurred'), 500
+
+def leaderboard_filters(args, board):
+    """(nationality, title_id) requested in args; unknown values mean no filter"""
+    nationality = args.get('nationality') or None
+    title_id = args.get('title') or None
+    titles = {row['title_id'] for row in reference_data('titles')['titles']}
+    return (nationality if nationality in board.nationalities() else None,
+            title_id if title_id in titles else None)
+
+
+@player_bp.route('/leaderboard', endpoint='leaderboard')
+@login_required
+@player_required
+def leaderboard_view():
+    try:
+        user_id = session['user_id']
+        board = leaderboard.board(get_db(readonly=True))
+        nationality, title_id = leaderboard_filters(request.args, board)
+        return render_template('leaderboard.html',
+                               top=board.top(Config.LEADERBOARD_SIZE, nationality, title_id),
+                               around=board.around(user_id, Config.LEADERBOARD_RADIUS, nationality, title_id),
+                               my_rank=board.rank(user_id, nationality, title_id),
+                               players=board.size(nationality, title_id),
+                               nationalities=board.nationalities(),
+                               titles=reference_data('titles')['titles'],
+                               nationality=nationality, title_id=title_id)
+
+    except mysql.connector.Error as err:
+        flash('Database error occurred while loading the leaderboard.', 'error')
+        print(f"Database error: {err}")
+        return redirect(url_for('player.dashboard'))
 
 @player_bp.route('/frequent-opponents')
 @login_required
 @player_required
 def frequent_opponents():
     try:
-        conn = get_db_connection()
+        conn = get_db(readonly=True)
         cursor = conn.cursor(dictionary=True)
 
         user_id = session['user_id']
 
-        # Step 1: Get all matches involving the user and determine their opponent
-        cursor.execute("""
-            WITH opponent_data AS (
-                SELECT 
-                    CASE 
-                        WHEN mp.white_player = %(user_id)s THEN mp.black_player
-                        ELSE mp.white_player
-                    END AS opponent_id,
-                    m.date
-                FROM match_players mp
-                JOIN matches m ON m.match_id = mp.match_id
-                WHERE mp.white_player = %(user_id)s OR mp.black_player = %(user_id)s
-            )
-            SELECT 
-                u.username AS opponent_name,
-                p.elo_rating AS current_elo,
-                od.opponent_id,
-                COUNT(*) AS games_played,
-                MAX(od.date) AS last_played
-            FROM opponent_data od
-            JOIN players p ON od.opponent_id = p.user_id
-            JOIN users u ON u.user_id = od.opponent_id
-            GROUP BY od.opponent_id, u.username, p.elo_rating
-            HAVING games_played > 1
-            ORDER BY games_played DESC, last_played DESC
-            LIMIT 5
-        """, {"user_id": user_id})
+        # Step 1: Opponents the user played more than once
+        cursor.execute(*frequent_opponents_query(user_id, min_games=2, scope=seasons.scope_from(request.args)))
 
         frequent_opponents = cursor.fetchall()
         print(frequent_opponents)
@@ -267,5 +365,4 @@ def frequent_opponents():
         return redirect(url_for('player.dashboard'))
 
     finally:
-        cursor.close()
-        conn.close()
\ No newline at end of file
+        cursor.close()
\ No newline at end of file
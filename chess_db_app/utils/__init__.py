@@ -8,9 +8,10 @@ from .auth import (
     username_exists,
     create_user,
     login_required,
-    role_required,
-    get_db_connection
+    role_required
 )
+from .db import get_db, close_db, init_app
+
 
 # This makes these functions available when importing from utils
 __all__ = [
@@ -19,5 +20,7 @@ __all__ = [
     'create_user',
     'login_required',
     'role_required',
-    'get_db_connection'
+    'get_db',
+    'close_db',
+    'init_app'
 ]
@@ -0,0 +1,92 @@
+"""
+Async data-access layer for the optional ASGI serving mode (asgi.py).
+Queries run on aiomysql connection pools, so a single worker can keep many
+dashboard requests in flight while MySQL works on them. Endpoints and
+replica routing mirror utils.db; the sync path does not use this module.
+"""
+
+import asyncio
+import itertools
+from typing import Any, Dict, List, Sequence, Tuple
+
+try:
+    import aiomysql
+except ImportError:  # async mode is optional, see requirements-async.txt
+    aiomysql = None
+
+from config import Config
+from .db import PRIMARY, endpoint_address
+
+_pools: Dict[str, Any] = {}
+_pool_lock = asyncio.Lock()
+_replica_counter = itertools.count()
+
+
+async def get_pool(name: str = PRIMARY):
+    """Create the async pool for an endpoint on first use"""
+    if aiomysql is None:
+        raise RuntimeError("Async serving mode needs aiomysql: pip install -r requirements-async.txt")
+    pool = _pools.get(name)
+    if pool is None:
+        async with _pool_lock:
+            pool = _pools.get(name)
+            if pool is None:
+                host, port = endpoint_address(name)
+                pool = await aiomysql.create_pool(
+                    host=host,
+                    port=port,
+                    user=Config.DB_USER,
+                    password=Config.DB_PASSWORD,
+                    db=Config.DB_NAME,
+                    minsize=1,
+                    maxsize=Config.ASYNC_DB_POOL_SIZE,
+                    pool_recycle=Config.DB_POOL_RECYCLE,
+                    autocommit=True
+                )
+                _pools[name] = pool
+    return pool
+
+
+async def _pool_for(readonly: bool, pinned: bool):
+    """Replica pool for unpinned reads when replicas are configured, else the primary"""
+    if readonly and Config.DB_REPLICAS and not pinned:
+        name = f"replica{next(_replica_counter) % len(Config.DB_REPLICAS)}"
+        try:
+            return await get_pool(name)
+        except Exception as err:
+            print(f"Replica {name} unavailable, using primary: {err}")
+    return await get_pool(PRIMARY)
+
+
+async def fetch_all(sql: str, params: Sequence[Any] = (), readonly: bool = True,
+                    pinned: bool = False) -> List[Dict[str, Any]]:
+    """Run one query on a pooled connection and return every row as a dict"""
+    pool = await _pool_for(readonly, pinned)
+    async with pool.acquire() as conn:
+        async with conn.cursor(aiomysql.DictCursor) as cursor:
+            await cursor.execute(sql, tuple(params))
+            return list(await cursor.fetchall())
+
+
+async def fetch_one(sql: str, params: Sequence[Any] = (), readonly: bool = True, pinned: bool = False):
+    """Run one query and return its first row, if any"""
+    rows = await fetch_all(sql, params, readonly, pinned)
+    return rows[0] if rows else None
+
+
+async def fetch_concurrently(queries: Dict[str, Tuple[str, Sequence[Any]]], readonly: bool = True,
+                             pinned: bool = False) -> Dict[str, List[Dict[str, Any]]]:
+    """Async counterpart of utils.batch.fetch_concurrently()"""
+    names = list(queries)
+    rows = await asyncio.gather(*(
+        fetch_all(queries[name][0], queries[name][1], readonly, pinned) for name in names
+    ))
+    return dict(zip(names, rows))
+
+
+async def close_pools() -> None:
+    """Close every async pool; called when the ASGI server shuts down"""
+    while _pools:
+        _, pool = _pools.popitem()
+        pool.close()
+        await pool.wait_closed()
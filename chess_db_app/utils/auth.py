@@ -1,79 +1,48 @@
 from functools import wraps
 from flask import session, redirect, url_for, flash
-import hashlib
 import mysql.connector
 from typing import List, Optional, Dict, Any
 from config import Config
+from .db import get_db
+from .passwords import hash_password, verify_password
+from .prepared import fetch_one
 
-# Use database configuration from config.py
-db_config = {
-    'host': Config.DB_HOST,
-    'user': Config.DB_USER,
-    'password': Config.DB_PASSWORD,
-    'database': Config.DB_NAME
-}
+# The only query that looks users up by name. FORCE INDEX makes it a single
+# probe of the UNIQUE index on users.username, and makes MySQL raise an error
+# instead of silently scanning the table if that index is ever missing.
+USER_BY_USERNAME = """
+    SELECT user_id, username, role, password_hash
+    FROM users FORCE INDEX (username)
+    WHERE username = %s
+"""
 
-def get_db_connection():
-    """Create and return a database connection"""
-    return mysql.connector.connect(**db_config)
-
-def hash_password(password: str) -> str:
-    """Hash a password using SHA-256"""
-    return hashlib.sha256(password.encode()).hexdigest()
+def find_user(username: str) -> Optional[Dict[str, Any]]:
+    """Look a user up by username on the primary; used by every login and uniqueness check"""
+    return fetch_one(get_db(), USER_BY_USERNAME, (username,))
 
 def verify_credentials(username: str, password: str) -> Optional[Dict[str, Any]]:
     """
-    Verify user credentials against all user tables
+    Verify user credentials against the users table
     Returns user info if credentials are valid, None otherwise
     """
-    hashed_password = hash_password(password)
-    
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        # Check each user table
-        tables = ['players', 'coaches', 'arbiters', 'db_managers']
-        roles = ['player', 'coach', 'arbiter', 'db_manager']
-        
-        for table, role in zip(tables, roles):
-            query = f"SELECT * FROM {table} WHERE username = %s AND password = %s"
-            cursor.execute(query, (username, hashed_password))
-            user = cursor.fetchone()
-            
-            if user:
-                user['role'] = role
-                return user
-        
+        user = find_user(username)
+        if user and verify_password(password, user['password_hash']):
+            return user
         return None
         
     except mysql.connector.Error as err:
         print(f"Database error in verify_credentials: {err}")
         return None
-    finally:
-        cursor.close()
-        conn.close()
 
 def username_exists(username: str) -> bool:
-    """Check if username exists in any user table"""
+    """Check if a username is already taken"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        tables = ['players', 'coaches', 'arbiters', 'db_managers']
-        for table in tables:
-            cursor.execute(f"SELECT 1 FROM {table} WHERE username = %s", (username,))
-            if cursor.fetchone():
-                return True
-        
-        return False
+        return find_user(username) is not None
         
     except mysql.connector.Error as err:
         print(f"Database error in username_exists: {err}")
         return True  # Return True on error to prevent duplicate usernames
-    finally:
-        cursor.close()
-        conn.close()
 
 def login_required(f):
     """Decorator to check if user is logged in"""
@@ -102,7 +71,7 @@ def create_user(username: str, password: str, user_type: str, **kwargs) -> bool:
     Returns True if successful, False otherwise
     """
     try:
-        conn = get_db_connection()
+        conn = get_db()
         cursor = conn.cursor()
         
         hashed_password = hash_password(password)
@@ -140,4 +109,3 @@ def create_user(username: str, password: str, user_type: str, **kwargs) -> bool:
         return False
     finally:
         cursor.close()
-        conn.close()
@@ -0,0 +1,80 @@
+"""
+Free tables and arbiters for a match starting at a date and slot, behind
+coach.availability and the create-match form.
+A match occupies its slot and the next one, so a table or arbiter is free
+when it has no slot_claims row in either; each resource type is one
+anti-join on its unique claim key. Results are cached per date and start
+slot for every hall; creating, scheduling or deleting a match calls
+invalidate() with its dates. A TTL bounds staleness for other worker
+processes, and slot_claims still rejects a stale pick on submit.
+"""
+
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from config import Config
+from .cache import VersionedCache
+from .metrics import register_counters
+from .slot_claims import MATCH_DURATION, STARTS, occupied_slots
+
+_cache = VersionedCache(Config.AVAILABILITY_TTL, Config.AVAILABILITY_CACHE_SIZE)
+register_counters('chessdb_availability_cache', _cache.stats)
+
+
+def _unclaimed(column: str, alias: str, key: str) -> str:
+    slots = ', '.join(['%s'] * MATCH_DURATION)
+    return f"""NOT EXISTS (
+                SELECT 1 FROM slot_claims c
+                WHERE c.{column} = {alias}.{key} AND c.date = %s AND c.slot IN ({slots})
+            )"""
+
+
+def queries(day: date, time_slot: int) -> Dict[str, Tuple[str, tuple]]:
+    """Free tables of every hall and free arbiters for a match starting at day and time_slot, as {name: (sql, params)}"""
+    params = (day, *occupied_slots(time_slot))
+    return {
+        'tables': (f"""
+            SELECT t.table_id, t.hall_id, t.table_number
+            FROM tables t
+            WHERE {_unclaimed('table_id', 't', 'table_id')}
+            ORDER BY t.hall_id, t.table_number
+        """, params),
+        'arbiters': (f"""
+            SELECT a.user_id, a.name, a.surname, a.experience_level
+            FROM arbiters a
+            WHERE {_unclaimed('arbiter_id', 'a', 'user_id')}
+            ORDER BY a.surname, a.name
+        """, params),
+    }
+
+
+def lookup(day: date, time_slot: int) -> Tuple[Optional[Dict[str, List[Dict[str, Any]]]], int]:
+    """Return (free resources, version) of a date and start slot; None on a miss"""
+    return _cache.lookup((day, time_slot))
+
+
+def store(day: date, time_slot: int, results: Dict[str, List[Dict[str, Any]]], version: int) -> None:
+    """Cache queries() results loaded after lookup() returned version"""
+    _cache.store((day, time_slot), results, version)
+
+
+def invalidate(*days: Optional[date]) -> None:
+    """Drop every start slot of the given dates; None entries are ignored"""
+    _cache.invalidate(*((day, time_slot) for day in set(days) if day is not None for time_slot in STARTS))
+
+
+def by_hall(results: Dict[str, List[Dict[str, Any]]], halls: Iterable[Dict[str, Any]],
+            hall_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Free tables grouped per hall (refdata 'halls' rows), optionally of one hall only"""
+    tables: Dict[int, List[Dict[str, Any]]] = {}
+    for table in results['tables']:
+        tables.setdefault(table['hall_id'], []).append({'table_id': table['table_id'],
+                                                        'table_number': table['table_number']})
+    return [{'hall_id': hall['hall_id'], 'name': hall['name'], 'tables': tables.get(hall['hall_id'], [])}
+            for hall in sorted(halls, key=lambda hall: hall['hall_id'])
+            if hall_id is None or hall['hall_id'] == hall_id]
+
+
+def cache_stats() -> Dict[str, int]:
+    """Process-wide hit, miss, invalidation and eviction counters"""
+    return _cache.stats()
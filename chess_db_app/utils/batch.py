@@ -0,0 +1,72 @@
+"""
+Concurrent execution of independent read queries.
+A dashboard that needs several unrelated result sets can hand them to
+fetch_concurrently(); each query runs on its own pooled connection in a
+bounded thread pool, so page latency approaches the slowest single query
+instead of the sum of all of them. Workers take their connections from the
+batch pools of utils.db (one connection per worker), never from the request
+pools, so a batch cannot wait on connections held by the requests that are
+waiting for it.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from config import Config
+from .db import BATCH, PRIMARY, checkout_connection, checkout_replica, release_connection, pinned_to_primary
+from .metrics import current_stats
+from .prepared import fetch_all
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Create the shared worker pool on first use"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=Config.QUERY_BATCH_WORKERS,
+                    thread_name_prefix='chessdb-query'
+                )
+    return _executor
+
+
+def _run_query(use_primary: bool, sql: str, params: Sequence[Any]) -> Tuple[List[Dict[str, Any]], float]:
+    """Worker: run one prepared query on a dedicated connection and time it"""
+    conn = checkout_connection(PRIMARY, BATCH) if use_primary else checkout_replica(BATCH)
+    try:
+        start = time.perf_counter()
+        rows = fetch_all(conn, sql, params)
+        return rows, time.perf_counter() - start
+    finally:
+        release_connection(conn)
+
+
+def fetch_concurrently(queries: Dict[str, Tuple[str, Sequence[Any]]],
+                       readonly: bool = True) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Run independent queries concurrently and return their rows by name.
+    queries maps a name to (sql, params). Replica routing follows get_db():
+    read-only batches use replicas unless the session is pinned to the primary.
+    The first database error raised by any query is re-raised here.
+    """
+    use_primary = not readonly or not Config.DB_REPLICAS or pinned_to_primary()
+    executor = _get_executor()
+    futures = {
+        name: executor.submit(_run_query, use_primary, sql, params)
+        for name, (sql, params) in queries.items()
+    }
+
+    results = {}
+    stats = current_stats()
+    for name, future in futures.items():
+        rows, seconds = future.result()
+        results[name] = rows
+        if stats is not None:
+            stats.record(queries[name][0], seconds, len(rows))
+    return results
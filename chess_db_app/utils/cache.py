@@ -0,0 +1,65 @@
+"""
+Versioned in-process cache shared by the application caches.
+Entries expire after a TTL and the least recently used entry is dropped once
+max_entries is reached. Every key has a version that invalidate() bumps, so
+a value computed from reads that started before a write is never stored.
+"""
+
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+class VersionedCache:
+    """Thread-safe TTL/LRU cache with per-key versions and hit/miss counters"""
+
+    def __init__(self, ttl: float, max_entries: Optional[int] = None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[int, float, Any]]" = OrderedDict()
+        self._versions: Counter = Counter()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'invalidations': 0, 'evictions': 0}
+
+    def lookup(self, key: Hashable) -> Tuple[Optional[Any], int]:
+        """
+        Return (value, version); value is None on a miss.
+        Pass the version back to store() with the freshly computed value.
+        """
+        with self._lock:
+            version = self._versions[key]
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version and entry[1] > time.monotonic():
+                self._entries.move_to_end(key)
+                self._stats['hits'] += 1
+                return entry[2], version
+            self._stats['misses'] += 1
+            return None, version
+
+    def store(self, key: Hashable, value: Any, version: int) -> None:
+        """Cache value unless key was invalidated since lookup() returned version"""
+        with self._lock:
+            if self._versions[key] != version:
+                return
+            self._entries[key] = (version, time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            if self.max_entries is not None and len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def invalidate(self, *keys: Hashable) -> None:
+        """Drop keys and bump their versions"""
+        with self._lock:
+            for key in keys:
+                self._versions[key] += 1
+                self._entries.pop(key, None)
+                self._stats['invalidations'] += 1
+
+    def version(self, key: Hashable) -> int:
+        with self._lock:
+            return self._versions[key]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats)
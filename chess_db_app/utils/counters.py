@@ -0,0 +1,89 @@
+"""
+Incrementally maintained totals behind the manager dashboard.
+The stats_counters table holds one row per total: users per role, halls,
+total hall capacity, matches, and tables per hall. Write routes adjust the
+affected counters with add() in the same transaction as the change, so the
+dashboard reads every total with one primary-key lookup instead of counting
+the tables. reconcile() (reconcile_counters.py) recomputes them from
+scratch, e.g. after a bulk import or to repair drift.
+"""
+
+from typing import Any, Dict, Iterable, List, Mapping, Sequence, Tuple
+
+ROLES = ('player', 'coach', 'arbiter', 'manager')
+HALLS = 'halls'
+HALL_CAPACITY = 'halls:capacity'
+MATCHES = 'matches'
+
+# Every counter, recomputed from the base tables; must produce the names above
+_RECOMPUTE = """
+    SELECT CONCAT('users:', role) AS name, COUNT(*) AS value FROM users GROUP BY role
+    UNION ALL SELECT 'halls', COUNT(*) FROM halls
+    UNION ALL SELECT 'halls:capacity', COALESCE(SUM(capacity), 0) FROM halls
+    UNION ALL SELECT 'matches', COUNT(*) FROM matches
+    UNION ALL SELECT CONCAT('tables:hall:', hall_id), COUNT(*) FROM tables GROUP BY hall_id
+"""
+
+
+def users(role: str) -> str:
+    """Counter name of the users of one role"""
+    return f"users:{role}"
+
+
+def hall_tables(hall_id: int) -> str:
+    """Counter name of the tables of one hall"""
+    return f"tables:hall:{hall_id}"
+
+
+def add(cursor, deltas: Mapping[str, int]) -> None:
+    """
+    Adjust counters by deltas inside the caller's transaction; call before
+    commit(). Names are locked in sorted order, like versions.bump().
+    """
+    names = sorted(name for name, delta in deltas.items() if delta)
+    if not names:
+        return
+    placeholders = ', '.join(['(%s, %s)'] * len(names))
+    cursor.execute(f"""
+        INSERT INTO stats_counters (name, value) VALUES {placeholders}
+        ON DUPLICATE KEY UPDATE value = value + VALUES(value)
+    """, [param for name in names for param in (name, deltas[name])])
+
+
+def counters_query(names: Iterable[str]) -> Tuple[str, Tuple[str, ...]]:
+    """Primary-key lookup of the counters in names as (sql, params)"""
+    names = tuple(sorted(set(names)))
+    placeholders = ', '.join(['%s'] * len(names))
+    return f"SELECT name, value FROM stats_counters WHERE name IN ({placeholders})", names
+
+
+def values(rows: Sequence[Dict[str, Any]]) -> Dict[str, int]:
+    """name -> value from counters_query() rows"""
+    return {row['name']: int(row['value']) for row in rows}
+
+
+def reconcile(conn) -> List[Tuple[str, int, int]]:
+    """
+    Recompute every counter in one transaction and return (name, stored,
+    actual) for each one that had drifted. The counter rows are locked
+    first, so writers that adjust them wait and apply their delta on top.
+    """
+    cursor = conn.cursor()
+    try:
+        conn.start_transaction()
+        cursor.execute("SELECT name, value FROM stats_counters FOR UPDATE")
+        stored = {name: int(value) for name, value in cursor.fetchall()}
+        cursor.execute(_RECOMPUTE)
+        actual = {name: int(value) for name, value in cursor.fetchall()}
+        cursor.execute("DELETE FROM stats_counters")
+        if actual:
+            cursor.executemany("INSERT INTO stats_counters (name, value) VALUES (%s, %s)", sorted(actual.items()))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    return [(name, stored.get(name, 0), actual.get(name, 0))
+            for name in sorted(stored.keys() | actual.keys())
+            if stored.get(name, 0) != actual.get(name, 0)]
@@ -0,0 +1,173 @@
+"""
+Database connection management for the ChessDB application.
+All blueprints share one connection pool per endpoint; a connection is checked
+out lazily the first time a request needs it and handed back when the app
+context ends. Read-only work can be routed to replicas listed in Config.
+
+The worker threads of utils.batch draw from a second pool per endpoint, sized
+to QUERY_BATCH_WORKERS. A request thread holds its own connection while it
+waits for its batch, so if both shared one pool, DB_POOL_SIZE concurrent
+dashboards would hold every connection and starve their own workers.
+
+The command-line scripts open plain connections with connect(), outside the
+pools but against the same primary.
+"""
+
+import itertools
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import mysql.connector
+from mysql.connector import pooling
+from mysql.connector.errors import PoolError
+from flask import g, request, session, has_request_context
+
+from config import Config
+from .metrics import instrument
+
+PRIMARY = 'primary'
+BATCH = 'batch'  # pool purpose of the utils.batch workers
+
+_pools: Dict[str, pooling.MySQLConnectionPool] = {}
+_pool_lock = threading.Lock()
+_replica_counter = itertools.count()
+
+
+def endpoint_address(name: str) -> Tuple[str, int]:
+    """Return (host, port) for the primary or for a replica named 'replicaN'"""
+    if name == PRIMARY:
+        return Config.DB_HOST, Config.DB_PORT
+    host, _, port = Config.DB_REPLICAS[int(name[len('replica'):])].partition(':')
+    return host, int(port or Config.DB_PORT)
+
+
+def _get_pool(name: str = PRIMARY, purpose: Optional[str] = None) -> pooling.MySQLConnectionPool:
+    """Create the request (or, with purpose=BATCH, the batch worker) pool for an endpoint on first use"""
+    key = f"{name}_{purpose}" if purpose else name
+    pool = _pools.get(key)
+    if pool is None:
+        with _pool_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                host, port = endpoint_address(name)
+                pool = pooling.MySQLConnectionPool(
+                    pool_name=f"{Config.DB_POOL_NAME}_{key}",
+                    pool_size=Config.QUERY_BATCH_WORKERS if purpose == BATCH else Config.DB_POOL_SIZE,
+                    # Resetting the session on return would deallocate the
+                    # prepared statements cached on the connection (utils.prepared);
+                    # release_connection() rolls back open transactions instead.
+                    pool_reset_session=False,
+                    host=host,
+                    port=port,
+                    user=Config.DB_USER,
+                    password=Config.DB_PASSWORD,
+                    database=Config.DB_NAME
+                )
+                _pools[key] = pool
+    return pool
+
+
+def connect(database: bool = True):
+    """Unpooled connection to the primary for the command-line scripts; database=False selects none"""
+    host, port = endpoint_address(PRIMARY)
+    options = {'database': Config.DB_NAME} if database else {}
+    return mysql.connector.connect(host=host, port=port, user=Config.DB_USER,
+                                   password=Config.DB_PASSWORD, **options)
+
+
+def _recycle_if_stale(conn) -> None:
+    """Reconnect a pooled connection that is older than DB_POOL_RECYCLE seconds"""
+    raw = conn._cnx
+    now = time.monotonic()
+    opened_at = getattr(raw, '_chessdb_opened_at', None)
+    if opened_at is None:
+        raw._chessdb_opened_at = now
+    elif now - opened_at > Config.DB_POOL_RECYCLE:
+        raw.reconnect()
+        raw._chessdb_opened_at = now
+
+
+def checkout_connection(name: str = PRIMARY, purpose: Optional[str] = None):
+    """
+    Take a connection from an endpoint's pool, waiting up to DB_POOL_TIMEOUT
+    seconds if every connection is busy. The pool pings the connection on
+    checkout and reconnects it if the server dropped it.
+    """
+    pool = _get_pool(name, purpose)
+    deadline = time.monotonic() + Config.DB_POOL_TIMEOUT
+    while True:
+        try:
+            conn = pool.get_connection()
+            break
+        except PoolError:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(0.01)
+    _recycle_if_stale(conn)
+    return conn
+
+
+def checkout_replica(purpose: Optional[str] = None):
+    """Pick a replica round-robin, skipping unreachable ones and falling back to the primary"""
+    replica_count = len(Config.DB_REPLICAS)
+    start = next(_replica_counter)
+    for offset in range(replica_count):
+        name = f"replica{(start + offset) % replica_count}"
+        try:
+            return checkout_connection(name, purpose)
+        except mysql.connector.Error as err:
+            print(f"Replica {name} unavailable, trying next: {err}")
+    return checkout_connection(PRIMARY, purpose)
+
+
+def release_connection(conn) -> None:
+    """Roll back any open transaction and return the connection to the pool"""
+    try:
+        if conn.in_transaction:
+            conn.rollback()
+    except mysql.connector.Error as err:
+        print(f"Database error while releasing connection: {err}")
+    finally:
+        conn.close()
+
+
+def pinned_to_primary() -> bool:
+    """True while the current session is inside its read-your-writes window"""
+    return has_request_context() and session.get('db_primary_until', 0) > time.time()
+
+
+def get_db(readonly: bool = False):
+    """
+    Return the connection bound to the current request, checking one out if needed.
+    Read-only callers get a replica connection unless no replicas are configured
+    or the session wrote recently and is pinned to the primary.
+    """
+    if readonly and Config.DB_REPLICAS and not pinned_to_primary():
+        if 'db_read' not in g:
+            g.db_read = instrument(checkout_replica())
+        return g.db_read
+    if 'db' not in g:
+        g.db = instrument(checkout_connection(PRIMARY))
+    return g.db
+
+
+def pin_after_write(response):
+    """After a non-GET request that used the primary, keep this session's reads on the primary"""
+    if 'db' in g and request.method not in ('GET', 'HEAD', 'OPTIONS'):
+        session['db_primary_until'] = time.time() + Config.READ_YOUR_WRITES_SECONDS
+    return response
+
+
+def close_db(exc: Optional[BaseException] = None) -> None:
+    """Teardown handler that hands the request's connections back to their pools"""
+    for key in ('db', 'db_read'):
+        conn = g.pop(key, None)
+        if conn is not None:
+            release_connection(conn)
+
+
+def init_app(app) -> None:
+    """Register the read-your-writes hook and connection teardown on the Flask app"""
+    app.after_request(pin_after_write)
+    app.teardown_appcontext(close_db)
@@ -0,0 +1,128 @@
+"""
+Incremental ELO ratings driven by result entry.
+apply_result() runs inside the transaction that stores a match result: it
+locks the two player rows (in user_id order, so concurrent results never
+deadlock), rates the game from a precomputed expected-score table, writes
+both new ratings with one UPDATE, records the applied deltas in
+elo_changes and updates the players' rating_history series. Entering a
+different result for the same match first reverses the recorded deltas, so
+corrections never compound; revert_match() undoes a match's change when the
+match is deleted.
+
+Ratings never drop below RATING_FLOOR (the players.elo_rating CHECK
+constraint); the recorded delta is the change actually applied.
+"""
+
+from datetime import date
+from typing import Dict, Iterable, Optional, Tuple
+
+from config import Config
+from . import rating_history
+
+RATING_FLOOR = 1000
+# FIDE rule: a rating difference of more than 400 points counts as 400
+MAX_DIFFERENCE = 400
+
+# (white score, black score) per match_players.result
+SCORES = {'white': (1.0, 0.0), 'black': (0.0, 1.0), 'draw': (0.5, 0.5)}
+
+# Expected score of a player rated d points above the opponent, d in [-400, 400]
+EXPECTED = tuple(1 / (1 + 10 ** (-d / 400)) for d in range(-MAX_DIFFERENCE, MAX_DIFFERENCE + 1))
+
+
+def expected_score(rating: int, opponent: int) -> float:
+    difference = max(-MAX_DIFFERENCE, min(MAX_DIFFERENCE, int(rating) - int(opponent)))
+    return EXPECTED[difference + MAX_DIFFERENCE]
+
+
+def rating_changes(white_elo: int, black_elo: int, result: str, k: int = None) -> Tuple[int, int]:
+    """Unclamped (white, black) rating changes for a game between the two ratings"""
+    k = Config.K_FACTOR if k is None else k
+    white_score, black_score = SCORES[result]
+    return (round(k * (white_score - expected_score(white_elo, black_elo))),
+            round(k * (black_score - expected_score(black_elo, white_elo))))
+
+
+def _lock_ratings(cursor, player_ids: Iterable[int]) -> Dict[int, int]:
+    """Lock the player rows in user_id order and return their ratings"""
+    ids = sorted(set(player_ids))
+    placeholders = ', '.join(['%s'] * len(ids))
+    cursor.execute(f"""
+        SELECT user_id, elo_rating FROM players
+        WHERE user_id IN ({placeholders})
+        ORDER BY user_id
+        FOR UPDATE
+    """, ids)
+    return {user_id: Config.INITIAL_ELO if rating is None else rating for user_id, rating in cursor.fetchall()}
+
+
+def _store_ratings(cursor, ratings: Dict[int, int]) -> None:
+    if not ratings:
+        return
+    cases = ' '.join(['WHEN %s THEN %s'] * len(ratings))
+    placeholders = ', '.join(['%s'] * len(ratings))
+    cursor.execute(f"UPDATE players SET elo_rating = CASE user_id {cases} END WHERE user_id IN ({placeholders})",
+                   [param for item in sorted(ratings.items()) for param in item] + sorted(ratings))
+
+
+def _recorded_change(cursor, match_id: int) -> Optional[Tuple[int, int, int, int]]:
+    cursor.execute("""
+        SELECT white_player, black_player, white_delta, black_delta
+        FROM elo_changes WHERE match_id = %s
+        FOR UPDATE
+    """, (match_id,))
+    return cursor.fetchone()
+
+
+def _reverse(ratings: Dict[int, int], recorded: Tuple[int, int, int, int]) -> None:
+    white_player, black_player, white_delta, black_delta = recorded
+    for player, delta in ((white_player, white_delta), (black_player, black_delta)):
+        if player in ratings:
+            ratings[player] = max(RATING_FLOOR, ratings[player] - delta)
+
+
+def apply_result(cursor, match_id: int, match_date: date, white_player: int, black_player: int,
+                 result: str) -> Tuple[int, int]:
+    """
+    Rate a match result inside the caller's transaction (plain tuple cursor;
+    call before commit()). Reverses a previously recorded result of the
+    match first. Returns the applied (white, black) deltas.
+    """
+    recorded = _recorded_change(cursor, match_id)
+    players = {white_player, black_player} | (set(recorded[:2]) if recorded else set())
+    ratings = _lock_ratings(cursor, players)
+    locked = dict(ratings)
+    if recorded:
+        _reverse(ratings, recorded)
+
+    white_before, black_before = ratings[white_player], ratings[black_player]
+    white_change, black_change = rating_changes(white_before, black_before, result)
+    ratings[white_player] = max(RATING_FLOOR, white_before + white_change)
+    ratings[black_player] = max(RATING_FLOOR, black_before + black_change)
+    _store_ratings(cursor, ratings)
+
+    deltas = (ratings[white_player] - white_before, ratings[black_player] - black_before)
+    cursor.execute("""
+        INSERT INTO elo_changes (match_id, white_player, black_player, result, white_delta, black_delta)
+        VALUES (%s, %s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE white_player = VALUES(white_player), black_player = VALUES(black_player),
+            result = VALUES(result), white_delta = VALUES(white_delta), black_delta = VALUES(black_delta)
+    """, (match_id, white_player, black_player, result, *deltas))
+    rating_history.record(cursor, match_id, match_date, dict(zip((white_player, black_player), deltas)),
+                          {player: ratings[player] - locked[player] for player in ratings})
+    return deltas
+
+
+def revert_match(cursor, match_id: int) -> None:
+    """Undo the recorded rating change of a match inside the caller's transaction, e.g. before deleting it"""
+    recorded = _recorded_change(cursor, match_id)
+    if not recorded:
+        return
+    ratings = _lock_ratings(cursor, recorded[:2])
+    locked = dict(ratings)
+    _reverse(ratings, recorded)
+    _store_ratings(cursor, ratings)
+    cursor.execute("DELETE FROM elo_changes WHERE match_id = %s", (match_id,))
+    cursor.execute("SELECT date FROM matches WHERE match_id = %s", (match_id,))
+    rating_history.record(cursor, match_id, cursor.fetchone()[0], {},
+                          {player: ratings[player] - locked[player] for player in ratings})
@@ -0,0 +1,210 @@
+"""
+Full-history ELO recomputation, vectorized with NumPy.
+replay() reads every rated game (archived seasons included) once, as
+columns, and rates it in rating periods of one (date, time_slot): a player
+plays at most one game per slot, so the games of a period are independent
+and are rated together with array operations. Within a period the result is
+identical to utils.elo.apply_result() applied game by game, including the
+rating floor and the expected-score table.
+
+By default a player's starting rating is the stored rating minus every
+change recorded in elo_changes, i.e. the rating they had before their first
+rated game. That only holds when every rated game has its elo_changes row:
+results imported or entered before ratings were tracked have none, and
+their effect is already in the stored rating. replay() counts such games
+(Replay.unrecorded); replay(from_initial=True) instead starts every player
+at Config.INITIAL_ELO, a true replay of the whole history.
+write() stores the final ratings, the per-match deltas and every player's
+rating_history series with batched multi-row statements in one
+transaction. Used by rebuild_ratings.py.
+"""
+
+from typing import Dict, List, NamedTuple, Tuple
+
+import numpy as np
+
+from config import Config
+from . import elo
+from .versions import bump, entity
+
+BATCH_SIZE = 5000  # rows per multi-row INSERT
+
+_GAMES = """
+    SELECT m.match_id, m.date, COALESCE(m.time_slot, 0), mp.white_player, mp.black_player, mp.result
+    FROM all_matches m
+    JOIN all_match_players mp ON mp.match_id = m.match_id
+    WHERE mp.result IS NOT NULL AND mp.white_player IS NOT NULL AND mp.black_player IS NOT NULL
+    ORDER BY m.date, m.time_slot, m.match_id
+"""
+
+# Rated games whose rating change was never recorded
+_UNRECORDED = """
+    SELECT COUNT(*)
+    FROM all_match_players mp
+    LEFT JOIN elo_changes ec ON ec.match_id = mp.match_id
+    WHERE mp.result IS NOT NULL AND mp.white_player IS NOT NULL AND mp.black_player IS NOT NULL
+    AND ec.match_id IS NULL
+"""
+
+# Rating of every player before their first recorded change
+_BASE_RATINGS = """
+    SELECT p.user_id, COALESCE(p.elo_rating, %s) - COALESCE(SUM(d.delta), 0)
+    FROM players p
+    LEFT JOIN (
+        SELECT white_player AS user_id, white_delta AS delta FROM elo_changes
+        UNION ALL
+        SELECT black_player, black_delta FROM elo_changes
+    ) d ON d.user_id = p.user_id
+    GROUP BY p.user_id, p.elo_rating
+"""
+
+_RESULT_CODES = {'white': 0, 'black': 1, 'draw': 2}
+_WHITE_SCORE = np.array([elo.SCORES[r][0] for r in _RESULT_CODES])
+_BLACK_SCORE = np.array([elo.SCORES[r][1] for r in _RESULT_CODES])
+
+
+class Replay(NamedTuple):
+    player_ids: np.ndarray  # user ids, indexed like ratings
+    ratings: np.ndarray     # final rating per player
+    changed: np.ndarray     # player_ids whose stored rating differs from the final one
+    match_ids: np.ndarray
+    white_players: np.ndarray
+    black_players: np.ndarray
+    results: List[str]
+    white_deltas: np.ndarray
+    black_deltas: np.ndarray
+    dates: list
+    white_after: np.ndarray  # white's rating after each game
+    black_after: np.ndarray
+    periods: int
+    unrecorded: int  # rated games without an elo_changes row
+
+
+def _load(conn, from_initial: bool) -> Tuple[list, Dict[int, int], Dict[int, int], int]:
+    """Rated games in replay order, base ratings, current ratings and the unrecorded game count"""
+    cursor = conn.cursor()
+    try:
+        conn.start_transaction(readonly=True)  # one snapshot for every read
+        cursor.execute(_GAMES)
+        games = cursor.fetchall()
+        cursor.execute("SELECT user_id, COALESCE(elo_rating, %s) FROM players", (Config.INITIAL_ELO,))
+        current = {user_id: int(rating) for user_id, rating in cursor.fetchall()}
+        if from_initial:
+            base = {user_id: Config.INITIAL_ELO for user_id in current}
+        else:
+            cursor.execute(_BASE_RATINGS, (Config.INITIAL_ELO,))
+            base = {user_id: int(rating) for user_id, rating in cursor.fetchall()}
+        cursor.execute(_UNRECORDED)
+        unrecorded = int(cursor.fetchone()[0])
+        conn.commit()
+    finally:
+        cursor.close()
+    return games, base, current, unrecorded
+
+
+def replay(conn, k: int = None, from_initial: bool = False) -> Replay:
+    """
+    Rate every game from the base ratings, or from Config.INITIAL_ELO with
+    from_initial; reads only, see write()
+    """
+    k = Config.K_FACTOR if k is None else k
+    games, base, current, unrecorded = _load(conn, from_initial)
+
+    match_ids = np.fromiter((g[0] for g in games), dtype=np.int64, count=len(games))
+    periods = np.fromiter((g[1].toordinal() * 8 + g[2] for g in games), dtype=np.int64, count=len(games))
+    whites = np.fromiter((g[3] for g in games), dtype=np.int64, count=len(games))
+    blacks = np.fromiter((g[4] for g in games), dtype=np.int64, count=len(games))
+    codes = np.fromiter((_RESULT_CODES[g[5]] for g in games), dtype=np.int8, count=len(games))
+
+    # Dense player indexes; every player starts from their base rating
+    player_ids, inverse = np.unique(np.concatenate([whites, blacks, np.fromiter(base, dtype=np.int64)]),
+                                    return_inverse=True)
+    white_idx, black_idx = inverse[:len(games)], inverse[len(games):2 * len(games)]
+    ratings = np.array([max(elo.RATING_FLOOR, base.get(int(pid), Config.INITIAL_ELO)) for pid in player_ids],
+                       dtype=np.int64)
+
+    expected = np.asarray(elo.EXPECTED)
+    cap = elo.MAX_DIFFERENCE
+    white_deltas = np.zeros(len(games), dtype=np.int64)
+    black_deltas = np.zeros(len(games), dtype=np.int64)
+    white_after = np.zeros(len(games), dtype=np.int64)
+    black_after = np.zeros(len(games), dtype=np.int64)
+    bounds = np.concatenate([[0], np.flatnonzero(np.diff(periods)) + 1, [len(games)]]) if len(games) else [0]
+
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        w, b = white_idx[start:end], black_idx[start:end]
+        white_before, black_before = ratings[w], ratings[b]
+        difference = np.clip(white_before - black_before, -cap, cap)
+        # np.rint rounds half to even, like round() in elo.rating_changes()
+        white_change = np.rint(k * (_WHITE_SCORE[codes[start:end]] - expected[difference + cap])).astype(np.int64)
+        black_change = np.rint(k * (_BLACK_SCORE[codes[start:end]] - expected[cap - difference])).astype(np.int64)
+        # Applied changes stop at the floor, as in elo.apply_result()
+        white_change = np.maximum(white_change, elo.RATING_FLOOR - white_before)
+        black_change = np.maximum(black_change, elo.RATING_FLOOR - black_before)
+        # add.at accumulates if imported data double-books a player in one slot
+        np.add.at(ratings, w, white_change)
+        np.add.at(ratings, b, black_change)
+        np.maximum(ratings, elo.RATING_FLOOR, out=ratings)
+        white_deltas[start:end], black_deltas[start:end] = white_change, black_change
+        white_after[start:end], black_after[start:end] = white_before + white_change, black_before + black_change
+
+    stored = np.array([current.get(int(pid), -1) for pid in player_ids], dtype=np.int64)
+    return Replay(player_ids, ratings, player_ids[(stored != ratings) & (stored >= 0)],
+                  match_ids, whites, blacks, [g[5] for g in games], white_deltas, black_deltas,
+                  [g[1] for g in games], white_after, black_after, len(bounds) - 1, unrecorded)
+
+
+def _batches(rows: list):
+    for start in range(0, len(rows), BATCH_SIZE):
+        yield rows[start:start + BATCH_SIZE]
+
+
+def write(conn, result: Replay) -> None:
+    """
+    Store the replayed ratings and deltas in one transaction. Ratings go
+    through a temporary table and one UPDATE ... JOIN; deltas replace
+    elo_changes and the ratings after each game replace rating_history.
+    Changed players get their data version bumped.
+    """
+    ratings = [(int(pid), int(rating)) for pid, rating in zip(result.player_ids, result.ratings)]
+    changes = list(zip(result.match_ids.tolist(), result.white_players.tolist(), result.black_players.tolist(),
+                       result.results, result.white_deltas.tolist(), result.black_deltas.tolist()))
+    match_ids = result.match_ids.tolist()
+    history = (list(zip(result.white_players.tolist(), result.dates, match_ids, result.white_after.tolist()))
+               + list(zip(result.black_players.tolist(), result.dates, match_ids, result.black_after.tolist())))
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            CREATE TEMPORARY TABLE elo_replay_ratings (
+                user_id INT PRIMARY KEY,
+                elo_rating INT NOT NULL
+            )
+        """)
+        conn.start_transaction()
+        for batch in _batches(ratings):
+            cursor.executemany("INSERT INTO elo_replay_ratings (user_id, elo_rating) VALUES (%s, %s)", batch)
+        cursor.execute("""
+            UPDATE players p
+            JOIN elo_replay_ratings r ON r.user_id = p.user_id
+            SET p.elo_rating = r.elo_rating
+            WHERE NOT p.elo_rating <=> r.elo_rating
+        """)
+        cursor.execute("DELETE FROM elo_changes")
+        for batch in _batches(changes):
+            cursor.executemany("""
+                INSERT INTO elo_changes (match_id, white_player, black_player, result, white_delta, black_delta)
+                VALUES (%s, %s, %s, %s, %s, %s)
+            """, batch)
+        cursor.execute("DELETE FROM rating_history")
+        for batch in _batches(history):
+            cursor.executemany("INSERT INTO rating_history (player_id, date, match_id, rating_after) "
+                               "VALUES (%s, %s, %s, %s)", batch)
+        for batch in _batches(result.changed.tolist()):
+            bump(cursor, *(entity('player', pid) for pid in batch))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.execute("DROP TEMPORARY TABLE IF EXISTS elo_replay_ratings")
+        cursor.close()
@@ -0,0 +1,60 @@
+"""
+Jinja fragment caching for large template blocks.
+Adds a {% cache key, version, ... %}...{% endcache %} tag: the block is
+rendered once per distinct set of arguments and served from an in-memory LRU
+afterwards. Callers put the data version (the page ETag from utils.versions)
+among the arguments, so a write that changes the data also changes the key.
+A block whose arguments include None or an undefined variable is rendered
+without caching.
+"""
+
+from typing import Any, Tuple
+
+from jinja2 import nodes, Undefined
+from jinja2.ext import Extension
+
+from config import Config
+from .cache import VersionedCache
+from .metrics import register_counters
+
+_fragments = VersionedCache(Config.FRAGMENT_CACHE_TTL, Config.FRAGMENT_CACHE_SIZE)
+register_counters('chessdb_fragment_cache', _fragments.stats)
+
+
+class FragmentCacheExtension(Extension):
+    """The {% cache %} template tag"""
+
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            args.append(parser.parse_expression())
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        call = self.call_method('_render', [nodes.List(args)])
+        return nodes.CallBlock(call, [], [], body).set_lineno(lineno)
+
+    def _render(self, key_parts, caller):
+        if any(part is None or isinstance(part, Undefined) for part in key_parts):
+            return caller()
+        key = tuple(str(part) for part in key_parts)
+        html, version = _fragments.lookup(key)
+        if html is not None:
+            return html
+        if self.environment.is_async:
+            # Quart renders asynchronously; the returned coroutine is awaited by Jinja
+            return self._render_async(key, version, caller)
+        html = caller()
+        _fragments.store(key, html, version)
+        return html
+
+    async def _render_async(self, key: Tuple[str, ...], version: int, caller) -> Any:
+        html = await caller()
+        _fragments.store(key, html, version)
+        return html
+
+
+def init_app(app) -> None:
+    """Enable the {% cache %} tag in the app's templates"""
+    app.jinja_env.add_extension(FragmentCacheExtension)
@@ -0,0 +1,274 @@
+"""
+In-process rating leaderboard.
+Ranking with ORDER BY elo_rating plus a COUNT(*) per "your rank" scans the
+players table on every view. Instead every worker keeps a Leaderboard built
+from one read of the players: per filter (all players, one nationality, one
+title, or both) a Fenwick tree counts the players at each rating, so the rank
+of a rating, the rating at a position and therefore top-N and "players
+around me" are answered in O(log R) for R distinct rating values.
+
+Result entry and match deletion call refresh() with the affected players
+after commit, which moves them in this process's board; a TTL bounds
+staleness for other worker processes and for rebuild_ratings.py. Ranks are
+competition ranks: equal ratings share a rank, ties are listed by user_id.
+"""
+
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from config import Config
+from .elo import RATING_FLOOR
+from .metrics import register_counters
+from .prepared import fetch_all
+
+# (nationality, title_id); None matches any
+Filter = Tuple[Optional[str], Optional[str]]
+
+_PLAYERS = """
+    SELECT p.user_id, u.username, p.name, p.surname, p.nationality, p.title_id, t.title_name,
+           COALESCE(p.elo_rating, %s) AS elo_rating
+    FROM players p
+    JOIN users u ON u.user_id = p.user_id
+    LEFT JOIN titles t ON t.title_id = p.title_id
+"""
+
+
+def board_query() -> Tuple[str, Tuple[int]]:
+    """Every player as (sql, params), for store()"""
+    return _PLAYERS, (Config.INITIAL_ELO,)
+
+
+def players_query(user_ids: Iterable[int]) -> Tuple[str, Tuple[int, ...]]:
+    """The given players as (sql, params), for update(); a primary-key lookup"""
+    ids = tuple(sorted(set(user_ids)))
+    placeholders = ', '.join(['%s'] * len(ids))
+    return f"{_PLAYERS} WHERE p.user_id IN ({placeholders})", (Config.INITIAL_ELO, *ids)
+
+
+class _RankIndex:
+    """The players of one filter: a Fenwick tree of player counts per rating and the players at each rating"""
+
+    def __init__(self):
+        self.size = 1 << 12  # ratings RATING_FLOOR .. RATING_FLOOR + 4095, grown on demand
+        self.tree = [0] * (self.size + 1)
+        self.total = 0
+        self.at: Dict[int, List[int]] = {}  # rating -> user_ids, sorted
+
+    @staticmethod
+    def _slot(rating: int) -> int:
+        return max(rating, RATING_FLOOR) - RATING_FLOOR + 1
+
+    def _add(self, slot: int, delta: int) -> None:
+        while slot <= self.size:
+            self.tree[slot] += delta
+            slot += slot & -slot
+
+    def _prefix(self, slot: int) -> int:
+        """Players rated at or below the rating of slot"""
+        count = 0
+        while slot > 0:
+            count += self.tree[slot]
+            slot -= slot & -slot
+        return count
+
+    def _grow(self, slot: int) -> None:
+        while self.size < slot:
+            self.size <<= 1
+        self.tree = [0] * (self.size + 1)
+        for rating, ids in self.at.items():
+            self._add(self._slot(rating), len(ids))
+
+    def add(self, user_id: int, rating: int) -> None:
+        slot = self._slot(rating)
+        if slot > self.size:
+            self._grow(slot)
+        insort(self.at.setdefault(rating, []), user_id)
+        self._add(slot, 1)
+        self.total += 1
+
+    def remove(self, user_id: int, rating: int) -> None:
+        ids = self.at[rating]
+        del ids[bisect_left(ids, user_id)]
+        if not ids:
+            del self.at[rating]
+        self._add(self._slot(rating), -1)
+        self.total -= 1
+
+    def above(self, rating: int) -> int:
+        """Players rated higher than rating"""
+        return self.total - self._prefix(self._slot(rating))
+
+    def rating_at(self, position: int) -> int:
+        """Rating of the position-th highest rated player (1-based), by descending the tree"""
+        remaining, slot, step = self.total - position + 1, 0, self.size
+        while step:
+            if slot + step <= self.size and self.tree[slot + step] < remaining:
+                slot += step
+                remaining -= self.tree[slot]
+            step >>= 1
+        return slot + RATING_FLOOR
+
+    def position(self, user_id: int, rating: int) -> int:
+        """1-based position of a player in rating order"""
+        return self.above(rating) + bisect_left(self.at[rating], user_id) + 1
+
+    def span(self, start: int, count: int) -> List[Tuple[int, int]]:
+        """(rank, user_id) of count players from position start on"""
+        found = []
+        position = max(1, start)
+        while len(found) < count and position <= self.total:
+            rating = self.rating_at(position)
+            above, ids = self.above(rating), self.at[rating]
+            found.extend((above + 1, user_id) for user_id in ids[position - above - 1:][:count - len(found)])
+            position = above + len(ids) + 1
+        return found
+
+
+class Leaderboard:
+    """Players ranked by rating, overall and per nationality and title; thread-safe"""
+
+    def __init__(self, rows: Iterable[Dict[str, Any]]):
+        self._lock = threading.Lock()
+        self._players: Dict[int, Dict[str, Any]] = {}
+        self._indexes: Dict[Filter, _RankIndex] = defaultdict(_RankIndex)
+        for row in rows:
+            self._add(row)
+
+    @staticmethod
+    def _filters(player: Dict[str, Any]) -> set:
+        nationality, title_id = player['nationality'], player['title_id']
+        return {(None, None), (nationality, None), (None, title_id), (nationality, title_id)}
+
+    def _add(self, row: Dict[str, Any]) -> None:
+        player = dict(row, elo_rating=int(row['elo_rating']))
+        self._players[player['user_id']] = player
+        for key in self._filters(player):
+            self._indexes[key].add(player['user_id'], player['elo_rating'])
+
+    def _remove(self, user_id: int) -> None:
+        player = self._players.pop(user_id, None)
+        if player is not None:
+            for key in self._filters(player):
+                self._indexes[key].remove(user_id, player['elo_rating'])
+
+    def _ranked(self, found: List[Tuple[int, int]]) -> List[Dict[str, Any]]:
+        return [dict(self._players[user_id], rank=rank) for rank, user_id in found]
+
+    def _index(self, nationality: Optional[str], title_id: Optional[str]) -> Optional[_RankIndex]:
+        return self._indexes.get((nationality or None, title_id or None))
+
+    def move(self, rows: Iterable[Dict[str, Any]]) -> None:
+        """Re-rank players from fresh players_query() rows"""
+        with self._lock:
+            for row in rows:
+                self._remove(row['user_id'])
+                self._add(row)
+
+    def player(self, user_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            player = self._players.get(user_id)
+            return dict(player) if player else None
+
+    def nationalities(self) -> List[str]:
+        with self._lock:
+            return sorted(key[0] for key, index in self._indexes.items()
+                          if key[0] is not None and key[1] is None and index.total)
+
+    def size(self, nationality: Optional[str] = None, title_id: Optional[str] = None) -> int:
+        """Players matching the filter"""
+        with self._lock:
+            index = self._index(nationality, title_id)
+            return index.total if index else 0
+
+    def top(self, n: int, nationality: Optional[str] = None, title_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """The n highest rated players matching the filter, each with its rank"""
+        with self._lock:
+            index = self._index(nationality, title_id)
+            return self._ranked(index.span(1, n)) if index else []
+
+    def rank(self, user_id: int, nationality: Optional[str] = None,
+             title_id: Optional[str] = None) -> Optional[Tuple[int, int]]:
+        """(rank, players) of a player among the players matching the filter; None if not among them"""
+        with self._lock:
+            player, index = self._players.get(user_id), self._index(nationality, title_id)
+            if player is None or index is None or (nationality or None, title_id or None) not in self._filters(player):
+                return None
+            return index.above(player['elo_rating']) + 1, index.total
+
+    def around(self, user_id: int, radius: int, nationality: Optional[str] = None,
+               title_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """The player with up to radius players on either side, in rank order; empty if not matching the filter"""
+        with self._lock:
+            player, index = self._players.get(user_id), self._index(nationality, title_id)
+            if player is None or index is None or (nationality or None, title_id or None) not in self._filters(player):
+                return []
+            position = index.position(user_id, player['elo_rating'])
+            start = max(1, position - radius)
+            return self._ranked(index.span(start, position + radius - start + 1))
+
+
+_lock = threading.Lock()
+_board: Optional[Leaderboard] = None
+_expires = 0.0
+# Bumped by every update(), so a board loaded from reads that raced a rating change is not kept
+_generation = 0
+_stats = {'hits': 0, 'rebuilds': 0, 'updates': 0}
+
+
+def lookup() -> Tuple[Optional[Leaderboard], int]:
+    """
+    Return (board, generation); board is None when there is none or it has
+    expired. Load board_query() and pass the rows and generation to store().
+    """
+    with _lock:
+        if _board is not None and _expires > time.monotonic():
+            _stats['hits'] += 1
+            return _board, _generation
+        return None, _generation
+
+
+def store(rows: Iterable[Dict[str, Any]], generation: int) -> Leaderboard:
+    """Build a board from board_query() rows; kept unless update() ran since lookup() returned generation"""
+    global _board, _expires
+    board = Leaderboard(rows)
+    with _lock:
+        _stats['rebuilds'] += 1
+        if _generation == generation:
+            _board, _expires = board, time.monotonic() + Config.LEADERBOARD_TTL
+    return board
+
+
+def board(conn) -> Leaderboard:
+    """The current board, rebuilt from conn when missing or expired"""
+    current, generation = lookup()
+    return current if current is not None else store(fetch_all(conn, *board_query()), generation)
+
+
+def update(rows: Iterable[Dict[str, Any]]) -> None:
+    """Move the players in players_query() rows on this process's board"""
+    global _generation
+    with _lock:
+        _generation += 1
+        _stats['updates'] += 1
+        current = _board
+    if current is not None:
+        current.move(rows)
+
+
+def refresh(conn, *user_ids: Optional[int]) -> None:
+    """Re-read players whose rating changed and move them; call after commit(). None entries are ignored."""
+    ids = [user_id for user_id in user_ids if user_id is not None]
+    if ids:
+        update(fetch_all(conn, *players_query(ids)))
+
+
+def stats() -> Dict[str, int]:
+    """Process-wide hit, rebuild and update counters"""
+    with _lock:
+        return dict(_stats)
+
+
+register_counters('chessdb_leaderboard', stats)
@@ -0,0 +1,260 @@
+"""
+Per-request query instrumentation for the ChessDB application.
+Connections handed out by utils.db are wrapped so every cursor records how
+many statements a request runs, how long they take and how many rows come
+back. Repeated statement shapes within one request are flagged as likely
+N+1 patterns, and the per-endpoint aggregates are rendered as Prometheus
+histograms for /manager/metrics.
+"""
+
+import heapq
+import re
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Tuple
+
+from flask import g, request, has_app_context
+
+from config import Config
+from .prepared import cache_stats
+
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+DB_TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+ROW_COUNT_BUCKETS = (10, 100, 1000, 10000, 100000)
+
+_WHITESPACE = re.compile(r'\s+')
+_STRING_LITERAL = re.compile(r"'(?:[^'\\]|\\.)*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+
+
+def statement_shape(sql: str) -> str:
+    """Collapse whitespace and replace literals so equivalent statements compare equal"""
+    if isinstance(sql, (bytes, bytearray)):
+        sql = sql.decode('utf-8', 'replace')
+    shape = _STRING_LITERAL.sub('?', sql)
+    shape = _NUMBER_LITERAL.sub('?', shape)
+    return _WHITESPACE.sub(' ', shape).strip()
+
+
+class RequestQueryStats:
+    """Statement counters for a single request"""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.rows = 0
+        self.shapes: Counter = Counter()
+        self._slowest: List[Tuple[float, str]] = []
+
+    def record(self, sql: str, seconds: float, rows: int = 0) -> None:
+        """Record one executed statement"""
+        shape = statement_shape(sql)
+        self.queries += 1
+        self.db_time += seconds
+        self.rows += rows
+        self.shapes[shape] += 1
+        entry = (seconds, shape)
+        if len(self._slowest) < Config.SLOW_STATEMENTS_PER_REQUEST:
+            heapq.heappush(self._slowest, entry)
+        elif entry > self._slowest[0]:
+            heapq.heapreplace(self._slowest, entry)
+
+    def record_fetch(self, seconds: float, rows: int) -> None:
+        """Record time and rows spent reading a result set"""
+        self.db_time += seconds
+        self.rows += rows
+
+    def slowest(self) -> List[Tuple[float, str]]:
+        """Slowest statements of the request, slowest first"""
+        return sorted(self._slowest, reverse=True)
+
+    def repeated_shapes(self, threshold: int) -> List[Tuple[str, int]]:
+        """Statement shapes executed at least threshold times"""
+        return [(shape, count) for shape, count in self.shapes.most_common() if count >= threshold]
+
+
+class InstrumentedCursor:
+    """Cursor proxy that reports executions and fetched rows to RequestQueryStats"""
+
+    def __init__(self, cursor, stats: RequestQueryStats):
+        self._cursor = cursor
+        self._stats = stats
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self._cursor.execute(operation, params, *args, **kwargs)
+        finally:
+            self._stats.record(operation, time.perf_counter() - start)
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self._cursor.executemany(operation, seq_params, *args, **kwargs)
+        finally:
+            self._stats.record(operation, time.perf_counter() - start)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = self._cursor.fetchone()
+        self._stats.record_fetch(time.perf_counter() - start, 0 if row is None else 1)
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        start = time.perf_counter()
+        rows = self._cursor.fetchmany(*args, **kwargs)
+        self._stats.record_fetch(time.perf_counter() - start, len(rows))
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = self._cursor.fetchall()
+        self._stats.record_fetch(time.perf_counter() - start, len(rows))
+        return rows
+
+    def __iter__(self):
+        row = self.fetchone()
+        while row is not None:
+            yield row
+            row = self.fetchone()
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class InstrumentedConnection:
+    """Connection proxy whose cursors are instrumented"""
+
+    def __init__(self, conn, stats: RequestQueryStats):
+        self._conn = conn
+        self.query_stats = stats
+
+    def cursor(self, *args, **kwargs):
+        return InstrumentedCursor(self._conn.cursor(*args, **kwargs), self.query_stats)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def current_stats() -> Optional[RequestQueryStats]:
+    """Stats object of the current request, created on first use"""
+    if not has_app_context():
+        return None
+    if 'query_stats' not in g:
+        g.query_stats = RequestQueryStats()
+    return g.query_stats
+
+
+def instrument(conn):
+    """Wrap a connection so its cursors report to the current request's stats"""
+    stats = current_stats()
+    if stats is None:
+        return conn
+    return InstrumentedConnection(conn, stats)
+
+
+class Histogram:
+    """Cumulative Prometheus histogram with an endpoint label"""
+
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...]):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self._series: Dict[str, List] = {}
+
+    def observe(self, endpoint: str, value: float) -> None:
+        series = self._series.setdefault(endpoint, [[0] * len(self.buckets), 0.0, 0])
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[0][i] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for endpoint, (bucket_counts, total, count) in sorted(self._series.items()):
+            label = f'endpoint="{_escape_label(endpoint)}"'
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {bucket_count}')
+            lines.append(f'{self.name}_bucket{{{label},le="+Inf"}} {count}')
+            lines.append(f'{self.name}_sum{{{label}}} {total}')
+            lines.append(f'{self.name}_count{{{label}}} {count}')
+        return lines
+
+
+def _escape_label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+_lock = threading.Lock()
+_query_count = Histogram('chessdb_request_queries', 'SQL statements executed per request.', QUERY_COUNT_BUCKETS)
+_db_time = Histogram('chessdb_request_db_seconds', 'Time spent in the database per request.', DB_TIME_BUCKETS)
+_rows = Histogram('chessdb_request_rows', 'Rows fetched per request.', ROW_COUNT_BUCKETS)
+_n_plus_one: Counter = Counter()
+_slowest_statements: Dict[str, float] = {}
+_counter_sources: List[Tuple[str, Callable[[], Dict[str, int]]]] = [('chessdb_prepared_statement_cache', cache_stats)]
+
+
+def register_counters(prefix: str, source: Callable[[], Dict[str, int]]) -> None:
+    """Expose the counters returned by source() on /manager/metrics as <prefix>_<key>_total"""
+    _counter_sources.append((prefix, source))
+
+
+def _remember_slow_statement(shape: str, seconds: float) -> None:
+    """Keep the slowest statement shapes seen so far, bounded by SLOW_STATEMENTS_TRACKED"""
+    if seconds <= _slowest_statements.get(shape, 0.0):
+        return
+    _slowest_statements[shape] = seconds
+    if len(_slowest_statements) > Config.SLOW_STATEMENTS_TRACKED:
+        del _slowest_statements[min(_slowest_statements, key=_slowest_statements.get)]
+
+
+def finish_request(exc: Optional[BaseException] = None) -> None:
+    """Teardown handler that folds the request's stats into the aggregates"""
+    stats = g.pop('query_stats', None)
+    if stats is None:
+        return
+    endpoint = request.endpoint or 'unknown'
+    repeated = stats.repeated_shapes(Config.N_PLUS_ONE_THRESHOLD)
+
+    with _lock:
+        _query_count.observe(endpoint, stats.queries)
+        _db_time.observe(endpoint, stats.db_time)
+        _rows.observe(endpoint, stats.rows)
+        if repeated:
+            _n_plus_one[endpoint] += 1
+        for seconds, shape in stats.slowest():
+            _remember_slow_statement(shape[:200], seconds)
+
+    for shape, count in repeated:
+        print(f"Possible N+1 in {endpoint}: statement ran {count} times: {shape[:200]}")
+
+
+def render_prometheus() -> str:
+    """Render all aggregates in the Prometheus text exposition format"""
+    with _lock:
+        lines = _query_count.render() + _db_time.render() + _rows.render()
+
+        lines.append('# HELP chessdb_n_plus_one_requests_total Requests that repeated one statement shape at least N_PLUS_ONE_THRESHOLD times.')
+        lines.append('# TYPE chessdb_n_plus_one_requests_total counter')
+        for endpoint, count in sorted(_n_plus_one.items()):
+            lines.append(f'chessdb_n_plus_one_requests_total{{endpoint="{_escape_label(endpoint)}"}} {count}')
+
+        lines.append('# HELP chessdb_slowest_statement_seconds Slowest observed duration per statement shape.')
+        lines.append('# TYPE chessdb_slowest_statement_seconds gauge')
+        for shape, seconds in sorted(_slowest_statements.items(), key=lambda item: -item[1]):
+            lines.append(f'chessdb_slowest_statement_seconds{{statement="{_escape_label(shape)}"}} {seconds}')
+
+    for prefix, source in _counter_sources:
+        for key, value in sorted(source().items()):
+            name = f'{prefix}_{key}_total'
+            lines.append(f'# TYPE {name} counter')
+            lines.append(f'{name} {value}')
+
+    return '\n'.join(lines) + '\n'
+
+
+def init_app(app) -> None:
+    """Register the stats teardown on the Flask app"""
+    app.teardown_request(finish_request)
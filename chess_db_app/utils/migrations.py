@@ -0,0 +1,261 @@
+"""
+Versioned schema migrations for the ChessDB database.
+Migrations are numbered SQL files in migrations/ (0001_baseline.sql,
+0002_...). Each one is applied once, in order, and recorded in the
+schema_migrations table together with a checksum of its file, so schema and
+index changes can be shipped to a live database without recreating it.
+
+Files are split into statements by split_statements(), which understands
+quoting, comments and mysql-client style DELIMITER lines, so trigger and
+procedure bodies can be written exactly as they would be for the mysql CLI.
+
+A file whose first line is "-- migrate: online" holds online index changes:
+every ALTER TABLE ... ADD INDEX runs with ALGORITHM=INPLACE, LOCK=NONE (reads
+and writes continue while the index builds), and an index, column, table or
+foreign key that already exists is skipped, so a file interrupted halfway can
+simply be run again.
+"""
+
+import hashlib
+import os
+import re
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+import mysql.connector
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+BASELINE_VERSION = 1
+LOCK_NAME = 'chessdb_schema_migrations'
+LOCK_TIMEOUT = 60  # seconds to wait for another migration run to finish
+
+ONLINE_MARKER = '-- migrate: online'
+# Errors that mean an online statement was already applied:
+# 1060 duplicate column, 1061 duplicate key name, 1050 table exists,
+# 1826 duplicate foreign key constraint name
+ALREADY_APPLIED_ERRORS = {1050, 1060, 1061, 1826}
+
+_FILENAME = re.compile(r'^(\d+)_(\w+)\.sql$')
+_DELIMITER = re.compile(r'^\s*DELIMITER\s+(\S+)\s*$', re.IGNORECASE)
+_ADD_INDEX = re.compile(r'^\s*ALTER\s+TABLE\b.*\bADD\s+(UNIQUE\s+|FULLTEXT\s+)?(INDEX|KEY)\b', re.IGNORECASE | re.S)
+_ALGORITHM = re.compile(r'\bALGORITHM\s*=', re.IGNORECASE)
+
+SCHEMA_MIGRATIONS_TABLE = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INT PRIMARY KEY,
+        name VARCHAR(255) NOT NULL,
+        checksum CHAR(64) NOT NULL,
+        applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        execution_ms INT NOT NULL DEFAULT 0
+    )
+"""
+
+
+class MigrationError(Exception):
+    """A migration statement failed; the message names the file and statement"""
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    path: str
+    sql: str
+
+    @property
+    def checksum(self) -> str:
+        return hashlib.sha256(self.sql.encode()).hexdigest()
+
+    @property
+    def online(self) -> bool:
+        return self.sql.lstrip().lower().startswith(ONLINE_MARKER)
+
+
+def split_statements(sql: str) -> List[str]:
+    """
+    Split a script into statements on the current delimiter.
+    DELIMITER lines change the delimiter as in the mysql client; delimiters
+    inside quotes, backticks and comments are ignored. Comment-only
+    statements are dropped.
+    """
+    statements = []
+    delimiter = ';'
+    current = []
+    quote = None          # active quote character
+    block_comment = False
+
+    for line in sql.splitlines(keepends=True):
+        if quote is None and not block_comment:
+            match = _DELIMITER.match(line)
+            if match:
+                _flush(current, statements)
+                delimiter = match.group(1)
+                continue
+
+        i = 0
+        while i < len(line):
+            char = line[i]
+            if block_comment:
+                if line.startswith('*/', i):
+                    block_comment = False
+                    current.append('*/')
+                    i += 2
+                    continue
+                current.append(char)
+            elif quote is not None:
+                current.append(char)
+                if char == '\\' and quote != '`' and i + 1 < len(line):
+                    current.append(line[i + 1])
+                    i += 1
+                elif char == quote:
+                    quote = None
+            elif line.startswith('/*', i):
+                block_comment = True
+                current.append('/*')
+                i += 2
+                continue
+            elif line.startswith('--', i) and (i + 2 == len(line) or line[i + 2].isspace()) or char == '#':
+                current.append(line[i:])  # comment runs to the end of the line
+                break
+            elif char in ("'", '"', '`'):
+                quote = char
+                current.append(char)
+            elif line.startswith(delimiter, i):
+                _flush(current, statements)
+                i += len(delimiter)
+                continue
+            else:
+                current.append(char)
+            i += 1
+
+    _flush(current, statements)
+    return statements
+
+
+def _flush(current: List[str], statements: List[str]) -> None:
+    statement = ''.join(current).strip()
+    current.clear()
+    if statement and _strip_comments(statement):
+        statements.append(statement)
+
+
+def _strip_comments(statement: str) -> str:
+    without_blocks = re.sub(r'/\*.*?\*/', '', statement, flags=re.S)
+    return '\n'.join(line for line in without_blocks.splitlines()
+                     if not re.match(r'^\s*(--(\s|$)|#)', line)).strip()
+
+
+def online_statement(statement: str) -> str:
+    """Add ALGORITHM=INPLACE, LOCK=NONE to an index addition that does not choose its own algorithm"""
+    if _ADD_INDEX.match(_strip_comments(statement)) and not _ALGORITHM.search(statement):
+        return f"{_strip_comments(statement)}, ALGORITHM=INPLACE, LOCK=NONE"
+    return statement
+
+
+def discover(directory: str = MIGRATIONS_DIR) -> List[Migration]:
+    """All migration files in directory, ordered by version"""
+    migrations = []
+    for filename in sorted(os.listdir(directory)):
+        match = _FILENAME.match(filename)
+        if not match:
+            continue
+        path = os.path.join(directory, filename)
+        with open(path, encoding='utf-8') as f:
+            migrations.append(Migration(int(match.group(1)), match.group(2), path, f.read()))
+    versions = [m.version for m in migrations]
+    if len(versions) != len(set(versions)):
+        raise MigrationError(f"Duplicate migration version in {directory}")
+    return sorted(migrations)
+
+
+def applied_versions(cursor) -> Dict[int, str]:
+    """version -> checksum of every recorded migration"""
+    cursor.execute("SELECT version, checksum FROM schema_migrations")
+    return {version: checksum for version, checksum in cursor.fetchall()}
+
+
+def _adopt_existing_schema(cursor, migrations: List[Migration]) -> None:
+    """
+    Record the baseline as applied on a database that was created by the old
+    sql/create_tables.sql script, so migrating it does not recreate its tables.
+    What the old scripts left out or dropped is restored by
+    0012_reconcile_adopted_schema.
+    """
+    cursor.execute("SELECT COUNT(*) FROM schema_migrations")
+    if cursor.fetchone()[0]:
+        return
+    cursor.execute("SELECT COUNT(*) FROM information_schema.TABLES "
+                   "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'users'")
+    if not cursor.fetchone()[0]:
+        return
+    baseline = next(m for m in migrations if m.version == BASELINE_VERSION)
+    cursor.execute("INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s)",
+                   (baseline.version, baseline.name, baseline.checksum))
+    print(f"Existing schema found; recorded {baseline.version:04d}_{baseline.name} as applied")
+
+
+def _apply(cursor, migration: Migration) -> None:
+    start = time.monotonic()
+    for statement in split_statements(migration.sql):
+        if migration.online:
+            statement = online_statement(statement)
+        try:
+            cursor.execute(statement)
+            if cursor.with_rows:
+                cursor.fetchall()
+        except mysql.connector.Error as err:
+            if migration.online and err.errno in ALREADY_APPLIED_ERRORS:
+                print(f"  already applied, skipping: {err.msg}")
+                continue
+            raise MigrationError(f"{os.path.basename(migration.path)} failed: {err}\n{statement}") from err
+    elapsed_ms = int((time.monotonic() - start) * 1000)
+    cursor.execute("INSERT INTO schema_migrations (version, name, checksum, execution_ms) VALUES (%s, %s, %s, %s)",
+                   (migration.version, migration.name, migration.checksum, elapsed_ms))
+
+
+def migrate(conn, target: Optional[int] = None, directory: str = MIGRATIONS_DIR) -> List[Migration]:
+    """
+    Apply every pending migration up to target (default: all) on conn, which
+    must be connected to the application database. Returns the migrations
+    that were applied. Concurrent runs are serialised with a named lock.
+    MySQL commits DDL implicitly, so a failed migration is not rolled back;
+    fix it and run again (online migrations are safe to re-run).
+    """
+    migrations = discover(directory)
+    conn.autocommit = True
+    cursor = conn.cursor()
+    cursor.execute("SELECT GET_LOCK(%s, %s)", (LOCK_NAME, LOCK_TIMEOUT))
+    if cursor.fetchone()[0] != 1:
+        raise MigrationError("Another migration run holds the schema lock")
+    try:
+        cursor.execute(SCHEMA_MIGRATIONS_TABLE)
+        _adopt_existing_schema(cursor, migrations)
+        applied = applied_versions(cursor)
+
+        for migration in migrations:
+            if migration.version in applied and applied[migration.version] != migration.checksum:
+                print(f"Warning: {os.path.basename(migration.path)} changed after it was applied")
+
+        done = []
+        for migration in migrations:
+            if migration.version in applied or (target is not None and migration.version > target):
+                continue
+            print(f"Applying {migration.version:04d}_{migration.name}"
+                  f"{' (online)' if migration.online else ''}...")
+            _apply(cursor, migration)
+            done.append(migration)
+        return done
+    finally:
+        cursor.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+        cursor.fetchall()
+        cursor.close()
+
+
+def status(conn, directory: str = MIGRATIONS_DIR) -> List[tuple]:
+    """(migration, applied) for every migration file"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(SCHEMA_MIGRATIONS_TABLE)
+        applied = applied_versions(cursor)
+    finally:
+        cursor.close()
+    return [(migration, migration.version in applied) for migration in discover(directory)]
@@ -0,0 +1,134 @@
+"""
+Keyset (seek) pagination for the long lists: a player's matches, an
+arbiter's and a team's matches, and the manager's user list.
+A page is read with a WHERE clause that starts right after the last row of
+the previous page (or right before the first row of the next one) and a
+LIMIT, so with an index on the sort key MySQL reads one page of index
+entries instead of the whole history, however deep the page is.
+
+The position travels in the query string as an opaque cursor: the URL-safe
+base64 of [direction, key values...]. A missing, tampered or stale cursor
+is treated as the first page. Key columns must be NOT NULL in practice and
+together unique, which is why match lists end their key with match_id.
+"""
+
+import base64
+import binascii
+import json
+from datetime import date
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from config import Config
+
+AFTER = 'after'
+BEFORE = 'before'
+
+
+class Keyset(NamedTuple):
+    columns: Tuple[str, ...]  # row keys of the sort key, most significant first
+    descending: bool = False
+
+
+class Cursor(NamedTuple):
+    direction: str
+    values: Tuple[Any, ...]
+
+
+class Page(NamedTuple):
+    rows: List[Dict[str, Any]]
+    next_cursor: Optional[str]
+    prev_cursor: Optional[str]
+
+
+# Newest match first; time_slot and match_id make the order total
+MATCHES = Keyset(('date', 'time_slot', 'match_id'), descending=True)
+USERNAMES = Keyset(('username',))
+
+
+def encode_cursor(direction: str, values: Sequence[Any]) -> str:
+    payload = [direction] + [v.isoformat() if isinstance(v, date) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def decode_cursor(keyset: Keyset, token: Optional[str]) -> Optional[Cursor]:
+    """Cursor in token, or None for the first page. Dates come back as ISO strings, which MySQL compares as dates."""
+    if not token:
+        return None
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+    except (ValueError, binascii.Error):
+        return None
+    if (not isinstance(payload, list) or len(payload) != len(keyset.columns) + 1
+            or payload[0] not in (AFTER, BEFORE)
+            or not all(isinstance(v, (str, int)) and not isinstance(v, bool) for v in payload[1:])):
+        return None
+    return Cursor(payload[0], tuple(payload[1:]))
+
+
+def cursor_from(keyset: Keyset, args, param: str = 'cursor') -> Optional[Cursor]:
+    """Cursor passed in the request arguments under param"""
+    return decode_cursor(keyset, args.get(param))
+
+
+def cache_tag(*cursors: Optional[Cursor]) -> str:
+    """The page positions, for ETag scopes; every page of a list gets its own ETag and fragment cache keys"""
+    return ','.join(encode_cursor(*cursor) if cursor else '' for cursor in cursors)
+
+
+def page_size() -> int:
+    return max(1, Config.PAGE_SIZE)
+
+
+def _backwards(cursor: Optional[Cursor]) -> bool:
+    return cursor is not None and cursor.direction == BEFORE
+
+
+def seek(keyset: Keyset, cursor: Optional[Cursor], prefix: str = '') -> Tuple[str, List[Any]]:
+    """
+    ' AND <predicate>' selecting the rows past cursor, and its params; empty
+    for the first page. The predicate is spelled out column by column (MySQL
+    does not range-optimize row comparisons) and repeats the bound on the
+    leading column so the index range starts at the cursor.
+    """
+    if cursor is None:
+        return '', []
+    # Forward through a descending order (or backward through an ascending one) goes down
+    op = '<' if keyset.descending != _backwards(cursor) else '>'
+    columns = [prefix + column for column in keyset.columns]
+    predicate, params = f"{columns[-1]} {op} %s", [cursor.values[-1]]
+    for column, value in zip(reversed(columns[:-1]), reversed(cursor.values[:-1])):
+        predicate = f"{column} {op} %s OR ({column} = %s AND ({predicate}))"
+        params = [value, value] + params
+    bound = f"{columns[0]} {op}= %s AND " if len(columns) > 1 else ''
+    return f" AND {bound}({predicate})", ([cursor.values[0]] if bound else []) + params
+
+
+def order_by(keyset: Keyset, cursor: Optional[Cursor], prefix: str = '') -> str:
+    """ORDER BY list reading away from cursor; reversed when paging backwards"""
+    descending = keyset.descending != _backwards(cursor)
+    return ', '.join(f"{prefix}{column} {'DESC' if descending else 'ASC'}" for column in keyset.columns)
+
+
+def limit(size: int) -> int:
+    """Rows to fetch for a page of size: one extra tells whether there is another page"""
+    return size + 1
+
+
+def paginate(keyset: Keyset, rows: List[Dict[str, Any]], cursor: Optional[Cursor], size: int) -> Page:
+    """Page of the rows fetched with seek(), order_by() and limit(), in display order"""
+    more = len(rows) > size
+    rows = list(rows[:size])
+    if _backwards(cursor):
+        rows.reverse()
+        has_next, has_prev = True, more
+    else:
+        has_next, has_prev = more, cursor is not None
+    if not rows:
+        return Page(rows, None, None)
+
+    def key(row):
+        return [row[column] for column in keyset.columns]
+
+    return Page(rows,
+                encode_cursor(AFTER, key(rows[-1])) if has_next else None,
+                encode_cursor(BEFORE, key(rows[0])) if has_prev else None)
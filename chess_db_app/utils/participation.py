@@ -0,0 +1,37 @@
+"""
+Maintenance of the denormalized player_participation table.
+Each assigned player of a match has one row keyed (player_id, date,
+match_id) holding their colour, opponent, slot and the result, so player
+pages read a contiguous primary key range. The rows are derived from
+match_players and matches: every write that changes who plays a match, its
+result or whether it exists calls sync_match() in the same transaction.
+"""
+
+_DERIVE = """
+    INSERT INTO player_participation (player_id, match_id, color, opponent_id, date, time_slot, result)
+    SELECT mp.white_player, mp.match_id, 'white', mp.black_player, m.date, m.time_slot, mp.result
+    FROM match_players mp
+    JOIN matches m ON m.match_id = mp.match_id
+    WHERE mp.white_player IS NOT NULL {condition}
+    UNION ALL
+    SELECT mp.black_player, mp.match_id, 'black', mp.white_player, m.date, m.time_slot, mp.result
+    FROM match_players mp
+    JOIN matches m ON m.match_id = mp.match_id
+    WHERE mp.black_player IS NOT NULL {condition}
+"""
+
+
+def sync_match(cursor, match_id: int) -> None:
+    """
+    Re-derive the participation rows of one match inside the caller's
+    transaction. Call after the match_players / matches change; a deleted
+    match simply loses its rows.
+    """
+    cursor.execute("DELETE FROM player_participation WHERE match_id = %s", (match_id,))
+    cursor.execute(_DERIVE.format(condition="AND mp.match_id = %s"), (match_id, match_id))
+
+
+def rebuild(cursor) -> None:
+    """Re-derive the whole table, e.g. after a bulk import of match assignments"""
+    cursor.execute("DELETE FROM player_participation")
+    cursor.execute(_DERIVE.format(condition=""))
@@ -0,0 +1,164 @@
+"""
+Credential hashing service for the ChessDB application.
+Passwords are hashed with a pluggable key-derivation function (scrypt by
+default) in a bounded process pool, so the memory-hard KDF never runs on a
+web worker thread. A queue-depth limit rejects work when the pool is
+saturated instead of letting requests pile up, and every call has a timeout.
+Hashes from the old unsalted SHA-256 scheme are still accepted and can be
+upgraded on the next successful login (see needs_rehash()).
+"""
+
+import base64
+import hashlib
+import hmac
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Iterable, List, Optional
+
+from config import Config
+
+
+class PasswordHashingUnavailable(Exception):
+    """The hashing pool is saturated or did not answer within PASSWORD_HASH_TIMEOUT"""
+
+
+def _b64(raw: bytes) -> str:
+    return base64.b64encode(raw).decode('ascii')
+
+
+class ScryptKDF:
+    """scrypt hashes encoded as scrypt$<n>$<r>$<p>$<salt>$<hash>"""
+
+    name = 'scrypt'
+
+    def __init__(self, n: int, r: int, p: int):
+        self.n, self.r, self.p = n, r, p
+
+    @staticmethod
+    def _derive(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+        return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                              maxmem=256 * n * r + 1024 * 1024, dklen=32)
+
+    def hash(self, password: str) -> str:
+        salt = os.urandom(16)
+        digest = self._derive(password, salt, self.n, self.r, self.p)
+        return f"{self.name}${self.n}${self.r}${self.p}${_b64(salt)}${_b64(digest)}"
+
+    def verify(self, password: str, encoded: str) -> bool:
+        _, n, r, p, salt, digest = encoded.split('$')
+        derived = self._derive(password, base64.b64decode(salt), int(n), int(r), int(p))
+        return hmac.compare_digest(derived, base64.b64decode(digest))
+
+    def is_current(self, encoded: str) -> bool:
+        return encoded.startswith(f"{self.name}${self.n}${self.r}${self.p}$")
+
+
+class LegacySHA256KDF:
+    """Unsalted hex SHA-256 from before the scrypt migration; verification only"""
+
+    name = 'sha256'
+
+    def hash(self, password: str) -> str:
+        return hashlib.sha256(password.encode()).hexdigest()
+
+    def verify(self, password: str, encoded: str) -> bool:
+        return hmac.compare_digest(self.hash(password), encoded)
+
+    def is_current(self, encoded: str) -> bool:
+        return False
+
+
+def current_kdf():
+    """KDF new hashes are created with, chosen by Config.PASSWORD_KDF"""
+    if Config.PASSWORD_KDF == ScryptKDF.name:
+        return ScryptKDF(Config.SCRYPT_N, Config.SCRYPT_R, Config.SCRYPT_P)
+    if Config.PASSWORD_KDF == LegacySHA256KDF.name:
+        return LegacySHA256KDF()
+    raise ValueError(f"Unknown PASSWORD_KDF: {Config.PASSWORD_KDF}")
+
+
+def kdf_for(encoded: str):
+    """KDF that produced a stored hash"""
+    if encoded.startswith(ScryptKDF.name + '$'):
+        _, n, r, p, _, _ = encoded.split('$')
+        return ScryptKDF(int(n), int(r), int(p))
+    return LegacySHA256KDF()
+
+
+# Pool workers; module-level so they can be pickled into the worker processes
+def _hash_worker(password: str) -> str:
+    return current_kdf().hash(password)
+
+
+def _verify_worker(password: str, encoded: str) -> bool:
+    return kdf_for(encoded).verify(password, encoded)
+
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+_queue_slots = threading.BoundedSemaphore(Config.PASSWORD_HASH_QUEUE_DEPTH)
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    """Create the hashing pool on first use"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                # spawn: forking a multi-threaded web worker is unsafe
+                _executor = ProcessPoolExecutor(max_workers=Config.PASSWORD_HASH_WORKERS,
+                                                mp_context=multiprocessing.get_context('spawn'))
+    return _executor
+
+
+def _run(fn, *args) -> Any:
+    """Run fn in the pool, bounded by the queue depth and the timeout"""
+    if not _queue_slots.acquire(blocking=False):
+        raise PasswordHashingUnavailable("Password hashing queue is full")
+    try:
+        future = _get_executor().submit(fn, *args)
+    except Exception:
+        _queue_slots.release()
+        raise
+    # The slot is freed when the work really finishes, not when we stop waiting
+    future.add_done_callback(lambda _: _queue_slots.release())
+    try:
+        return future.result(timeout=Config.PASSWORD_HASH_TIMEOUT)
+    except FutureTimeoutError:
+        future.cancel()
+        raise PasswordHashingUnavailable("Password hashing timed out")
+
+
+def hash_password(password: Any) -> str:
+    """Hash a password with the current KDF in the hashing pool"""
+    password = str(password)
+    if isinstance(current_kdf(), LegacySHA256KDF):
+        return _hash_worker(password)  # cheap, no need for the pool
+    return _run(_hash_worker, password)
+
+
+def verify_password(password: Any, encoded: str) -> bool:
+    """Check a password against a stored hash of any supported KDF"""
+    password = str(password)
+    if isinstance(kdf_for(encoded), LegacySHA256KDF):
+        return _verify_worker(password, encoded)
+    return _run(_verify_worker, password, encoded)
+
+
+def needs_rehash(encoded: str) -> bool:
+    """True if a stored hash was not made with the current KDF and parameters"""
+    return not current_kdf().is_current(encoded)
+
+
+def hash_many(passwords: Iterable[Any]) -> List[str]:
+    """
+    Hash a batch of passwords in parallel, in order; meant for offline bulk
+    work such as the importer, so the queue limit and timeout do not apply.
+    """
+    passwords = [str(password) for password in passwords]
+    if isinstance(current_kdf(), LegacySHA256KDF):
+        return [_hash_worker(password) for password in passwords]
+    chunksize = max(1, len(passwords) // (Config.PASSWORD_HASH_WORKERS * 4))
+    return list(_get_executor().map(_hash_worker, passwords, chunksize=chunksize))
@@ -0,0 +1,40 @@
+"""
+Per-player statistics cache for player.dashboard.
+Games played, win rate, recent and frequent opponents and the average
+opponent ELO are derived from a player's whole match history, which only
+changes when a result is entered or the player is assigned to or removed
+from a match. Those write paths call invalidate() with the affected
+user_ids; a TTL bounds staleness for other worker processes and for
+opponent ratings. Entries are kept per season scope (see utils.seasons).
+"""
+
+from typing import Any, Dict, Optional, Tuple
+
+from config import Config
+from .cache import VersionedCache
+from .metrics import register_counters
+from . import seasons
+
+_cache = VersionedCache(Config.PLAYER_STATS_TTL, Config.PLAYER_STATS_CACHE_SIZE)
+register_counters('chessdb_player_stats_cache', _cache.stats)
+
+
+def lookup(user_id: int, scope: str = seasons.CURRENT) -> Tuple[Optional[Dict[str, Any]], int]:
+    """Return (stats, version) of a player in a season scope; stats is None on a miss"""
+    return _cache.lookup((user_id, seasons.cache_tag(scope)))
+
+
+def store(user_id: int, stats: Dict[str, Any], version: int, scope: str = seasons.CURRENT) -> None:
+    """Cache stats computed after lookup() returned version"""
+    _cache.store((user_id, seasons.cache_tag(scope)), stats, version)
+
+
+def invalidate(*user_ids: Optional[int]) -> None:
+    """Drop the cached stats of every given player in every scope; None entries are ignored"""
+    tags = [seasons.cache_tag(scope) for scope in (seasons.CURRENT, seasons.ALL)]
+    _cache.invalidate(*((user_id, tag) for user_id in user_ids if user_id is not None for tag in tags))
+
+
+def cache_stats() -> Dict[str, int]:
+    """Process-wide hit, miss, invalidation and eviction counters"""
+    return _cache.stats()
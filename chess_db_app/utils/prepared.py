@@ -0,0 +1,90 @@
+"""
+Server-side prepared statement cache for the hot dashboard queries.
+Each physical connection keeps an LRU of prepared cursors keyed by SQL text,
+so a query is parsed and planned by MySQL once per connection instead of on
+every page view. The cache lives on the raw connection and therefore
+survives pool checkouts.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence
+
+from config import Config
+
+_stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+_stats_lock = threading.Lock()
+
+
+def _count(key: str) -> None:
+    with _stats_lock:
+        _stats[key] += 1
+
+
+class PreparedStatementCache:
+    """LRU of prepared dictionary cursors for one physical connection"""
+
+    def __init__(self, raw_connection, capacity: int):
+        self.connection = raw_connection
+        self.connection_id = raw_connection.connection_id
+        self.capacity = capacity
+        self._cursors: "OrderedDict[str, Any]" = OrderedDict()
+
+    def cursor_for(self, sql: str):
+        """Return the prepared cursor for sql, preparing it on a miss"""
+        cursor = self._cursors.get(sql)
+        if cursor is not None:
+            self._cursors.move_to_end(sql)
+            _count('hits')
+            return cursor
+
+        _count('misses')
+        cursor = self.connection.cursor(prepared=True, dictionary=True)
+        self._cursors[sql] = cursor
+        if len(self._cursors) > self.capacity:
+            _, evicted = self._cursors.popitem(last=False)
+            evicted.close()  # deallocates the server-side statement
+            _count('evictions')
+        return cursor
+
+    def __len__(self) -> int:
+        return len(self._cursors)
+
+
+def _cache_for(conn) -> PreparedStatementCache:
+    """
+    Return the statement cache of the physical connection behind conn.
+    A reconnect gives the connection a new server thread id and drops its
+    prepared statements, so the cache is rebuilt when the id changes.
+    """
+    raw = getattr(conn, '_cnx', conn)
+    cache = getattr(raw, '_chessdb_stmt_cache', None)
+    if cache is None or cache.connection_id != raw.connection_id:
+        cache = PreparedStatementCache(raw, Config.PREPARED_STATEMENT_CACHE_SIZE)
+        raw._chessdb_stmt_cache = cache
+    return cache
+
+
+def fetch_all(conn, sql: str, params: Sequence[Any] = ()) -> List[Dict[str, Any]]:
+    """Run sql as a cached prepared statement and return every row as a dict"""
+    cursor = _cache_for(conn).cursor_for(sql)
+    start = time.perf_counter()
+    cursor.execute(sql, tuple(params))
+    rows = cursor.fetchall()
+    stats = getattr(conn, 'query_stats', None)  # set by utils.metrics.instrument
+    if stats is not None:
+        stats.record(sql, time.perf_counter() - start, len(rows))
+    return rows
+
+
+def fetch_one(conn, sql: str, params: Sequence[Any] = ()) -> Optional[Dict[str, Any]]:
+    """Run sql as a cached prepared statement and return the first row, if any"""
+    rows = fetch_all(conn, sql, params)
+    return rows[0] if rows else None
+
+
+def cache_stats() -> Dict[str, int]:
+    """Process-wide hit, miss and eviction counters"""
+    with _stats_lock:
+        return dict(_stats)
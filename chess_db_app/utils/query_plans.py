@@ -0,0 +1,61 @@
+"""
+EXPLAIN FORMAT=JSON inspection of application queries.
+full_scans() walks a MySQL JSON plan and reports every base table read with
+access_type ALL, i.e. a full table scan. Scans of materialized CTEs and
+derived tables are not reported (their input plans are walked instead).
+Used by explain_check.py against a seeded database.
+"""
+
+import json
+from typing import Any, Dict, Iterable, List, NamedTuple, Sequence, Tuple
+
+
+class FullScan(NamedTuple):
+    query: str
+    table: str
+    rows: int
+
+
+def explain(conn, sql: str, params: Sequence[Any] = ()) -> Dict[str, Any]:
+    """The JSON plan MySQL chooses for sql with params"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"EXPLAIN FORMAT=JSON {sql.strip()}", tuple(params))
+        return json.loads(cursor.fetchone()[0])
+    finally:
+        cursor.close()
+
+
+def table_accesses(node: Any) -> Iterable[Dict[str, Any]]:
+    """Every table access in a plan, depth first"""
+    if isinstance(node, dict):
+        table = node.get('table')
+        if isinstance(table, dict):
+            yield table
+        for value in node.values():
+            yield from table_accesses(value)
+    elif isinstance(node, list):
+        for item in node:
+            yield from table_accesses(item)
+
+
+def full_scans(name: str, plan: Dict[str, Any]) -> List[FullScan]:
+    """Full scans of base tables in plan; tables are named as in the query (aliases)"""
+    return [FullScan(name, table.get('table_name', '?'), int(table.get('rows_examined_per_scan', 0)))
+            for table in table_accesses(plan)
+            if table.get('access_type') == 'ALL' and 'materialized_from_subquery' not in table]
+
+
+def check(conn, queries: Dict[str, Tuple[str, Sequence[Any]]],
+          allowed: Dict[str, Iterable[str]] = None) -> List[FullScan]:
+    """
+    EXPLAIN every query in {name: (sql, params)} and return its full scans,
+    except scans of the aliases listed for that name in allowed.
+    """
+    allowed = allowed or {}
+    problems = []
+    for name, (sql, params) in queries.items():
+        permitted = set(allowed.get(name, ()))
+        problems.extend(scan for scan in full_scans(name, explain(conn, sql, params))
+                        if scan.table not in permitted)
+    return problems
@@ -0,0 +1,103 @@
+"""
+Per-player rating time series for the rating chart.
+rating_history holds one row per rated game: (player_id, date, match_id,
+rating_after), keyed for an index-ordered read of one player's career.
+utils/elo.py keeps it in step with players.elo_rating inside the result
+transaction: a new or corrected result writes the game's row and shifts the
+player's later rows by the net change, so the last point always matches the
+stored rating. rebuild_ratings.py rewrites it from the full replay.
+
+series_query() reads a career and lttb() downsamples it for the wire.
+"""
+
+from datetime import date
+from typing import Dict, List, Sequence, Tuple
+
+# Rows after (date, match_id) of one player
+_LATER = "player_id = %s AND (date > %s OR (date = %s AND match_id > %s))"
+
+
+def _rating_before(cursor, player_id: int, match_id: int, match_date: date) -> int:
+    """
+    Rating just before the game: the previous row's, or for a player's
+    first game the stored rating minus every recorded change (elo_changes
+    already includes this game).
+    """
+    cursor.execute("""
+        SELECT rating_after FROM rating_history
+        WHERE player_id = %s AND (date < %s OR (date = %s AND match_id < %s))
+        ORDER BY date DESC, match_id DESC
+        LIMIT 1
+    """, (player_id, match_date, match_date, match_id))
+    row = cursor.fetchone()
+    if row:
+        return row[0]
+    cursor.execute("""
+        SELECT p.elo_rating
+            - COALESCE((SELECT SUM(white_delta) FROM elo_changes WHERE white_player = p.user_id), 0)
+            - COALESCE((SELECT SUM(black_delta) FROM elo_changes WHERE black_player = p.user_id), 0)
+        FROM players p WHERE p.user_id = %s
+    """, (player_id,))
+    return cursor.fetchone()[0]
+
+
+def record(cursor, match_id: int, match_date: date, deltas: Dict[int, int], shifts: Dict[int, int]) -> None:
+    """
+    Update the series for a (re)rated or reverted game inside the caller's
+    transaction. deltas: applied change of each player of the game (empty
+    when reverting); shifts: net rating change of every player touched,
+    including players no longer in the game.
+    """
+    for player_id, shift in shifts.items():
+        if shift:
+            cursor.execute(f"UPDATE rating_history SET rating_after = rating_after + %s WHERE {_LATER}",
+                           (shift, player_id, match_date, match_date, match_id))
+    stale = [player_id for player_id in shifts if player_id not in deltas]
+    if stale:
+        placeholders = ', '.join(['%s'] * len(stale))
+        cursor.execute(f"DELETE FROM rating_history WHERE match_id = %s AND player_id IN ({placeholders})",
+                       (match_id, *stale))
+    for player_id, delta in deltas.items():
+        rating_after = _rating_before(cursor, player_id, match_id, match_date) + delta
+        cursor.execute("""
+            INSERT INTO rating_history (player_id, date, match_id, rating_after)
+            VALUES (%s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE rating_after = VALUES(rating_after)
+        """, (player_id, match_date, match_id, rating_after))
+
+
+def series_query(player_id: int) -> Tuple[str, Tuple[int]]:
+    """A player's whole series in order as (sql, params); a primary-key range read"""
+    return ("""
+        SELECT date, rating_after FROM rating_history
+        WHERE player_id = %s
+        ORDER BY date, match_id
+    """, (player_id,))
+
+
+def lttb(points: Sequence[Tuple[float, float]], threshold: int) -> List[Tuple[float, float]]:
+    """
+    Largest-Triangle-Three-Buckets downsampling of (x, y) points sorted by x
+    to at most threshold points. Keeps the first and last point and, per
+    bucket, the point forming the largest triangle with its neighbours, so
+    peaks and troughs survive.
+    """
+    if threshold >= len(points):
+        return list(points)
+    if threshold < 3:
+        return [points[0], points[-1]][:threshold]
+    sampled = [points[0]]
+    bucket = (len(points) - 2) / (threshold - 2)
+    previous = points[0]
+    for i in range(threshold - 2):
+        start, end = int(i * bucket) + 1, int((i + 1) * bucket) + 1
+        # Average of the next bucket (the last point for the final bucket)
+        following = points[end:min(int((i + 2) * bucket) + 1, len(points))] or [points[-1]]
+        avg_x = sum(p[0] for p in following) / len(following)
+        avg_y = sum(p[1] for p in following) / len(following)
+        chosen = max(points[start:end], key=lambda p: abs((previous[0] - avg_x) * (p[1] - previous[1])
+                                                          - (previous[0] - p[0]) * (avg_y - previous[1])))
+        sampled.append(chosen)
+        previous = chosen
+    sampled.append(points[-1])
+    return sampled
@@ -0,0 +1,77 @@
+"""
+In-process cache for slow-changing reference data.
+Titles, certification types, teams, halls, tables and arbiters are read on
+almost every form and dashboard but change rarely. Each data set is cached
+with a TTL and a version number; routes that modify one call invalidate(),
+which bumps the version so a load that was already in flight cannot store
+the old rows. Other worker processes pick up the change when the TTL expires.
+"""
+
+from typing import Any, Dict, List, Sequence, Tuple
+
+from config import Config
+from .batch import fetch_concurrently
+from .cache import VersionedCache
+from .metrics import register_counters
+
+# Name -> query of every cached data set
+DATASETS = {
+    'titles': "SELECT title_id, title_name FROM titles ORDER BY title_id",
+    'coach_certification_types': "SELECT certification_id, certification_name FROM coach_certification_types",
+    'arbiter_certification_types': "SELECT certification_id, certification_name FROM arbiter_certification_types",
+    'teams': "SELECT team_id, name FROM teams",
+    'halls': "SELECT hall_id, name, country, capacity FROM halls",
+    'tables': "SELECT t.table_id, t.hall_id, t.table_number, h.name AS hall_name FROM tables t JOIN halls h ON t.hall_id = h.hall_id",
+    'arbiters': "SELECT u.user_id, u.username, a.name, a.surname, a.experience_level FROM users u JOIN arbiters a ON u.user_id = a.user_id",
+}
+
+
+_cache = VersionedCache(Config.REFERENCE_DATA_TTL)
+register_counters('chessdb_reference_cache', _cache.stats)
+
+
+def lookup(names: Sequence[str]) -> Tuple[Dict[str, List[Dict[str, Any]]], Dict[str, int]]:
+    """
+    Split names into cached rows and misses.
+    Returns (rows by name, version by missed name); pass the versions back
+    to store() together with the freshly loaded rows.
+    """
+    found, missing = {}, {}
+    for name in names:
+        rows, version = _cache.lookup(name)
+        if rows is None:
+            missing[name] = version
+        else:
+            found[name] = rows
+    return found, missing
+
+
+def store(rows: Dict[str, List[Dict[str, Any]]], versions: Dict[str, int]) -> None:
+    """Cache rows loaded after a lookup() unless they were invalidated meanwhile"""
+    for name, version in versions.items():
+        _cache.store(name, rows[name], version)
+
+
+def reference_data(*names: str) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Return the rows of each named data set, loading misses concurrently.
+    Misses are read from the primary so a lagging replica cannot put
+    pre-invalidation rows back into the cache. The rows are shared between
+    requests and must not be modified.
+    """
+    found, missing = lookup(names)
+    if missing:
+        loaded = fetch_concurrently({name: (DATASETS[name], ()) for name in missing}, readonly=False)
+        store(loaded, missing)
+        found.update(loaded)
+    return found
+
+
+def invalidate(*names: str) -> None:
+    """Invalidate the named data sets after a write, or all of them"""
+    _cache.invalidate(*(names or DATASETS))
+
+
+def cache_stats() -> Dict[str, int]:
+    """Process-wide hit, miss, invalidation and eviction counters"""
+    return _cache.stats()
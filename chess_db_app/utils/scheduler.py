@@ -0,0 +1,249 @@
+"""
+Bulk fixture scheduling for coach.schedule.
+A fixture is a pair of teams and a window of days. load_occupancy() reads
+the booked slots of every table, arbiter and team in the windows once, with
+the index range reads of occupancy_queries(); solve() then assigns each
+fixture a day, time slot, table and arbiter in memory, earliest deadline
+first, taking the earliest start where both teams, a table and an arbiter
+are free for the whole match (MATCH_DURATION slots). insert() stores the
+plan in the caller's transaction with a handful of multi-row statements per
+BATCH_SIZE matches, and books it through utils.slot_claims, so a booking
+made concurrently still surfaces as SlotConflict and the whole plan is
+rolled back.
+
+Free tables and arbiters are found with a cursor per (day, start, hall)
+that only moves forward: occupancy only grows while solving, so a resource
+skipped once stays unusable there, and a season of fixtures is solved in
+time linear in fixtures plus days x slots x resources.
+"""
+
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from .slot_claims import MATCH_DURATION, STARTS, SlotConflict, claim_matches
+
+BATCH_SIZE = 1000  # matches per multi-row INSERT
+
+
+class Fixture(NamedTuple):
+    team1_id: int  # white
+    team2_id: int
+    first_day: date
+    last_day: date
+    hall_id: Optional[int] = None  # any hall when None
+
+
+class Booking(NamedTuple):
+    fixture: Fixture
+    date: date
+    time_slot: int
+    hall_id: int
+    table_id: int
+    arbiter_id: int
+
+
+class Plan(NamedTuple):
+    bookings: List[Booking]
+    unscheduled: List[Fixture]  # no slot with free teams, table and arbiter in the window
+
+
+def _mask(time_slot: int) -> int:
+    """Bits of the slots occupied by a match starting in time_slot"""
+    return ((1 << MATCH_DURATION) - 1) << (time_slot - 1)
+
+
+def _day(value: str) -> date:
+    return datetime.strptime(value.strip(), "%d-%m-%Y").date()
+
+
+def parse_fixtures(text: str, teams: Sequence[Dict[str, Any]], halls: Sequence[Dict[str, Any]],
+                   my_team_id: int) -> Tuple[List[Fixture], List[str]]:
+    """
+    Fixtures from lines of "white team, black team, first day, last day[, hall]"
+    (teams and halls by id or name, days as DD-MM-YYYY). Returns (fixtures,
+    errors); every fixture must involve my_team_id.
+    """
+    team_ids = {str(t['team_id']): t['team_id'] for t in teams}
+    team_ids.update({t['name'].strip().lower(): t['team_id'] for t in teams})
+    hall_ids = {str(h['hall_id']): h['hall_id'] for h in halls}
+    hall_ids.update({h['name'].strip().lower(): h['hall_id'] for h in halls})
+
+    fixtures, errors = [], []
+    for number, line in enumerate(text.splitlines(), start=1):
+        if not line.strip():
+            continue
+        fields = [field.strip() for field in line.split(',')]
+        if len(fields) not in (4, 5):
+            errors.append(f"Line {number}: expected white team, black team, first day, last day[, hall]")
+            continue
+        team1_id, team2_id = team_ids.get(fields[0].lower()), team_ids.get(fields[1].lower())
+        hall_id = hall_ids.get(fields[4].lower()) if len(fields) == 5 and fields[4] else None
+        try:
+            first_day, last_day = _day(fields[2]), _day(fields[3])
+        except ValueError:
+            errors.append(f"Line {number}: days must be DD-MM-YYYY")
+            continue
+        if team1_id is None or team2_id is None:
+            errors.append(f"Line {number}: unknown team")
+        elif team1_id == team2_id:
+            errors.append(f"Line {number}: a team cannot play against itself")
+        elif my_team_id not in (team1_id, team2_id):
+            errors.append(f"Line {number}: you can only schedule matches involving your own team")
+        elif len(fields) == 5 and fields[4] and hall_id is None:
+            errors.append(f"Line {number}: unknown hall")
+        elif first_day > last_day:
+            errors.append(f"Line {number}: the window ends before it starts")
+        else:
+            fixtures.append(Fixture(team1_id, team2_id, first_day, last_day, hall_id))
+    return fixtures, errors
+
+
+def within(fixtures: Iterable[Fixture], first_day: date, last_day: date) -> List[Fixture]:
+    """Fixtures with their windows clipped to [first_day, last_day], e.g. a coach's contract"""
+    return [f._replace(first_day=max(f.first_day, first_day), last_day=min(f.last_day, last_day)) for f in fixtures]
+
+
+def _span(fixtures: Sequence[Fixture]) -> Tuple[date, date]:
+    return min(f.first_day for f in fixtures), max(f.last_day for f in fixtures)
+
+
+def occupancy_queries(fixtures: Sequence[Fixture]) -> Dict[str, Tuple[str, tuple]]:
+    """
+    Booked slots in the fixtures' windows as {name: (sql, params)}: table and
+    arbiter claims by day (idx_claim_date) and the matches of the fixtures'
+    teams (the team indexes).
+    """
+    first_day, last_day = _span(fixtures)
+    team_ids = tuple(sorted({team_id for f in fixtures for team_id in (f.team1_id, f.team2_id)}))
+    placeholders = ', '.join(['%s'] * len(team_ids))
+    return {
+        'claims': ("""
+            SELECT date, slot, table_id, arbiter_id FROM slot_claims
+            WHERE date BETWEEN %s AND %s AND player_id IS NULL
+        """, (first_day, last_day)),
+        'teams': (f"""
+            SELECT team1_id, date, time_slot FROM matches
+            WHERE team1_id IN ({placeholders}) AND date BETWEEN %s AND %s AND time_slot IS NOT NULL
+            UNION ALL
+            SELECT team2_id, date, time_slot FROM matches
+            WHERE team2_id IN ({placeholders}) AND date BETWEEN %s AND %s AND time_slot IS NOT NULL
+        """, (*team_ids, first_day, last_day, *team_ids, first_day, last_day)),
+    }
+
+
+def load_occupancy(cursor, fixtures: Sequence[Fixture]) -> Dict[str, list]:
+    """Run occupancy_queries() on a plain tuple cursor; the input of solve()"""
+    occupancy = {}
+    for name, query in occupancy_queries(fixtures).items():
+        cursor.execute(*query)
+        occupancy[name] = cursor.fetchall()
+    return occupancy
+
+
+class _Occupancy:
+    """Occupied slot bits per (resource, day) and the forward-only search cursors"""
+
+    def __init__(self, occupancy: Dict[str, list]):
+        self.tables: Dict[Tuple[int, date], int] = defaultdict(int)
+        self.arbiters: Dict[Tuple[int, date], int] = defaultdict(int)
+        self.teams: Dict[Tuple[int, date], int] = defaultdict(int)
+        self.cursors: Dict[tuple, int] = {}
+        for day, slot, table_id, arbiter_id in occupancy['claims']:
+            if table_id is not None:
+                self.tables[table_id, day] |= 1 << (slot - 1)
+            if arbiter_id is not None:
+                self.arbiters[arbiter_id, day] |= 1 << (slot - 1)
+        for team_id, day, time_slot in occupancy['teams']:
+            self.teams[team_id, day] |= _mask(time_slot)
+
+    def first_free(self, busy: Dict, candidates: Sequence[int], key: tuple, day: date, mask: int) -> Optional[int]:
+        position = self.cursors.get(key, 0)
+        while position < len(candidates) and busy.get((candidates[position], day), 0) & mask:
+            position += 1
+        self.cursors[key] = position
+        return candidates[position] if position < len(candidates) else None
+
+
+def solve(fixtures: Sequence[Fixture], tables: Sequence[Dict[str, Any]], arbiter_ids: Sequence[int],
+          occupancy: Dict[str, list]) -> Plan:
+    """
+    Assign every fixture the earliest free day and slot of its window, with
+    a free table (of its hall, if given) and arbiter; fixtures with the
+    earliest last day go first. tables are refdata 'tables' rows.
+    """
+    state = _Occupancy(occupancy)
+    ordered_tables = sorted(tables, key=lambda t: (t['hall_id'], t['table_number']))
+    table_ids = {None: [t['table_id'] for t in ordered_tables]}
+    for t in ordered_tables:
+        table_ids.setdefault(t['hall_id'], []).append(t['table_id'])
+    hall_of = {t['table_id']: t['hall_id'] for t in ordered_tables}
+    arbiter_ids = sorted(arbiter_ids)
+
+    bookings, unscheduled = [], []
+    for fixture in sorted(fixtures, key=lambda f: (f.last_day, f.first_day)):
+        candidates = table_ids.get(fixture.hall_id, [])
+        booking = None
+        day = fixture.first_day
+        while booking is None and day <= fixture.last_day:
+            for start in STARTS:
+                mask = _mask(start)
+                if (state.teams.get((fixture.team1_id, day), 0) | state.teams.get((fixture.team2_id, day), 0)) & mask:
+                    continue
+                table_id = state.first_free(state.tables, candidates, ('table', fixture.hall_id, day, start), day, mask)
+                if table_id is None:
+                    continue
+                arbiter_id = state.first_free(state.arbiters, arbiter_ids, ('arbiter', day, start), day, mask)
+                if arbiter_id is None:
+                    continue
+                booking = Booking(fixture, day, start, hall_of[table_id], table_id, arbiter_id)
+                for busy, resource in ((state.tables, table_id), (state.arbiters, arbiter_id),
+                                       (state.teams, fixture.team1_id), (state.teams, fixture.team2_id)):
+                    busy[resource, day] |= mask
+                break
+            day += timedelta(days=1)
+        if booking is None:
+            unscheduled.append(fixture)
+        else:
+            bookings.append(booking)
+    bookings.sort(key=lambda b: (b.date, b.time_slot, b.table_id))
+    return Plan(bookings, unscheduled)
+
+
+def _batches(rows: list):
+    for start in range(0, len(rows), BATCH_SIZE):
+        yield rows[start:start + BATCH_SIZE]
+
+
+def insert(cursor, coach_id: int, bookings: Sequence[Booking]) -> List[int]:
+    """
+    Create the booked matches inside the caller's transaction and return
+    their match_ids; raises SlotConflict if a slot was booked meanwhile.
+    Plain tuple cursor; the caller bumps versions and counters and commits.
+    """
+    match_ids = []
+    for batch in _batches(list(bookings)):
+        cursor.executemany("""
+            INSERT INTO matches (date, time_slot, hall_id, table_id, team1_id, team2_id, arbiter_id)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+        """, [(b.date, b.time_slot, b.hall_id, b.table_id, b.fixture.team1_id, b.fixture.team2_id, b.arbiter_id)
+              for b in batch])
+        # One multi-row INSERT normally gets consecutive ids; read them back by
+        # (table, day, slot), which is unique within a plan, rather than assume it
+        first = cursor.lastrowid
+        cursor.execute("""
+            SELECT match_id, table_id, date, time_slot FROM matches
+            WHERE match_id BETWEEN %s AND %s
+        """, (first, first + len(batch) - 1))
+        created = {(table_id, day, time_slot): match_id for match_id, table_id, day, time_slot in cursor.fetchall()}
+        batch_ids = [created.get((b.table_id, b.date, b.time_slot)) for b in batch]
+        if None in batch_ids:
+            raise SlotConflict('match')
+        claim_matches(cursor, [(match_id, b.date, b.time_slot, b.table_id, b.arbiter_id)
+                               for match_id, b in zip(batch_ids, batch)])
+        cursor.executemany("INSERT INTO match_players (match_id, white_player, black_player, result) "
+                           "VALUES (%s, NULL, NULL, NULL)", [(match_id,) for match_id in batch_ids])
+        cursor.executemany("INSERT INTO created (coach_id, match_id) VALUES (%s, %s)",
+                           [(coach_id, match_id) for match_id in batch_ids])
+        match_ids.extend(batch_ids)
+    return match_ids
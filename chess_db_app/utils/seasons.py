@@ -0,0 +1,169 @@
+"""
+Seasons, the season scope of dashboard queries and the season archive.
+A season starts on the first day of Config.SEASON_START_MONTH and is named
+after the year it starts in. archive_season() moves a closed season out of
+matches and its satellite tables into the compressed, season-partitioned
+*_archive tables, so the live tables and their indexes only hold recent
+history. The all_* views union live and archived rows.
+
+Dashboards default to the CURRENT scope (this season and anything scheduled
+after it, from the live tables); the ALL scope reads the all_* views and is
+only used when the user asks for every season. Query builders take the
+scope, substitute tables(scope) for the table names and bind floor(scope)
+as the earliest date.
+"""
+
+from datetime import date
+from typing import Dict, List
+
+from config import Config
+from . import counters
+
+CURRENT = 'current'
+ALL = 'all'
+
+# Live tables with an archive twin (<name>_archive) and a union view (all_<name>)
+ARCHIVED_TABLES = ('matches', 'match_players', 'ratings', 'created', 'player_participation')
+_EARLIEST = date(1000, 1, 1)  # MySQL's smallest DATE
+
+
+def season_of(day: date) -> int:
+    """Season a date belongs to"""
+    return day.year if day.month >= Config.SEASON_START_MONTH else day.year - 1
+
+
+def season_start(season: int) -> date:
+    """First day of a season"""
+    return date(season, Config.SEASON_START_MONTH, 1)
+
+
+def current_season() -> int:
+    return season_of(date.today())
+
+
+def scope_from(args) -> str:
+    """Scope requested by ?season=all; anything else is the current season"""
+    return ALL if args.get('season') == ALL else CURRENT
+
+
+def tables(scope: str) -> Dict[str, str]:
+    """Table names for a query in scope, keyed by live table name"""
+    return {name: f"all_{name}" if scope == ALL else name for name in ARCHIVED_TABLES}
+
+
+def floor(scope: str) -> date:
+    """Earliest match date shown in scope"""
+    return season_start(current_season()) if scope == CURRENT else _EARLIEST
+
+
+def cache_tag(scope: str) -> str:
+    """Scope plus its floor, for ETag scopes and cache keys; changes when a new season starts"""
+    return f"{scope}:{floor(scope)}"
+
+
+# Copy a season into the archive, children first; params (season, start, end)
+_COPY = [
+    """
+    INSERT INTO matches_archive (season, match_id, date, time_slot, hall_id, table_id, team1_id, team2_id, arbiter_id)
+    SELECT %s, match_id, date, time_slot, hall_id, table_id, team1_id, team2_id, arbiter_id
+    FROM matches WHERE date >= %s AND date < %s
+    """,
+    """
+    INSERT INTO match_players_archive (season, match_id, white_player, black_player, result)
+    SELECT %s, mp.match_id, mp.white_player, mp.black_player, mp.result
+    FROM match_players mp JOIN matches m ON m.match_id = mp.match_id
+    WHERE m.date >= %s AND m.date < %s
+    """,
+    """
+    INSERT INTO ratings_archive (season, match_id, arbiter_id, rating_value)
+    SELECT %s, r.match_id, r.arbiter_id, r.rating_value
+    FROM ratings r JOIN matches m ON m.match_id = r.match_id
+    WHERE m.date >= %s AND m.date < %s
+    """,
+    """
+    INSERT INTO created_archive (season, coach_id, match_id)
+    SELECT %s, c.coach_id, c.match_id
+    FROM created c JOIN matches m ON m.match_id = c.match_id
+    WHERE m.date >= %s AND m.date < %s
+    """,
+    """
+    INSERT INTO player_participation_archive
+        (season, player_id, match_id, color, opponent_id, date, time_slot, result)
+    SELECT %s, pp.player_id, pp.match_id, pp.color, pp.opponent_id, pp.date, pp.time_slot, pp.result
+    FROM player_participation pp JOIN matches m ON m.match_id = pp.match_id
+    WHERE m.date >= %s AND m.date < %s
+    """,
+]
+
+# Then remove it from the live tables, parents last; params (start, end).
+# Slot claims of a closed season can never conflict again and are dropped.
+_PURGE = [
+    "DELETE pp FROM player_participation pp JOIN matches m ON m.match_id = pp.match_id WHERE m.date >= %s AND m.date < %s",
+    "DELETE sc FROM slot_claims sc JOIN matches m ON m.match_id = sc.match_id WHERE m.date >= %s AND m.date < %s",
+    "DELETE r FROM ratings r JOIN matches m ON m.match_id = r.match_id WHERE m.date >= %s AND m.date < %s",
+    "DELETE c FROM created c JOIN matches m ON m.match_id = c.match_id WHERE m.date >= %s AND m.date < %s",
+    "DELETE mp FROM match_players mp JOIN matches m ON m.match_id = mp.match_id WHERE m.date >= %s AND m.date < %s",
+    "DELETE FROM matches WHERE date >= %s AND date < %s",
+]
+
+
+def _ensure_partition(cursor, table: str, season: int) -> None:
+    """Split a partition for season off p_future unless an existing one already covers it"""
+    cursor.execute("""
+        SELECT PARTITION_DESCRIPTION FROM information_schema.PARTITIONS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+    """, (table,))
+    bounds = [int(row[0]) for row in cursor.fetchall() if row[0] not in (None, 'MAXVALUE')]
+    if bounds and season < max(bounds):
+        return
+    cursor.execute(f"""
+        ALTER TABLE {table} REORGANIZE PARTITION p_future INTO (
+            PARTITION s{season} VALUES LESS THAN ({season + 1}),
+            PARTITION p_future VALUES LESS THAN MAXVALUE
+        )
+    """)
+
+
+def live_seasons(conn) -> List[int]:
+    """Seasons that still have matches in the live tables, oldest first"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT MIN(date), MAX(date) FROM matches")
+        first, last = cursor.fetchone()
+    finally:
+        cursor.close()
+    if first is None:
+        return []
+    return list(range(season_of(first), season_of(last) + 1))
+
+
+def archive_season(conn, season: int) -> int:
+    """
+    Move every match of a closed season and its satellite rows to the archive
+    in one transaction. Returns the number of matches moved. The rows stay
+    visible through the all_* views unchanged, so page ETags need no bump.
+    """
+    if season >= current_season():
+        raise ValueError(f"Season {season} is not closed yet")
+    start, end = season_start(season), season_start(season + 1)
+    cursor = conn.cursor()
+    try:
+        # Partition DDL commits implicitly, so it runs before the transaction
+        for name in ARCHIVED_TABLES:
+            _ensure_partition(cursor, f"{name}_archive", season)
+
+        conn.start_transaction()
+        for statement in _COPY:
+            cursor.execute(statement, (season, start, end))
+        cursor.execute("SELECT COUNT(*) FROM matches WHERE date >= %s AND date < %s", (start, end))
+        moved = cursor.fetchone()[0]
+        for statement in _PURGE:
+            cursor.execute(statement, (start, end))
+        counters.add(cursor, {counters.MATCHES: -moved})  # counts the live table
+        conn.commit()
+        return moved
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
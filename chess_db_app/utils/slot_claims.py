@@ -0,0 +1,110 @@
+"""
+Slot claims: race-free booking of tables, arbiters and players.
+A match occupies its time_slot and the next one. Booking it inserts one
+slot_claims row per occupied slot and resource (its table, its arbiter, each
+player), and the unique keys on (table_id, date, slot), (arbiter_id, date,
+slot) and (player_id, date, slot) make MySQL reject any overlap with a
+duplicate-key error. Claims are written in the caller's
+transaction, so a conflict rolls the whole booking back and there is no
+window between checking and inserting.
+"""
+
+from typing import Any, Iterable, List, Tuple
+
+import mysql.connector
+from mysql.connector import errorcode
+
+MATCH_DURATION = 2  # slots
+LAST_SLOT = 4
+# Slots a match can start in: it must end by the last slot
+STARTS = tuple(range(1, LAST_SLOT - MATCH_DURATION + 2))
+
+_INSERT = """
+    INSERT INTO slot_claims (match_id, date, slot, table_id, arbiter_id, player_id)
+    VALUES (%s, %s, %s, %s, %s, %s)
+"""
+
+# Unique key -> booked resource reported by SlotConflict
+_KEYS = {'uq_claim_table': 'table', 'uq_claim_arbiter': 'arbiter', 'uq_claim_player': 'player'}
+
+
+class SlotConflict(Exception):
+    """The table, arbiter or player (see .resource) is already booked in one of the slots"""
+
+    def __init__(self, resource: str):
+        super().__init__(f"{resource} is already booked")
+        self.resource = resource
+
+
+def occupied_slots(time_slot: int) -> Iterable[int]:
+    """Slots taken by a match starting in time_slot"""
+    return range(time_slot, time_slot + MATCH_DURATION)
+
+
+def _claim(cursor, rows) -> None:
+    try:
+        cursor.executemany(_INSERT, rows)  # one multi-row INSERT
+    except mysql.connector.IntegrityError as err:
+        if err.errno != errorcode.ER_DUP_ENTRY:
+            raise
+        resource = next((name for key, name in _KEYS.items() if key in err.msg), 'slot')
+        raise SlotConflict(resource) from err
+
+
+def _match_rows(match_id: int, date, time_slot: int, table_id: int, arbiter_id: int) -> List[tuple]:
+    """Separate table and arbiter claims, the layout rebuild() produces"""
+    return [row for slot in occupied_slots(time_slot)
+            for row in ((match_id, date, slot, table_id, None, None), (match_id, date, slot, None, arbiter_id, None))]
+
+
+def claim_match(cursor, match_id: int, date, time_slot: int, table_id: int, arbiter_id: int) -> None:
+    """Book the table and arbiter of a new match; raises SlotConflict"""
+    _claim(cursor, _match_rows(match_id, date, time_slot, table_id, arbiter_id))
+
+
+def claim_matches(cursor, matches: Iterable[Tuple[int, Any, int, int, int]]) -> None:
+    """Book (match_id, date, time_slot, table_id, arbiter_id) of many new matches at once; raises SlotConflict"""
+    _claim(cursor, [row for match in matches for row in _match_rows(*match)])
+
+
+def claim_player(cursor, match_id: int, date, time_slot: int, player_id: int) -> None:
+    """Book a player assigned to a match; raises SlotConflict"""
+    _claim(cursor, [(match_id, date, slot, None, None, player_id) for slot in occupied_slots(time_slot)])
+
+
+def release_player(cursor, match_id: int, player_id: int) -> None:
+    """Free the slots of a player removed from a match"""
+    cursor.execute("DELETE FROM slot_claims WHERE match_id = %s AND player_id = %s", (match_id, player_id))
+
+
+def release_match(cursor, match_id: int) -> None:
+    """Free every slot claimed by a deleted match"""
+    cursor.execute("DELETE FROM slot_claims WHERE match_id = %s", (match_id,))
+
+
+def rebuild(cursor) -> None:
+    """
+    Re-derive all claims from matches and player_participation after a bulk
+    import. Imported data may already double-book; the earliest match keeps
+    the claim. Tables, arbiters and players are claimed in separate rows, so
+    a clash on one resource does not drop the match's claim on another.
+    Needs UNIQUE_CHECKS enabled.
+    """
+    cursor.execute("DELETE FROM slot_claims")
+    for column in ('table_id', 'arbiter_id'):
+        cursor.execute(f"""
+            INSERT IGNORE INTO slot_claims (match_id, date, slot, {column})
+            SELECT m.match_id, m.date, m.time_slot + d.n, m.{column}
+            FROM matches m
+            CROSS JOIN (SELECT 0 AS n UNION ALL SELECT 1) d
+            WHERE m.time_slot IS NOT NULL AND m.{column} IS NOT NULL
+            ORDER BY m.match_id, d.n
+        """)
+    cursor.execute("""
+        INSERT IGNORE INTO slot_claims (match_id, date, slot, player_id)
+        SELECT pp.match_id, pp.date, pp.time_slot + d.n, pp.player_id
+        FROM player_participation pp
+        CROSS JOIN (SELECT 0 AS n UNION ALL SELECT 1) d
+        WHERE pp.time_slot IS NOT NULL
+        ORDER BY pp.match_id, d.n
+    """)
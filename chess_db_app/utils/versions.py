@@ -0,0 +1,71 @@
+"""
+Data version counters for conditional GETs.
+Write routes bump a counter per affected entity ('player:12', 'team:3',
+'arbiter:7', 'halls') in the same transaction as the change. Match lists and
+dashboards derive their ETag from the counters they depend on, so a repeated
+request can be answered with 304 Not Modified after one primary-key lookup,
+without running the page queries or rendering the template.
+"""
+
+import hashlib
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+from .prepared import fetch_all
+
+# Bumped when the schema is recreated (migrations/0001_baseline.sql), so ETags from
+# a previous import can never match again
+EPOCH = 'epoch'
+HALLS = 'halls'
+
+
+def entity(kind: str, entity_id: Optional[int]) -> Optional[str]:
+    """Counter name of one player, arbiter or team; None for a missing id"""
+    return None if entity_id is None else f"{kind}:{entity_id}"
+
+
+def bump(cursor, *entities: Optional[str]) -> None:
+    """
+    Increment the counters of entities inside the caller's transaction.
+    Call before commit(); None entries (e.g. unassigned players) are skipped.
+    """
+    names = sorted({name for name in entities if name is not None})
+    if not names:
+        return
+    placeholders = ', '.join(['(%s, 1)'] * len(names))
+    cursor.execute(f"""
+        INSERT INTO data_versions (entity, version) VALUES {placeholders}
+        ON DUPLICATE KEY UPDATE version = version + 1
+    """, names)
+
+
+def versions_query(entities: Sequence[Optional[str]]) -> Tuple[str, Tuple[str, ...]]:
+    """Primary-key lookup of the counters of entities as (sql, params)"""
+    names = tuple(sorted({name for name in entities if name is not None} | {EPOCH}))
+    placeholders = ', '.join(['%s'] * len(names))
+    return f"SELECT entity, version FROM data_versions WHERE entity IN ({placeholders})", names
+
+
+def make_etag(scope: str, rows: Iterable[Dict]) -> str:
+    """ETag for a page of scope built from versions_query() rows"""
+    state = ','.join(f"{row['entity']}={row['version']}" for row in sorted(rows, key=lambda row: row['entity']))
+    return hashlib.sha1(f"{scope}|{state}".encode()).hexdigest()
+
+
+def current_etag(conn, scope: str, entities: Sequence[Optional[str]]) -> str:
+    """Read the counters of entities on conn and return the page's ETag"""
+    return make_etag(scope, fetch_all(conn, *versions_query(entities)))
+
+
+def not_modified(request, session, etag: str) -> bool:
+    """
+    True if the client already holds this version of the page.
+    Pending flash messages always force a full render so they are shown.
+    """
+    return '_flashes' not in session and etag in request.if_none_match
+
+
+def with_etag(response, etag: str):
+    """Attach the ETag and make browsers revalidate on every view"""
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response